@@ -5,6 +5,8 @@ Authentication module
 from .groww_auth import (
     get_auth_manager,
     get_authenticated_groww_client,
+    get_market_data_sessions,
     cleanup_auth,
-    GrowwAuthenticationManager
+    GrowwAuthenticationManager,
+    GrowwSession
 )
\ No newline at end of file
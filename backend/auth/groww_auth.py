@@ -1,61 +1,76 @@
 """
 Advanced Groww API Authentication Manager
-Handles TOTP authentication, session management, and token refresh
+Handles TOTP authentication, session management, token refresh and the account pool
 """
 
 import asyncio
+import random
 import pyotp
 import structlog
-from typing import Optional, Dict, Any
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
 from datetime import datetime, timedelta
-from growwapi import GrowwAPI
-from growwapi.groww.exceptions import GrowwAPIAuthenticationException
+from auth import sdk
 from config import get_settings
+from monitoring.instrumentation import upstream_call
+from monitoring.metrics import AUTH_REFRESHES
+from monitoring.tracing import span
+
+if TYPE_CHECKING:
+    from growwapi import GrowwAPI
 
 logger = structlog.get_logger(__name__)
 
-class GrowwAuthenticationManager:
+@dataclass(frozen=True)
+class GrowwCredentials:
+    name: str
+    api_key: str
+    api_secret: str
+    totp_seed: Optional[str] = None
+
+class GrowwSession:
     """
-    Manages Groww API authentication with advanced features:
+    One Groww account's authenticated session:
     - TOTP-based authentication
-    - Automatic session refresh
-    - Connection pooling
+    - Background session refresh ahead of expiry
     - Error handling and retry logic
     """
     
-    def __init__(self):
+    def __init__(self, credentials: GrowwCredentials):
         self.settings = get_settings()
-        self._api_client: Optional[GrowwAPI] = None
+        self.credentials = credentials
+        self.name = credentials.name
+        self._logger = logger.bind(account=credentials.name)
+        self._api_client: Optional["GrowwAPI"] = None
         self._totp_generator: Optional[pyotp.TOTP] = None
         self._session_data: Dict[str, Any] = {}
         self._last_auth_time: Optional[datetime] = None
         self._auth_lock = asyncio.Lock()
         self._is_authenticated = False
+        self._refresh_jitter = 0.0
+        self._login_failures = 0
+        self._refresh_task: Optional[asyncio.Task] = None
         
         # Initialize TOTP generator
-        if self.settings.groww_totp_seed:
-            self._totp_generator = pyotp.TOTP(self.settings.groww_totp_seed)
+        if credentials.totp_seed:
+            self._totp_generator = pyotp.TOTP(credentials.totp_seed)
         
     async def initialize(self) -> bool:
-        """Initialize the authentication manager"""
+        """Log in and start the background refresher"""
         try:
-            logger.info("Initializing Groww Authentication Manager")
-            
             # Validate configuration
-            if not self.settings.groww_api_key or not self.settings.groww_api_secret:
+            if not self.credentials.api_key or not self.credentials.api_secret:
                 raise ValueError("Groww API key and secret are required")
             
-            # Initialize API client
-            self._api_client = GrowwAPI()
-            
-            # Perform initial authentication
+            # Perform initial authentication, then keep the session fresh
+            # in the background (this also retries a failed first login)
             await self.authenticate()
+            self._start_refresher()
             
-            logger.info("Groww Authentication Manager initialized successfully")
             return True
             
         except Exception as e:
-            logger.error("Failed to initialize authentication manager", error=str(e))
+            self._logger.error("Failed to initialize Groww session", error=str(e))
             return False
     
     async def authenticate(self) -> bool:
@@ -64,97 +79,179 @@ class GrowwAuthenticationManager:
         Returns True if authentication successful, False otherwise
         """
         async with self._auth_lock:
-            try:
-                if not self._api_client:
-                    self._api_client = GrowwAPI()
-                
-                # Generate TOTP token
-                totp_token = None
-                if self._totp_generator:
-                    totp_token = self._totp_generator.now()
-                    logger.debug("Generated TOTP token for authentication")
-                
-                # Prepare authentication parameters
-                auth_params = {
-                    'api_key': self.settings.groww_api_key,
-                    'api_secret': self.settings.groww_api_secret,
-                }
-                
-                if totp_token:
-                    auth_params['totp'] = totp_token
-                
-                # Perform authentication
-                logger.info("Attempting authentication with Groww API")
-                
-                # Use the login method with TOTP
-                auth_response = await self._api_client.login(
-                    user_id=self.settings.groww_api_key,
-                    password="",  # Not used for API authentication
-                    totp=totp_token
-                )
-                
-                if auth_response and auth_response.get('status') == 'success':
-                    self._is_authenticated = True
-                    self._last_auth_time = datetime.now()
-                    self._session_data = auth_response.get('data', {})
-                    
-                    logger.info(
-                        "Authentication successful",
-                        session_id=self._session_data.get('session_id', 'unknown'),
-                        user_id=self._session_data.get('user_id', 'unknown')
+            return await self._login()
+    
+    async def _login(self) -> bool:
+        """
+        Log in on a fresh client and swap it in on success.
+        
+        The current session keeps serving requests while this runs and is
+        left untouched if the login fails. Caller must hold ``_auth_lock``.
+        """
+        success = await self._attempt_login()
+        # Counted here so the refresher backs off after any failed login,
+        # including the first one and those made on behalf of a request
+        self._login_failures = 0 if success else self._login_failures + 1
+        return success
+    
+    async def _attempt_login(self) -> bool:
+        """One login attempt on a fresh client; see ``_login``"""
+        # Imported here: the services package imports this module
+        from services.circuit_breaker import UpstreamError, get_breaker
+        
+        try:
+            client = sdk.GrowwAPI()
+            
+            # Generate TOTP token
+            totp_token = None
+            if self._totp_generator:
+                totp_token = self._totp_generator.now()
+                self._logger.debug("Generated TOTP token for authentication")
+            
+            # Prepare authentication parameters
+            auth_params = {
+                'api_key': self.credentials.api_key,
+                'api_secret': self.credentials.api_secret,
+            }
+            
+            if totp_token:
+                auth_params['totp'] = totp_token
+            
+            # Perform authentication
+            self._logger.info("Attempting authentication with Groww API")
+            
+            # Use the login method with TOTP
+            with span("auth.login"):
+                async with get_breaker(f"auth_login:{self.name}").guard(), upstream_call("auth_login") as call:
+                    auth_response = await client.login(
+                        user_id=self.credentials.api_key,
+                        password="",  # Not used for API authentication
+                        totp=totp_token
                     )
-                    
-                    return True
-                else:
-                    error_msg = auth_response.get('error', 'Unknown authentication error')
-                    logger.error("Authentication failed", error=error_msg)
-                    self._is_authenticated = False
-                    return False
-                    
-            except GrowwAPIAuthenticationException as e:
-                logger.error("Groww API authentication error", error=str(e))
-                self._is_authenticated = False
-                return False
-            except Exception as e:
-                logger.error("Unexpected authentication error", error=str(e), exc_info=True)
-                self._is_authenticated = False
-                return False
+                    if not auth_response or auth_response.get('status') != 'success':
+                        call.outcome = "api_error"
+                        # Raised inside the guard so the breaker counts the failed login
+                        error_msg = auth_response.get('error', 'Unknown authentication error') if auth_response else 'Empty response'
+                        raise UpstreamError("auth_login", error_msg)
+            
+            self._session_data = auth_response.get('data', {})
+            self._last_auth_time = datetime.now()
+            self._refresh_jitter = random.uniform(0, self.settings.auth_refresh_jitter_seconds)
+            self._api_client = client
+            self._is_authenticated = True
+            
+            self._logger.info(
+                "Authentication successful",
+                session_id=self._session_data.get('session_id', 'unknown'),
+                user_id=self._session_data.get('user_id', 'unknown')
+            )
+            
+            return True
+                
+        except UpstreamError as e:
+            self._logger.error("Authentication failed", error=str(e.error))
+            return False
+        except sdk.GrowwAPIAuthenticationException as e:
+            self._logger.error("Groww API authentication error", error=str(e))
+            return False
+        except Exception as e:
+            self._logger.error("Unexpected authentication error", error=str(e), exc_info=True)
+            return False
     
-    async def get_authenticated_client(self) -> Optional[GrowwAPI]:
+    async def get_authenticated_client(self) -> Optional["GrowwAPI"]:
         """
-        Get authenticated API client with automatic session management
+        Get the current authenticated API client.
+        
+        Sessions are renewed ahead of expiry by the background refresher,
+        so this is a plain read; it only logs in itself on a cold start or
+        if the session has lapsed because every refresh attempt failed.
         """
-        # Check if authentication is needed
-        if not self._is_authenticated or self._should_refresh_auth():
-            success = await self.authenticate()
-            if not success:
-                return None
+        client = self._api_client
+        if client is not None and self._is_authenticated and not self._session_expired():
+            return client
+        
+        async with self._auth_lock:
+            # A concurrent caller may have logged in while we waited
+            if not (self._is_authenticated and not self._session_expired()):
+                success = await self._login()
+                AUTH_REFRESHES.labels(account=self.name, trigger="request", result="success" if success else "failure").inc()
+                if not success:
+                    self._is_authenticated = False
+                    return None
         
         return self._api_client
     
+    def _session_age(self) -> Optional[timedelta]:
+        if not self._last_auth_time:
+            return None
+        return datetime.now() - self._last_auth_time
+    
+    def _session_expired(self) -> bool:
+        """Session is past its lifetime and may be rejected upstream"""
+        age = self._session_age()
+        return age is None or age > timedelta(hours=self.settings.auth_session_ttl_hours)
+    
     def _should_refresh_auth(self) -> bool:
         """
         Check if authentication should be refreshed
         """
-        if not self._last_auth_time:
-            return True
+        return self._seconds_until_refresh() <= 0
+    
+    def _seconds_until_refresh(self) -> float:
+        """Time until the session enters its refresh margin (jittered per session)"""
+        age = self._session_age()
+        if age is None or not self._is_authenticated:
+            return 0.0
         
-        # Refresh authentication every 8 hours as a safety measure
-        time_since_auth = datetime.now() - self._last_auth_time
-        return time_since_auth > timedelta(hours=8)
+        refresh_after = (
+            self.settings.auth_session_ttl_hours * 3600
+            - self.settings.auth_refresh_margin_seconds
+            - self._refresh_jitter
+        )
+        return max(0.0, refresh_after - age.total_seconds())
+    
+    def _start_refresher(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+    
+    async def _refresh_loop(self) -> None:
+        """Renew the session before it expires, retrying with jittered backoff"""
+        while True:
+            failures = self._login_failures
+            if failures:
+                # Full jitter keeps workers from retrying in lockstep
+                delay = random.uniform(0, min(
+                    self.settings.auth_retry_max_seconds,
+                    self.settings.auth_retry_base_seconds * 2 ** (failures - 1)
+                ))
+            else:
+                delay = self._seconds_until_refresh()
+            await asyncio.sleep(delay)
+            
+            success = await self.authenticate()
+            AUTH_REFRESHES.labels(account=self.name, trigger="background", result="success" if success else "failure").inc()
+            if not success:
+                self._logger.warning(
+                    "Background session refresh failed",
+                    failures=self._login_failures,
+                    session_expired=self._session_expired()
+                )
     
     async def refresh_authentication(self) -> bool:
         """
         Force refresh authentication
         """
-        logger.info("Forcing authentication refresh")
-        self._is_authenticated = False
+        self._logger.info("Forcing authentication refresh")
         return await self.authenticate()
     
     def is_authenticated(self) -> bool:
         """Check if currently authenticated"""
         return self._is_authenticated and self._api_client is not None
     
+    def is_ready(self) -> bool:
+        """Authenticated with a session that has not lapsed"""
+        return self.is_authenticated() and not self._session_expired()
+    
     async def get_session_info(self) -> Dict[str, Any]:
         """Get current session information"""
         return {
@@ -169,9 +266,13 @@ class GrowwAuthenticationManager:
         Logout and cleanup session
         """
         try:
+            if self._refresh_task is not None:
+                self._refresh_task.cancel()
+                self._refresh_task = None
+            
             if self._api_client and self._is_authenticated:
                 # Perform logout if API supports it
-                logger.info("Logging out from Groww API")
+                self._logger.info("Logging out from Groww API")
                 # Note: Actual logout implementation depends on Groww API
                 
             self._is_authenticated = False
@@ -179,11 +280,11 @@ class GrowwAuthenticationManager:
             self._session_data = {}
             self._api_client = None
             
-            logger.info("Logout successful")
+            self._logger.info("Logout successful")
             return True
             
         except Exception as e:
-            logger.error("Error during logout", error=str(e))
+            self._logger.error("Error during logout", error=str(e))
             return False
     
     async def validate_connection(self) -> bool:
@@ -200,41 +301,165 @@ class GrowwAuthenticationManager:
                 return False
             
             # Make a test API call (like getting user profile)
-            test_response = await client.get_profile()
+            async with upstream_call("profile") as call:
+                test_response = await client.get_profile()
+                if not test_response or test_response.get('status') != 'success':
+                    call.outcome = "api_error"
             
             if test_response and test_response.get('status') == 'success':
-                logger.debug("Connection validation successful")
+                self._logger.debug("Connection validation successful")
                 return True
             else:
-                logger.warning("Connection validation failed", response=test_response)
+                self._logger.warning("Connection validation failed", response=test_response)
                 return False
                 
         except Exception as e:
-            logger.error("Connection validation error", error=str(e))
+            self._logger.error("Connection validation error", error=str(e))
             return False
 
-# Global authentication manager instance
+class GrowwAuthenticationManager:
+    """
+    Manages the pool of Groww API sessions:
+    - The primary account, used for trading, portfolio and market data
+    - Optional extra accounts that only serve market data, each with its
+      own login, refresh cycle and (in the market data service) rate budget
+    """
+    
+    def __init__(self):
+        self.settings = get_settings()
+        self._primary = GrowwSession(GrowwCredentials(
+            name="primary",
+            api_key=self.settings.groww_api_key,
+            api_secret=self.settings.groww_api_secret,
+            totp_seed=self.settings.groww_totp_seed
+        ))
+        self._sessions: List[GrowwSession] = [self._primary] + [
+            GrowwSession(GrowwCredentials(**account))
+            for account in self.settings.get_groww_market_data_accounts()
+        ]
+    
+    async def initialize(self) -> bool:
+        """Initialize the authentication manager"""
+        try:
+            logger.info("Initializing Groww Authentication Manager", accounts=len(self._sessions))
+            
+            # Log all accounts in concurrently
+            results = await asyncio.gather(*(session.initialize() for session in self._sessions))
+            if not results[0]:
+                return False
+            
+            logger.info(
+                "Groww Authentication Manager initialized successfully",
+                ready_accounts=sum(session.is_ready() for session in self._sessions)
+            )
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to initialize authentication manager", error=str(e))
+            return False
+    
+    @property
+    def sessions(self) -> List[GrowwSession]:
+        return self._sessions
+    
+    @property
+    def last_auth_time(self) -> Optional[datetime]:
+        return self._primary._last_auth_time
+    
+    async def authenticate(self) -> bool:
+        """Authenticate the primary account"""
+        return await self._primary.authenticate()
+    
+    async def get_authenticated_client(self) -> Optional["GrowwAPI"]:
+        """Get the primary account's authenticated client"""
+        return await self._primary.get_authenticated_client()
+    
+    async def get_market_data_sessions(self) -> List[GrowwSession]:
+        """
+        Sessions currently able to serve market data. Falls back to a
+        cold-start login of the primary account when none is ready.
+        """
+        ready = [session for session in self._sessions if session.is_ready()]
+        if ready:
+            return ready
+        
+        if await self._primary.get_authenticated_client():
+            return [self._primary]
+        return []
+    
+    async def refresh_authentication(self) -> bool:
+        """
+        Force refresh authentication of all accounts
+        """
+        results = await asyncio.gather(*(session.refresh_authentication() for session in self._sessions))
+        return results[0]
+    
+    def is_authenticated(self) -> bool:
+        """Check if the primary account is authenticated"""
+        return self._primary.is_authenticated()
+    
+    async def get_session_info(self) -> Dict[str, Any]:
+        """Get current session information"""
+        info = await self._primary.get_session_info()
+        info['accounts'] = {
+            session.name: {
+                'authenticated': session.is_authenticated(),
+                'ready': session.is_ready()
+            }
+            for session in self._sessions
+        }
+        return info
+    
+    async def logout(self) -> bool:
+        """
+        Logout all accounts and cleanup sessions
+        """
+        results = await asyncio.gather(*(session.logout() for session in self._sessions))
+        return all(results)
+    
+    async def validate_connection(self) -> bool:
+        """
+        Validate that the primary account's API connection is working
+        """
+        return await self._primary.validate_connection()
+
+# Global authentication manager instance, published only once initialized
 _auth_manager: Optional[GrowwAuthenticationManager] = None
+_auth_manager_lock = asyncio.Lock()
 
 async def get_auth_manager() -> GrowwAuthenticationManager:
     """
-    Get or create the global authentication manager instance
+    Get or create the global authentication manager instance.
+    Raises RuntimeError if it fails to initialize; the next call retries.
     """
     global _auth_manager
     
     if _auth_manager is None:
-        _auth_manager = GrowwAuthenticationManager()
-        await _auth_manager.initialize()
+        async with _auth_manager_lock:
+            if _auth_manager is None:
+                auth_manager = GrowwAuthenticationManager()
+                if not await auth_manager.initialize():
+                    # Stop the refreshers of any accounts that did log in
+                    await auth_manager.logout()
+                    raise RuntimeError("Groww authentication manager failed to initialize")
+                _auth_manager = auth_manager
     
     return _auth_manager
 
-async def get_authenticated_groww_client() -> Optional[GrowwAPI]:
+async def get_authenticated_groww_client() -> Optional["GrowwAPI"]:
     """
     Convenience function to get authenticated Groww API client
     """
     auth_manager = await get_auth_manager()
     return await auth_manager.get_authenticated_client()
 
+async def get_market_data_sessions() -> List[GrowwSession]:
+    """
+    Convenience function to get the sessions available for market data
+    """
+    auth_manager = await get_auth_manager()
+    return await auth_manager.get_market_data_sessions()
+
 async def cleanup_auth() -> None:
     """
     Cleanup authentication resources
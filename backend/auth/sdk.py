@@ -0,0 +1,33 @@
+"""
+Groww SDK Loader
+Deferred access to the growwapi package
+
+Importing growwapi pulls in pandas, nats and aiohttp, which is about half
+of the application's import time. Modules reference SDK names through
+this module (``sdk.GrowwAPI``) so the package is only imported when a
+session first logs in or an SDK exception type is needed. Startup
+imports it on a worker thread before logging in, so that first access
+does not stall the event loop.
+"""
+
+import importlib
+from typing import Any
+
+# Exported name -> module defining it
+_SDK_NAMES = {
+    "GrowwAPI": "growwapi",
+    "GrowwAPIException": "growwapi.groww.exceptions",
+    "GrowwAPIAuthenticationException": "growwapi.groww.exceptions",
+    "GrowwAPIRateLimitException": "growwapi.groww.exceptions",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _SDK_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module), name)
+    # Cache on the module so later lookups skip this hook
+    globals()[name] = value
+    return value
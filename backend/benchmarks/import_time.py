@@ -0,0 +1,104 @@
+"""
+Import Time Benchmark
+Cold import cost of the application per module, from ``python -X importtime``
+
+Every run imports the target in a fresh interpreter (in a scratch working
+directory, so log files are not created in the tree) and the median over
+runs is reported. With ``--budget-ms`` the exit status is 1 when the
+median total exceeds the budget, and modules listed in ``--forbid`` (the
+lazily loaded SDK stack by default) fail the check if they are imported.
+
+Usage (from the backend directory):
+    python -m benchmarks.import_time --runs 5 --top 25
+    python -m benchmarks.import_time --budget-ms 1000
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (see auth/sdk.py); importing them eagerly is a regression
+DEFAULT_FORBIDDEN = "growwapi,pandas,nats,aiohttp"
+
+
+def run_once(module: str) -> Dict[str, Tuple[int, int]]:
+    """Import ``module`` in a new interpreter; returns name -> (self us, cumulative us)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=scratch,
+            env=env,
+            capture_output=True,
+            text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    timings: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.setdefault(name.strip(), (int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25, help="Modules to list, by cumulative time")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fail if the median cold import exceeds this")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN,
+                        help="Comma separated modules that must not be imported")
+    args = parser.parse_args()
+
+    samples: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    for _ in range(args.runs):
+        for name, timing in run_once(args.module).items():
+            samples[name].append(timing)
+
+    rows = sorted(
+        (
+            (statistics.median(c for _, c in timings) / 1000,
+             statistics.median(s for s, _ in timings) / 1000,
+             name)
+            for name, timings in samples.items()
+        ),
+        reverse=True
+    )
+    total_ms = statistics.median(c for _, c in samples[args.module]) / 1000
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_ms, self_ms, name in rows[:args.top]:
+        print(f"{cumulative_ms:14.1f} {self_ms:9.1f}  {name}")
+    print(f"\nimport {args.module}: {total_ms:.1f} ms median over {args.runs} runs, {len(samples)} modules")
+
+    failures = []
+    forbidden = [name for name in args.forbid.split(",") if name and name in samples]
+    if forbidden:
+        failures.append(f"eagerly imported: {', '.join(forbidden)}")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"{total_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    if args.budget_ms is not None:
+        print(f"OK: within budget of {args.budget_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Middleware Overhead Benchmark
+Requests/sec on a trivial endpoint with the legacy ``@app.middleware("http")``
+stack versus the pure ASGI middleware stack
+
+Usage (from the backend directory):
+    python -m benchmarks.middleware_overhead --requests 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import structlog
+from fastapi import FastAPI, Request
+
+from middleware import RateLimitMiddleware, RequestLoggingMiddleware
+from monitoring.metrics import REQUEST_COUNT, REQUEST_DURATION
+
+
+def build_legacy_app() -> FastAPI:
+    """Replica of the decorator-based stack previously used in main.py"""
+    app = FastAPI()
+    logger = structlog.get_logger("benchmark.legacy")
+
+    @app.middleware("http")
+    async def logging_middleware(request: Request, call_next):
+        start_time = time.time()
+        request_id = f"req_{int(time.time() * 1000000)}"
+        with structlog.contextvars.bound_contextvars(request_id=request_id):
+            logger.info("Request started", method=request.method, url=str(request.url),
+                        client_ip=request.client.host if request.client else None)
+            response = await call_next(request)
+            duration = time.time() - start_time
+            REQUEST_COUNT.labels(method=request.method, endpoint=request.url.path,
+                                 status_code=response.status_code).inc()
+            REQUEST_DURATION.labels(method=request.method, endpoint=request.url.path).observe(duration)
+            logger.info("Request completed", method=request.method, url=str(request.url),
+                        status_code=response.status_code, duration=f"{duration:.3f}s")
+            return response
+
+    @app.middleware("http")
+    async def rate_limiting_middleware(request: Request, call_next):
+        client_ip = request.client.host if request.client else "unknown"
+        return await call_next(request)
+
+    _add_endpoint(app)
+    return app
+
+
+def build_asgi_app() -> FastAPI:
+    """The pure ASGI stack as registered in main.create_app"""
+    app = FastAPI()
+    # Limiting does its full per-request work, but never rejects: a 429
+    # short-circuits the endpoint and would inflate the throughput
+    app.add_middleware(RateLimitMiddleware, limit=10 ** 9)
+    app.add_middleware(RequestLoggingMiddleware)
+    _add_endpoint(app)
+    return app
+
+
+def _add_endpoint(app: FastAPI) -> None:
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+
+async def _drive(app, total: int, concurrency: int) -> float:
+    """Call the ASGI app directly, bypassing any network stack"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8001),
+    }
+
+    never = asyncio.Event()
+
+    def make_receive():
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # Like a live connection, block until the client disconnects
+            await never.wait()
+
+        return receive
+
+    async def send(message):
+        pass
+
+    async def worker(count: int):
+        for _ in range(count):
+            await app(dict(scope), make_receive(), send)
+
+    # Warm up routing, metrics label caches and the logger
+    await worker(200)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(total // concurrency) for _ in range(concurrency)))
+    return (total // concurrency) * concurrency / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--log-level", default="WARNING",
+                        help="Log level while benchmarking (INFO includes log rendering cost)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.stdlib.filter_by_level,
+            structlog.processors.JSONRenderer()
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+    for name, builder in (("decorator middleware", build_legacy_app), ("pure ASGI middleware", build_asgi_app)):
+        rps = asyncio.run(_drive(builder(), args.requests, args.concurrency))
+        print(f"{name:<22} {rps:>10,.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,14 @@ Handles all environment variables, settings, and application configuration
 """
 
 import os
-from typing import List, Optional, Union
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
 from pydantic_settings import BaseSettings
 from pydantic import Field, validator
 from pathlib import Path
 import logging
 
-# Load environment variables from .env file
 from dotenv import load_dotenv
-load_dotenv()
 
 class Settings(BaseSettings):
     """
@@ -20,10 +19,15 @@ class Settings(BaseSettings):
     """
     
     # Groww API Configuration
-    groww_api_key: str = Field(..., env="GROWW_API_KEY")
-    groww_api_secret: str = Field(..., env="GROWW_API_SECRET")
+    # Checked when the primary session logs in, so the app can be imported
+    # (tooling, benchmarks) without credentials
+    groww_api_key: str = Field(default="", env="GROWW_API_KEY")
+    groww_api_secret: str = Field(default="", env="GROWW_API_SECRET")
     groww_totp_seed: Optional[str] = Field(None, env="GROWW_TOTP_SEED")
     groww_allowed_ip: Optional[str] = Field(None, env="GROWW_ALLOWED_IP")
+    # Extra accounts for market data only: "api_key:api_secret[:totp_seed]" entries, comma separated
+    groww_market_data_accounts: str = Field(default="", env="GROWW_MARKET_DATA_ACCOUNTS")
+    market_data_routing: str = Field(default="least_loaded", env="MARKET_DATA_ROUTING")
     
     # Database Configuration
     mongo_url: str = Field(default="mongodb://localhost:27017", env="MONGO_URL")
@@ -32,29 +36,134 @@ class Settings(BaseSettings):
     # Application Configuration
     environment: str = Field(default="development", env="ENVIRONMENT")
     secret_key: str = Field(default="change-this-secret-key", env="SECRET_KEY")
+    admin_token: Optional[str] = Field(None, env="ADMIN_TOKEN")
     debug: bool = Field(default=False, env="DEBUG")
     
     # Cache Configuration
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
     cache_ttl: int = Field(default=300, env="CACHE_TTL")
+    quote_table_enabled: bool = Field(default=True, env="QUOTE_TABLE_ENABLED")
+    quote_table_name: str = Field(default="aladdin_quotes", env="QUOTE_TABLE_NAME")
+    quote_table_capacity: int = Field(default=16384, ge=1, env="QUOTE_TABLE_CAPACITY")
+    cache_stale_multiplier: int = Field(default=5, ge=1, env="CACHE_STALE_MULTIPLIER")
+    
+    # Quote Poller Configuration
+    quote_poller_enabled: bool = Field(default=True, env="QUOTE_POLLER_ENABLED")
+    quote_poller_election: str = Field(default="file", env="QUOTE_POLLER_ELECTION")
+    quote_poller_leader_key: str = Field(default="aladdin_quote_poller", env="QUOTE_POLLER_LEADER_KEY")
+    quote_poller_lock_ttl_seconds: float = Field(default=10.0, env="QUOTE_POLLER_LOCK_TTL_SECONDS")
+    quote_poller_interval_seconds: float = Field(default=0.5, env="QUOTE_POLLER_INTERVAL_SECONDS")
+    quote_poller_max_interval_seconds: float = Field(default=10.0, env="QUOTE_POLLER_MAX_INTERVAL_SECONDS")
+    quote_poller_closed_interval_seconds: float = Field(default=60.0, env="QUOTE_POLLER_CLOSED_INTERVAL_SECONDS")
+    quote_poller_active_seconds: float = Field(default=60.0, env="QUOTE_POLLER_ACTIVE_SECONDS")
+    interest_half_life_seconds: float = Field(default=30.0, env="INTEREST_HALF_LIFE_SECONDS")
+    interest_lease_seconds: float = Field(default=10.0, env="INTEREST_LEASE_SECONDS")
+    interest_hold_seconds: float = Field(default=300.0, env="INTEREST_HOLD_SECONDS")
+    quote_poller_concurrency: int = Field(default=8, ge=1, env="QUOTE_POLLER_CONCURRENCY")
+    quote_bus_backend: str = Field(default="none", env="QUOTE_BUS_BACKEND")
+    quote_bus_subject: str = Field(default="aladdin", env="QUOTE_BUS_SUBJECT")
+    nats_url: str = Field(default="nats://localhost:4222", env="NATS_URL")
+    
+    # Instrument Master Configuration
+    instruments_file: str = Field(default="instruments.csv", env="INSTRUMENTS_FILE")
+    instruments_validate_symbols: bool = Field(default=True, env="INSTRUMENTS_VALIDATE_SYMBOLS")
+    
+    # Market Universe Configuration
+    market_universe_file: str = Field(default="ind_nifty500list.csv", env="MARKET_UNIVERSE_FILE")
+    market_universe_exchange: str = Field(default="NSE", env="MARKET_UNIVERSE_EXCHANGE")
+    market_universe_interval_seconds: float = Field(default=1.0, gt=0, env="MARKET_UNIVERSE_INTERVAL_SECONDS")
+    market_universe_refresh_seconds: float = Field(default=10.0, gt=0, env="MARKET_UNIVERSE_REFRESH_SECONDS")
+    market_universe_quotes_per_refresh: int = Field(default=20, ge=0, env="MARKET_UNIVERSE_QUOTES_PER_REFRESH")
+    market_universe_top_k: int = Field(default=10, ge=1, env="MARKET_UNIVERSE_TOP_K")
+    
+    # Streaming Configuration
+    stream_enabled: bool = Field(default=True, env="STREAM_ENABLED")
+    stream_interval_ms: float = Field(default=100.0, env="STREAM_INTERVAL_MS")
+    stream_max_messages_per_second: float = Field(default=50.0, gt=0, env="STREAM_MAX_MESSAGES_PER_SECOND")
+    stream_slow_consumer_seconds: float = Field(default=5.0, env="STREAM_SLOW_CONSUMER_SECONDS")
+    stream_slow_consumer_policy: str = Field(default="disconnect", env="STREAM_SLOW_CONSUMER_POLICY")
+    stream_max_symbols: int = Field(default=200, ge=1, env="STREAM_MAX_SYMBOLS")
+    stream_resync_seconds: float = Field(default=30.0, gt=0, env="STREAM_RESYNC_SECONDS")
+    
+    # Upstream (Groww) Configuration
+    auth_session_ttl_hours: float = Field(default=8.0, env="AUTH_SESSION_TTL_HOURS")
+    auth_refresh_margin_seconds: float = Field(default=3600.0, env="AUTH_REFRESH_MARGIN_SECONDS")
+    auth_refresh_jitter_seconds: float = Field(default=300.0, env="AUTH_REFRESH_JITTER_SECONDS")
+    auth_retry_base_seconds: float = Field(default=5.0, env="AUTH_RETRY_BASE_SECONDS")
+    auth_retry_max_seconds: float = Field(default=300.0, env="AUTH_RETRY_MAX_SECONDS")
+    upstream_rate_limit_max_wait: float = Field(default=0.5, env="UPSTREAM_RATE_LIMIT_MAX_WAIT")
+    circuit_failure_threshold: int = Field(default=5, ge=1, env="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_open_seconds: float = Field(default=5.0, env="CIRCUIT_OPEN_SECONDS")
+    circuit_max_open_seconds: float = Field(default=120.0, env="CIRCUIT_MAX_OPEN_SECONDS")
+    circuit_half_open_max_calls: int = Field(default=1, ge=1, env="CIRCUIT_HALF_OPEN_MAX_CALLS")
     
     # Rate Limiting Configuration
     rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
     rate_limit_redis_url: str = Field(default="redis://localhost:6379", env="RATE_LIMIT_REDIS_URL")
+    rate_limit_backend: str = Field(default="memory", env="RATE_LIMIT_BACKEND")
+    rate_limit_requests: int = Field(default=600, env="RATE_LIMIT_REQUESTS")
+    rate_limit_window_seconds: int = Field(default=60, env="RATE_LIMIT_WINDOW_SECONDS")
+    rate_limit_api_key_header: str = Field(default="X-API-Key", env="RATE_LIMIT_API_KEY_HEADER")
+    rate_limit_route_costs: str = Field(
+        default="/api/v1/market/historical:10,/api/v1/market/bulk:5,/api/v1/market/overview:3,/api/v1/market/quote:2,/api/v1/market/ltp:1",
+        env="RATE_LIMIT_ROUTE_COSTS"
+    )
+    rate_limit_exempt_paths: str = Field(default="/health,/metrics,/api/docs,/api/redoc,/api/openapi.json", env="RATE_LIMIT_EXEMPT_PATHS")
     
     # Logging Configuration
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     structured_logging: bool = Field(default=True, env="STRUCTURED_LOGGING")
+    async_logging: bool = Field(default=True, env="ASYNC_LOGGING")
+    log_queue_size: int = Field(default=10000, env="LOG_QUEUE_SIZE")
+    log_sample_rates: str = Field(default="/api/v1/market/ltp/{symbol}:0.01", env="LOG_SAMPLE_RATES")
+    log_slow_request_seconds: float = Field(default=1.0, env="LOG_SLOW_REQUEST_SECONDS")
     
     # Security Configuration
     allowed_hosts: str = Field(default="localhost,127.0.0.1", env="ALLOWED_HOSTS")
     cors_origins: str = Field(default="http://localhost:3000,http://127.0.0.1:3000", env="CORS_ORIGINS")
     
+    # Tracing Configuration
+    tracing_enabled: bool = Field(default=False, env="TRACING_ENABLED")
+    tracing_exporter: str = Field(default="file", env="TRACING_EXPORTER")
+    tracing_file_path: str = Field(default="logs/traces.jsonl", env="TRACING_FILE_PATH")
+    tracing_otlp_endpoint: str = Field(default="http://localhost:4318/v1/traces", env="TRACING_OTLP_ENDPOINT")
+    tracing_slow_threshold_ms: float = Field(default=500.0, env="TRACING_SLOW_THRESHOLD_MS")
+    tracing_max_spans_per_trace: int = Field(default=256, env="TRACING_MAX_SPANS_PER_TRACE")
+    
+    # Startup Configuration
+    startup_retry_max_seconds: float = Field(default=30.0, env="STARTUP_RETRY_MAX_SECONDS")
+    
+    # Event Loop Monitoring Configuration
+    loop_monitor_enabled: bool = Field(default=True, env="LOOP_MONITOR_ENABLED")
+    loop_monitor_interval_ms: float = Field(default=100.0, env="LOOP_MONITOR_INTERVAL_MS")
+    loop_blocked_threshold_ms: float = Field(default=250.0, env="LOOP_BLOCKED_THRESHOLD_MS")
+    
+    # Profiling Configuration
+    profiler_max_seconds: float = Field(default=60.0, env="PROFILER_MAX_SECONDS")
+    profiler_interval_ms: float = Field(default=5.0, env="PROFILER_INTERVAL_MS")
+    profiler_always_on: bool = Field(default=False, env="PROFILER_ALWAYS_ON")
+    profiler_always_on_interval_ms: float = Field(default=100.0, env="PROFILER_ALWAYS_ON_INTERVAL_MS")
+    profiler_window_seconds: float = Field(default=300.0, env="PROFILER_WINDOW_SECONDS")
+    
+    # Metrics Configuration
+    prometheus_multiproc_dir: Optional[str] = Field(default=None, env="PROMETHEUS_MULTIPROC_DIR")
+    
     # Performance Configuration
     max_workers: int = Field(default=4, env="MAX_WORKERS")
     keepalive_timeout: int = Field(default=65, env="KEEPALIVE_TIMEOUT")
     graceful_timeout: int = Field(default=30, env="GRACEFUL_TIMEOUT")
     
+    # Compression Configuration
+    compression_enabled: bool = Field(default=True, env="COMPRESSION_ENABLED")
+    compression_minimum_size: int = Field(default=1024, env="COMPRESSION_MINIMUM_SIZE")
+    compression_level: int = Field(default=6, ge=1, le=9, env="COMPRESSION_LEVEL")
+    compression_content_types: str = Field(
+        default="application/json,application/vnd.aladdin.columnar+json,application/vnd.aladdin.columnar,text/plain,text/csv",
+        env="COMPRESSION_CONTENT_TYPES"
+    )
+    compression_cache_entries: int = Field(default=256, env="COMPRESSION_CACHE_ENTRIES")
+    compression_cache_max_bytes: int = Field(default=32 * 1024 * 1024, env="COMPRESSION_CACHE_MAX_BYTES")
+    
     # API Configuration
     api_version: str = "v1"
     api_prefix: str = "/api"
@@ -75,6 +184,34 @@ class Settings(BaseSettings):
     def get_cors_origins(self) -> List[str]:
         return [origin.strip() for origin in self.cors_origins.split(',')]
     
+    def get_rate_limit_exempt_paths(self) -> List[str]:
+        return [path.strip() for path in self.rate_limit_exempt_paths.split(',') if path.strip()]
+    
+    def get_log_sample_rates(self) -> Dict[str, float]:
+        rates = {}
+        for item in self.log_sample_rates.split(','):
+            route, _, rate = item.strip().rpartition(':')
+            if route:
+                rates[route.strip()] = float(rate)
+        return rates
+    
+    def get_groww_market_data_accounts(self) -> List[Dict[str, Optional[str]]]:
+        accounts = []
+        entries = [entry.strip() for entry in self.groww_market_data_accounts.split(',') if entry.strip()]
+        for index, item in enumerate(entries, 1):
+            api_key, _, rest = item.partition(':')
+            api_secret, _, totp_seed = rest.partition(':')
+            accounts.append({
+                "name": f"account{index}",
+                "api_key": api_key,
+                "api_secret": api_secret,
+                "totp_seed": totp_seed or None
+            })
+        return accounts
+    
+    def get_compression_content_types(self) -> List[str]:
+        return [content_type.strip() for content_type in self.compression_content_types.split(',')]
+    
     @validator('log_level')
     def validate_log_level(cls, v):
         valid_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
@@ -82,6 +219,41 @@ class Settings(BaseSettings):
             raise ValueError(f'Log level must be one of: {valid_levels}')
         return v.upper()
     
+    @validator('rate_limit_backend')
+    def validate_rate_limit_backend(cls, v):
+        valid_backends = ['memory', 'redis']
+        if v.lower() not in valid_backends:
+            raise ValueError(f'Rate limit backend must be one of: {valid_backends}')
+        return v.lower()
+    
+    @validator('market_data_routing')
+    def validate_market_data_routing(cls, v):
+        valid_routing = ['least_loaded', 'symbol_hash']
+        if v.lower() not in valid_routing:
+            raise ValueError(f'Market data routing must be one of: {valid_routing}')
+        return v.lower()
+    
+    @validator('quote_poller_election')
+    def validate_quote_poller_election(cls, v):
+        valid_elections = ['file', 'redis']
+        if v.lower() not in valid_elections:
+            raise ValueError(f'Quote poller election must be one of: {valid_elections}')
+        return v.lower()
+    
+    @validator('quote_bus_backend')
+    def validate_quote_bus_backend(cls, v):
+        valid_backends = ['none', 'redis', 'nats']
+        if v.lower() not in valid_backends:
+            raise ValueError(f'Quote bus backend must be one of: {valid_backends}')
+        return v.lower()
+    
+    @validator('stream_slow_consumer_policy')
+    def validate_stream_slow_consumer_policy(cls, v):
+        valid_policies = ['disconnect', 'conflate']
+        if v.lower() not in valid_policies:
+            raise ValueError(f'Stream slow consumer policy must be one of: {valid_policies}')
+        return v.lower()
+    
     @validator('environment')
     def validate_environment(cls, v):
         valid_envs = ['development', 'testing', 'staging', 'production']
@@ -94,60 +266,62 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
         case_sensitive = False
 
-# Global settings instance
-settings = Settings()
-
+@lru_cache()
 def get_settings() -> Settings:
-    """Get application settings"""
-    return settings
+    """
+    Get application settings, loading ``.env`` and validating the
+    environment on first use rather than at import
+    """
+    load_dotenv()
+    return Settings()
 
-# Logging configuration
-LOGGING_CONFIG = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'default': {
-            'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        },
-        'structured': {
-            'format': '%(message)s',
-        },
-    },
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'structured' if settings.structured_logging else 'default',
-            'level': settings.log_level,
-        },
-        'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'logs/aladdin_trading.log',
-            'formatter': 'structured' if settings.structured_logging else 'default',
-            'level': settings.log_level,
+def get_logging_config() -> Dict[str, Any]:
+    """Logging configuration for ``logging.config.dictConfig``"""
+    settings = get_settings()
+    
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'default': {
+                'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            },
+            'structured': {
+                'format': '%(message)s',
+            },
         },
-    },
-    'root': {
-        'level': settings.log_level,
-        'handlers': ['console', 'file'],
-    },
-    'loggers': {
-        'aladdin': {
-            'level': settings.log_level,
-            'handlers': ['console', 'file'],
-            'propagate': False,
+        'handlers': {
+            'console': {
+                'class': 'logging.StreamHandler',
+                'formatter': 'structured' if settings.structured_logging else 'default',
+                'level': settings.log_level,
+            },
+            'file': {
+                'class': 'logging.FileHandler',
+                'filename': 'logs/aladdin_trading.log',
+                'formatter': 'structured' if settings.structured_logging else 'default',
+                'level': settings.log_level,
+            },
         },
-        'groww': {
+        'root': {
             'level': settings.log_level,
             'handlers': ['console', 'file'],
-            'propagate': False,
         },
-        'uvicorn': {
-            'level': 'INFO',
-            'handlers': ['console'],
-            'propagate': False,
+        'loggers': {
+            'aladdin': {
+                'level': settings.log_level,
+                'handlers': ['console', 'file'],
+                'propagate': False,
+            },
+            'groww': {
+                'level': settings.log_level,
+                'handlers': ['console', 'file'],
+                'propagate': False,
+            },
+            'uvicorn': {
+                'level': 'INFO',
+                'handlers': ['console'],
+                'propagate': False,
+            },
         },
-    },
-}
-
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
\ No newline at end of file
+    }
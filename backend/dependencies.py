@@ -3,17 +3,22 @@ FastAPI Dependencies
 Dependency injection for authentication, services, and utilities
 """
 
+import hmac
+
 import structlog
-from fastapi import Depends, HTTPException, Request
-from typing import Optional
+from fastapi import Depends, Header, HTTPException, Request
+from typing import TYPE_CHECKING, Optional
 
 from auth.groww_auth import get_authenticated_groww_client, get_auth_manager
 from services.market_data_service import get_market_data_service
-from growwapi import GrowwAPI
+from config import get_settings
+
+if TYPE_CHECKING:
+    from growwapi import GrowwAPI
 
 logger = structlog.get_logger(__name__)
 
-async def get_groww_client() -> GrowwAPI:
+async def get_groww_client() -> "GrowwAPI":
     """
     Dependency to get authenticated Groww API client
     """
@@ -34,7 +39,7 @@ async def get_groww_client() -> GrowwAPI:
         )
 
 async def get_authenticated_user_id(
-    groww_client: GrowwAPI = Depends(get_groww_client)
+    groww_client: "GrowwAPI" = Depends(get_groww_client)
 ) -> str:
     """
     Extract user ID from authenticated session
@@ -59,4 +64,23 @@ async def verify_authentication() -> bool:
         return auth_manager.is_authenticated()
     except Exception as e:
         logger.error("Authentication verification failed", error=str(e))
-        return False
\ No newline at end of file
+        return False
+
+async def require_admin(
+    x_admin_token: Optional[str] = Header(default=None)
+) -> None:
+    """
+    Guard for operational/debug endpoints.
+    Requires ADMIN_TOKEN via X-Admin-Token; without a configured token they
+    are only reachable in development.
+    """
+    settings = get_settings()
+    
+    if not settings.admin_token:
+        if settings.environment == "development":
+            return
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        logger.warning("Rejected admin request")
+        raise HTTPException(status_code=403, detail="Admin token required")
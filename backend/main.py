@@ -3,10 +3,15 @@ Advanced Aladdin Trading Platform - Main FastAPI Application
 Enterprise-grade trading platform with Groww API integration
 """
 
+import time
+
+# Reference point for cold-start-to-ready time: as close to process
+# (worker) start as we can get without platform-specific calls
+_PROCESS_STARTED = time.perf_counter()
+
 import asyncio
-import logging.config
+import importlib
 import os
-import time
 from contextlib import asynccontextmanager
 from typing import Dict, Any
 
@@ -16,55 +21,35 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
-from prometheus_client import Counter, Histogram, generate_latest
 from starlette.responses import Response
 
 # Import configurations and services
-from config import get_settings, LOGGING_CONFIG
+from config import get_settings, get_logging_config
 from auth.groww_auth import get_auth_manager, cleanup_auth
-from services.market_data_service import get_market_data_service
-from routers import market_data, portfolio, orders, analytics
+from services.market_data_service import get_market_data_service, stop_market_data_service
+from routers import market_data, portfolio, orders, analytics, debug, streaming
+from middleware import CompressionMiddleware, RateLimitMiddleware, RequestLoggingMiddleware
+from middleware.rate_limit import parse_route_costs
+from monitoring.metrics import render_metrics, prepare_multiprocess_dir, mark_worker_dead, STARTUP_READY_SECONDS
+from monitoring.log_pipeline import configure_logging
+from monitoring.tracing import configure_tracing, get_tracer, TracingMiddleware
+from monitoring.profiler import start_rolling_profiler, stop_rolling_profiler
+from monitoring.loop_monitor import start_loop_monitor, stop_loop_monitor
+from services.quote_table import create_quote_table, close_quote_table
+from services.instrument_master import load_instrument_master, get_instrument_master
+from services.symbol_search import build_symbol_search
+from services.market_universe import start_market_universe, stop_market_universe, get_market_universe
+from services.quote_poller import start_quote_poller, stop_quote_poller, get_quote_poller
+from services.stream_hub import start_stream_hub, stop_stream_hub, get_stream_hub
 
-# Configure structured logging
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
+# Configure structured, queue-backed logging
+configure_logging(
+    get_logging_config(),
+    async_logging=get_settings().async_logging,
+    queue_size=get_settings().log_queue_size
 )
-
-# Configure standard logging
-logging.config.dictConfig(LOGGING_CONFIG)
 logger = structlog.get_logger(__name__)
 
-# Prometheus metrics
-REQUEST_COUNT = Counter(
-    'aladdin_requests_total', 
-    'Total requests', 
-    ['method', 'endpoint', 'status_code']
-)
-REQUEST_DURATION = Histogram(
-    'aladdin_request_duration_seconds', 
-    'Request duration', 
-    ['method', 'endpoint']
-)
-ERROR_COUNT = Counter(
-    'aladdin_errors_total', 
-    'Total errors', 
-    ['error_type', 'endpoint']
-)
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
@@ -76,22 +61,25 @@ async def lifespan(app: FastAPI):
         environment=settings.environment
     )
     
+    init_task = None
     try:
-        # Initialize authentication manager
-        auth_manager = await get_auth_manager()
-        if not auth_manager.is_authenticated():
-            logger.warning("Authentication failed during startup")
-        else:
-            logger.info("Authentication successful during startup")
+        app.state.startup_time = time.time()
+        app.state.auth_manager = None
+        app.state.market_service = None
+        app.state.services_initialized = False
         
-        # Initialize market data service
-        market_service = await get_market_data_service()
-        logger.info("Market data service initialized")
+        # Watch this worker's event loop for lag and blocking callbacks
+        start_loop_monitor(settings)
         
-        # Store services in app state
-        app.state.auth_manager = auth_manager
-        app.state.market_service = market_service
-        app.state.startup_time = time.time()
+        # Optional always-on, low-rate stack sampling of this event loop
+        start_rolling_profiler(settings)
+        
+        # Fan quote table updates out to this worker's WebSocket clients
+        start_stream_hub(settings)
+        
+        # Upstream login and cache connections must not hold up serving:
+        # liveness is immediate, readiness follows the background init
+        init_task = asyncio.create_task(_initialize_services(app))
         
         logger.info("Application startup completed successfully")
         
@@ -103,9 +91,76 @@ async def lifespan(app: FastAPI):
     finally:
         # Cleanup on shutdown
         logger.info("Shutting down Aladdin Trading Platform")
+        if init_task is not None:
+            init_task.cancel()
+        await stop_stream_hub()
+        await stop_market_universe()
+        await stop_quote_poller()
+        await stop_market_data_service()
         await cleanup_auth()
+        await stop_loop_monitor()
+        stop_rolling_profiler()
+        close_quote_table()
+        tracer = get_tracer()
+        if tracer:
+            tracer.shutdown()
+        mark_worker_dead()
         logger.info("Application shutdown completed")
 
+async def _initialize_services(app: FastAPI) -> None:
+    """
+    Log in to Groww and connect the market data cache in the background,
+    retrying until both are up
+    """
+    settings = get_settings()
+    attempt = 0
+    
+    # Parsing the instruments file and indexing it for search take a
+    # while; keep the loop serving meanwhile
+    instrument_master = await asyncio.to_thread(load_instrument_master, settings)
+    if instrument_master is not None:
+        await asyncio.to_thread(build_symbol_search, instrument_master)
+    
+    # Constituents are checked against the instrument master, so after it
+    start_market_universe(settings)
+    
+    # The first login imports growwapi (with pandas and nats, about a
+    # second); import it on a thread so the loop keeps serving
+    try:
+        await asyncio.to_thread(importlib.import_module, "growwapi")
+    except Exception as e:
+        logger.error("Failed to import the Groww SDK", error=str(e))
+    
+    while True:
+        try:
+            # Initialize authentication manager and market data service concurrently
+            auth_manager, market_service = await asyncio.gather(
+                get_auth_manager(),
+                get_market_data_service()
+            )
+            app.state.auth_manager = auth_manager
+            app.state.market_service = market_service
+            app.state.services_initialized = True
+            break
+        except Exception as e:
+            attempt += 1
+            delay = min(settings.startup_retry_max_seconds, 2 ** attempt)
+            logger.error("Service initialization failed, retrying", error=str(e), attempt=attempt, retry_in=delay)
+            await asyncio.sleep(delay)
+    
+    # Competes for leadership; the elected worker polls upstream for all
+    await start_quote_poller(settings, market_service)
+    
+    if not auth_manager.is_authenticated():
+        # The session refresher keeps retrying; readiness follows it
+        logger.warning("Authentication failed during startup")
+        while not auth_manager.is_authenticated():
+            await asyncio.sleep(1)
+    
+    cold_start = time.perf_counter() - _PROCESS_STARTED
+    STARTUP_READY_SECONDS.set(cold_start)
+    logger.info("Application ready", cold_start_seconds=round(cold_start, 3))
+
 def create_app() -> FastAPI:
     """Create and configure FastAPI application"""
     settings = get_settings()
@@ -129,6 +184,30 @@ def create_app() -> FastAPI:
             allowed_hosts=allowed_hosts
         )
     
+    # Add response compression for large market data payloads
+    if settings.compression_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_size,
+            compress_level=settings.compression_level,
+            content_types=settings.get_compression_content_types(),
+            cache_entries=settings.compression_cache_entries,
+            cache_max_bytes=settings.compression_cache_max_bytes
+        )
+    
+    # Add rate limiting middleware
+    if settings.rate_limit_enabled:
+        app.add_middleware(
+            RateLimitMiddleware,
+            limit=settings.rate_limit_requests,
+            window_seconds=settings.rate_limit_window_seconds,
+            backend=settings.rate_limit_backend,
+            redis_url=settings.rate_limit_redis_url,
+            route_costs=parse_route_costs(settings.rate_limit_route_costs),
+            api_key_header=settings.rate_limit_api_key_header,
+            exempt_paths=settings.get_rate_limit_exempt_paths()
+        )
+    
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -136,86 +215,20 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Request-ID", "Retry-After", "X-RateLimit-Limit", "X-RateLimit-Remaining"],
     )
     
-    # Add custom middleware
-    @app.middleware("http")
-    async def logging_middleware(request: Request, call_next):
-        """Request/response logging and metrics middleware"""
-        start_time = time.time()
-        
-        # Generate request ID
-        request_id = f"req_{int(time.time() * 1000000)}"
-        
-        # Add request ID to context
-        with structlog.contextvars.bound_contextvars(request_id=request_id):
-            logger.info(
-                "Request started",
-                method=request.method,
-                url=str(request.url),
-                client_ip=request.client.host if request.client else None
-            )
-            
-            try:
-                response = await call_next(request)
-                duration = time.time() - start_time
-                
-                # Update metrics
-                REQUEST_COUNT.labels(
-                    method=request.method,
-                    endpoint=request.url.path,
-                    status_code=response.status_code
-                ).inc()
-                
-                REQUEST_DURATION.labels(
-                    method=request.method,
-                    endpoint=request.url.path
-                ).observe(duration)
-                
-                logger.info(
-                    "Request completed",
-                    method=request.method,
-                    url=str(request.url),
-                    status_code=response.status_code,
-                    duration=f"{duration:.3f}s"
-                )
-                
-                return response
-                
-            except Exception as e:
-                duration = time.time() - start_time
-                
-                # Update error metrics
-                ERROR_COUNT.labels(
-                    error_type=type(e).__name__,
-                    endpoint=request.url.path
-                ).inc()
-                
-                logger.error(
-                    "Request failed",
-                    method=request.method,
-                    url=str(request.url),
-                    error=str(e),
-                    duration=f"{duration:.3f}s",
-                    exc_info=True
-                )
-                
-                raise
+    # Add request tracing (root span per request, tail-sampled export)
+    tracer = configure_tracing(settings)
+    if tracer:
+        app.add_middleware(TracingMiddleware, tracer=tracer)
     
-    # Add rate limiting middleware
-    @app.middleware("http")
-    async def rate_limiting_middleware(request: Request, call_next):
-        """Rate limiting middleware"""
-        if not settings.rate_limit_enabled:
-            return await call_next(request)
-        
-        # Simple in-memory rate limiting (in production, use Redis)
-        client_ip = request.client.host if request.client else "unknown"
-        
-        # For now, just log and continue
-        # In production, implement proper rate limiting logic
-        
-        return await call_next(request)
+    # Add request logging and metrics middleware (outermost)
+    app.add_middleware(
+        RequestLoggingMiddleware,
+        sample_rates=settings.get_log_sample_rates(),
+        slow_request_seconds=settings.log_slow_request_seconds
+    )
     
     # Include API routers
     app.include_router(
@@ -242,6 +255,17 @@ def create_app() -> FastAPI:
         tags=["Analytics"]
     )
     
+    app.include_router(
+        debug.router,
+        prefix="/debug",
+        tags=["Debug"]
+    )
+    
+    app.include_router(
+        streaming.router,
+        tags=["Streaming"]
+    )
+    
     # Health check endpoints
     @app.get("/health")
     async def health_check():
@@ -280,6 +304,30 @@ def create_app() -> FastAPI:
                 }
             )
     
+    @app.get("/health/live")
+    async def liveness_check():
+        """Liveness probe: the worker is up and its event loop is serving"""
+        return {"status": "alive", "timestamp": time.time()}
+    
+    @app.get("/health/ready")
+    async def readiness_check():
+        """Readiness probe: upstream session and market data service are initialized"""
+        auth_manager = getattr(app.state, 'auth_manager', None)
+        checks = {
+            "services_initialized": getattr(app.state, 'services_initialized', False),
+            "authenticated": bool(auth_manager and auth_manager.is_authenticated())
+        }
+        ready = all(checks.values())
+        
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={
+                "status": "ready" if ready else "not_ready",
+                "checks": checks,
+                "timestamp": time.time()
+            }
+        )
+    
     @app.get("/health/detailed")
     async def detailed_health_check():
         """Detailed health check with service status"""
@@ -289,17 +337,29 @@ def create_app() -> FastAPI:
             # Add detailed service checks
             auth_manager = getattr(app.state, 'auth_manager', None)
             market_service = getattr(app.state, 'market_service', None)
+            quote_poller = get_quote_poller()
+            stream_hub = get_stream_hub()
+            instrument_master = get_instrument_master()
+            market_universe = get_market_universe()
             
             detailed_status = {
                 **(health_data.body if hasattr(health_data, 'body') else health_data),
                 "detailed_checks": {
                     "authentication": {
                         "status": "operational" if auth_manager and auth_manager.is_authenticated() else "degraded",
-                        "last_auth": str(auth_manager._last_auth_time) if auth_manager and auth_manager._last_auth_time else None
+                        "last_auth": str(auth_manager.last_auth_time) if auth_manager and auth_manager.last_auth_time else None,
+                        "accounts": {
+                            session.name: "operational" if session.is_ready() else "degraded"
+                            for session in auth_manager.sessions
+                        } if auth_manager else {}
                     },
                     "market_data_service": {
                         "status": "operational" if market_service else "unavailable",
-                        "cache_status": "operational"  # Would check Redis in production
+                        "cache_status": "operational",  # Would check Redis in production
+                        "instrument_master": instrument_master.snapshot() if instrument_master else None,
+                        "quote_poller": quote_poller.snapshot() if quote_poller else None,
+                        "market_universe": market_universe.snapshot() if market_universe else None,
+                        "streaming": stream_hub.snapshot() if stream_hub else None
                     },
                     "database": {
                         "status": "operational",  # Would check MongoDB connection
@@ -323,8 +383,9 @@ def create_app() -> FastAPI:
     
     @app.get("/metrics")
     async def metrics():
-        """Prometheus metrics endpoint"""
-        return Response(generate_latest(), media_type="text/plain")
+        """Prometheus metrics endpoint, aggregated across workers in multi-process mode"""
+        payload, content_type = render_metrics()
+        return Response(payload, media_type=content_type)
     
     @app.get("/")
     async def root():
@@ -344,7 +405,7 @@ def create_app() -> FastAPI:
             "HTTP exception",
             status_code=exc.status_code,
             detail=exc.detail,
-            url=str(request.url)
+            path=request.url.path
         )
         
         return JSONResponse(
@@ -353,7 +414,8 @@ def create_app() -> FastAPI:
                 "error": exc.detail,
                 "status_code": exc.status_code,
                 "timestamp": time.time()
-            }
+            },
+            headers=exc.headers
         )
     
     @app.exception_handler(Exception)
@@ -363,7 +425,7 @@ def create_app() -> FastAPI:
             "Unexpected exception",
             error=str(exc),
             error_type=type(exc).__name__,
-            url=str(request.url),
+            path=request.url.path,
             exc_info=True
         )
         
@@ -383,14 +445,25 @@ app = create_app()
 
 if __name__ == "__main__":
     settings = get_settings()
+    workers = 1 if settings.debug else settings.max_workers
     
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8001,
-        reload=settings.debug,
-        log_config=None,  # Use our custom logging config
-        workers=1 if settings.debug else settings.max_workers,
-        keepalive_timeout=settings.keepalive_timeout,
-        graceful_timeout=settings.graceful_timeout
-    )
\ No newline at end of file
+    # Workers inherit the metrics directory and /metrics aggregates their samples
+    if workers > 1:
+        prepare_multiprocess_dir(settings.prometheus_multiproc_dir)
+    # Workers (or this process alone) attach to the quote table it owns
+    quote_table = create_quote_table(settings)
+    
+    try:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8001,
+            reload=settings.debug,
+            log_config=None,  # Use our custom logging config
+            workers=workers,
+            keepalive_timeout=settings.keepalive_timeout,
+            graceful_timeout=settings.graceful_timeout
+        )
+    finally:
+        if quote_table:
+            close_quote_table()
\ No newline at end of file
@@ -0,0 +1,7 @@
+"""
+ASGI middleware for the Aladdin Trading Platform
+"""
+
+from .compression import CompressionMiddleware
+from .rate_limit import RateLimitMiddleware
+from .request_logging import RequestLoggingMiddleware
@@ -0,0 +1,236 @@
+"""
+Response Compression Middleware
+Gzip compression tuned for large market data payloads
+"""
+
+import gzip
+import hashlib
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from monitoring.metrics import COMPRESSION_BYTES, COMPRESSION_CACHE, COMPRESSION_CPU_SECONDS
+
+# Bodies above this size are compressed off the event loop
+_THREAD_OFFLOAD_SIZE = 256 * 1024
+
+
+class CompressedBodyCache:
+    """
+    Bounded LRU of compressed bodies keyed by a digest of the uncompressed
+    body. Hashing is an order of magnitude cheaper than gzip, so identical
+    payloads served from the market data cache are only compressed once.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def key_for(body: bytes, level: int) -> bytes:
+        return hashlib.blake2b(body, digest_size=16, person=b"gzip-%d" % level).digest()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: bytes, value: bytes) -> None:
+        if len(value) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = value
+        self._size += len(value)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI gzip middleware with a size threshold, a content-type
+    allowlist and a cache of compressed bodies for cacheable responses
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        compress_level: int = 6,
+        content_types: Iterable[str] = ("application/json",),
+        cache_entries: int = 256,
+        cache_max_bytes: int = 32 * 1024 * 1024
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compress_level = compress_level
+        self.content_types = frozenset(ct.strip().lower() for ct in content_types if ct.strip())
+        self.cache = CompressedBodyCache(cache_entries, cache_max_bytes) if cache_entries > 0 else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _accepts_gzip(scope):
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, scope, send)
+        await self.app(scope, receive, responder.send)
+
+    def compress(self, body: bytes) -> bytes:
+        """Compress a complete body, accounting CPU time to the metric"""
+        started = time.thread_time()
+        compressed = gzip.compress(body, compresslevel=self.compress_level, mtime=0)
+        COMPRESSION_CPU_SECONDS.inc(time.thread_time() - started)
+        return compressed
+
+    async def compress_body(self, body: bytes, cacheable: bool) -> bytes:
+        cache_key = None
+        if cacheable and self.cache is not None:
+            cache_key = CompressedBodyCache.key_for(body, self.compress_level)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                COMPRESSION_CACHE.labels(result="hit").inc()
+                return cached
+            COMPRESSION_CACHE.labels(result="miss").inc()
+
+        if len(body) >= _THREAD_OFFLOAD_SIZE:
+            # zlib releases the GIL, keep multi-MB payloads off the event loop
+            compressed = await anyio.to_thread.run_sync(self.compress, body)
+        else:
+            compressed = self.compress(body)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, compressed)
+        return compressed
+
+
+class _CompressionResponder:
+    """Per-request send wrapper deciding whether and how to compress"""
+
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, send: Send):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.started = False
+        self.compressor = None
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the start message until the first body chunk is seen
+            self.start_message = message
+            self.passthrough = not self._is_compressible(Headers(raw=message["headers"]))
+            return
+
+        if message_type != "http.response.body":
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            if not more_body:
+                await self._send_complete(message, body)
+            else:
+                await self._start_streaming(message, body)
+            return
+
+        # Subsequent chunks of a streaming response
+        started = time.thread_time()
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        COMPRESSION_CPU_SECONDS.inc(time.thread_time() - started)
+        COMPRESSION_BYTES.labels(direction="in").inc(len(body))
+        COMPRESSION_BYTES.labels(direction="out").inc(len(chunk))
+        await self._send({**message, "body": chunk})
+
+    def _is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return content_type in self.middleware.content_types
+
+    async def _flush_start(self) -> None:
+        if not self.started:
+            self.started = True
+            await self._send(self.start_message)
+
+    async def _send_complete(self, message: Message, body: bytes) -> None:
+        if len(body) < self.middleware.minimum_size:
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        compressed = await self.middleware.compress_body(body, self._is_cacheable())
+        COMPRESSION_BYTES.labels(direction="in").inc(len(body))
+        COMPRESSION_BYTES.labels(direction="out").inc(len(compressed))
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = "gzip"
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+
+        await self._flush_start()
+        await self._send({**message, "body": compressed})
+
+    async def _start_streaming(self, message: Message, body: bytes) -> None:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        del headers["Content-Length"]
+
+        # wbits=31 produces a gzip container
+        self.compressor = zlib.compressobj(self.middleware.compress_level, zlib.DEFLATED, 31)
+        started = time.thread_time()
+        chunk = self.compressor.compress(body)
+        COMPRESSION_CPU_SECONDS.inc(time.thread_time() - started)
+        COMPRESSION_BYTES.labels(direction="in").inc(len(body))
+        COMPRESSION_BYTES.labels(direction="out").inc(len(chunk))
+
+        await self._flush_start()
+        await self._send({**message, "body": chunk})
+
+    def _is_cacheable(self) -> bool:
+        if self.scope.get("method") not in ("GET", "HEAD") or self.start_message["status"] != 200:
+            return False
+        cache_control = Headers(raw=self.start_message["headers"]).get("cache-control", "").lower()
+        return "no-store" not in cache_control and "private" not in cache_control
+
+
+def _accepts_gzip(scope: Scope) -> bool:
+    """Check the Accept-Encoding header for a non-zero quality gzip coding"""
+    for coding in Headers(scope=scope).get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return _quality(params) > 0
+    return False
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
@@ -0,0 +1,306 @@
+"""
+Rate Limiting Middleware
+Per-client request limiting and quota enforcement at the ASGI layer
+"""
+
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from monitoring.metrics import RATE_LIMITED_COUNT
+
+logger = structlog.get_logger(__name__)
+
+# Atomic sliding-window check for the shared Redis mode. The previous
+# window's count is weighted by how much of it still overlaps the window.
+_REDIS_SLIDING_WINDOW = """
+local curr = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+local cost = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local weight = tonumber(ARGV[3])
+if prev * weight + curr + cost > limit then
+    return {0, curr, prev}
+end
+curr = redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return {1, curr, prev}
+"""
+
+# Most idle clients dropped from the in-memory table per new client
+_PRUNE_BATCH = 64
+
+# After a Redis failure, use the local limiter for this long before trying again
+_REDIS_RETRY_SECONDS = 5.0
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int = 0
+
+
+class SlidingWindowLimiter:
+    """
+    In-memory sliding-window counter.
+
+    Each client holds two fixed-window counters; the estimate is the current
+    count plus the previous count weighted by its remaining overlap, which
+    makes every check O(1) in time and memory. Clients are kept least
+    recently seen first, so idle ones are pruned from the front a few at
+    a time as new clients arrive.
+    """
+
+    def __init__(self, limit: int, window_seconds: int):
+        self.limit = limit
+        self.window = window_seconds
+        # client -> [window index, previous count, current count], least recently seen first
+        self._counters: "OrderedDict[str, List[int]]" = OrderedDict()
+
+    async def hit(self, client: str, cost: int, now: float) -> RateLimitDecision:
+        window_index, elapsed = divmod(now, self.window)
+        window_index = int(window_index)
+
+        counter = self._counters.get(client)
+        if counter is None:
+            self._prune(window_index)
+            counter = self._counters[client] = [window_index, 0, 0]
+        else:
+            self._counters.move_to_end(client)
+            if counter[0] != window_index:
+                # Roll the windows forward
+                counter[1] = counter[2] if counter[0] == window_index - 1 else 0
+                counter[2] = 0
+                counter[0] = window_index
+
+        weight = 1.0 - elapsed / self.window
+        return self._decide(counter, cost, weight, elapsed)
+
+    def _decide(self, counter: List[int], cost: int, weight: float, elapsed: float) -> RateLimitDecision:
+        _, previous, current = counter
+        estimated = previous * weight + current
+        if estimated + cost > self.limit:
+            return RateLimitDecision(
+                allowed=False,
+                limit=self.limit,
+                remaining=0,
+                retry_after=_retry_after(self.limit, self.window, previous, current, cost, elapsed)
+            )
+
+        counter[2] = current + cost
+        return RateLimitDecision(
+            allowed=True,
+            limit=self.limit,
+            remaining=max(0, int(self.limit - estimated - cost))
+        )
+
+    def _prune(self, window_index: int) -> None:
+        """Drop up to ``_PRUNE_BATCH`` clients idle for more than a full window"""
+        counters = self._counters
+        for _ in range(_PRUNE_BATCH):
+            if not counters:
+                return
+            # The front client is the least recently seen: once it is
+            # recent, every client after it is too
+            oldest = next(iter(counters.values()))
+            if oldest[0] >= window_index - 1:
+                return
+            counters.popitem(last=False)
+
+
+class RedisSlidingWindowLimiter:
+    """
+    Sliding-window counter shared across workers and hosts through Redis.
+
+    One script round trip per request; falls back to the local limiter if
+    Redis is unreachable so an outage never blocks all traffic, and stays
+    on it for ``_REDIS_RETRY_SECONDS`` after each failure so requests do
+    not each wait out a timeout.
+    """
+
+    def __init__(self, redis_url: str, limit: int, window_seconds: int, key_prefix: str = "ratelimit"):
+        import redis.asyncio as redis_asyncio
+
+        self.limit = limit
+        self.window = window_seconds
+        self.key_prefix = key_prefix
+        self._redis = redis_asyncio.from_url(redis_url, socket_connect_timeout=2, socket_timeout=2)
+        self._script = self._redis.register_script(_REDIS_SLIDING_WINDOW)
+        self._fallback = SlidingWindowLimiter(limit, window_seconds)
+        self._redis_available = True
+        self._retry_at = 0.0
+
+    async def hit(self, client: str, cost: int, now: float) -> RateLimitDecision:
+        window_index, elapsed = divmod(now, self.window)
+        window_index = int(window_index)
+        weight = 1.0 - elapsed / self.window
+
+        if not self._redis_available and time.monotonic() < self._retry_at:
+            return await self._fallback.hit(client, cost, now)
+
+        try:
+            allowed, current, previous = await self._script(
+                keys=[
+                    f"{self.key_prefix}:{client}:{window_index}",
+                    f"{self.key_prefix}:{client}:{window_index - 1}"
+                ],
+                args=[cost, self.limit, weight, self.window * 2]
+            )
+        except Exception as e:
+            if self._redis_available:
+                logger.warning("Rate limit Redis unavailable, using local limits", error=str(e))
+                self._redis_available = False
+            self._retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+            return await self._fallback.hit(client, cost, now)
+
+        if not self._redis_available:
+            logger.info("Rate limit Redis recovered")
+            self._redis_available = True
+
+        estimated = previous * weight + current
+        if not allowed:
+            return RateLimitDecision(
+                allowed=False,
+                limit=self.limit,
+                remaining=0,
+                retry_after=_retry_after(self.limit, self.window, previous, current, cost, elapsed)
+            )
+        return RateLimitDecision(
+            allowed=True,
+            limit=self.limit,
+            remaining=max(0, int(self.limit - estimated))
+        )
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI per-client rate limiting middleware.
+
+    Clients are identified by API key when one is supplied, otherwise by
+    IP. Each request consumes a route-dependent cost from the client's
+    budget; rejected requests get a 429 with ``Retry-After``.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit: int = 600,
+        window_seconds: int = 60,
+        backend: str = "memory",
+        redis_url: Optional[str] = None,
+        route_costs: Optional[Dict[str, int]] = None,
+        api_key_header: str = "X-API-Key",
+        exempt_paths: Iterable[str] = ()
+    ) -> None:
+        self.app = app
+        self.backend = backend
+        self.api_key_header = api_key_header.lower().encode("latin-1")
+        self.exempt_paths = tuple(exempt_paths)
+        self.route_costs = {prefix.rstrip("/"): cost for prefix, cost in (route_costs or {}).items()}
+        self._max_cost_depth = max((prefix.count("/") for prefix in self.route_costs), default=0)
+
+        if backend == "redis" and redis_url:
+            self.limiter = RedisSlidingWindowLimiter(redis_url, limit, window_seconds)
+        else:
+            self.limiter = SlidingWindowLimiter(limit, window_seconds)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        decision = await self.limiter.hit(
+            self._client_key(scope),
+            self._route_cost(scope["path"]),
+            time.time()
+        )
+
+        if not decision.allowed:
+            RATE_LIMITED_COUNT.labels(backend=self.backend).inc()
+            await self._reject(decision, send)
+            return
+
+        limit_headers = [
+            (b"x-ratelimit-limit", str(decision.limit).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+        ]
+
+        async def send_with_limit_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *limit_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_limit_headers)
+
+    def _client_key(self, scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == self.api_key_header and value:
+                # Never keep raw API keys in the counter table or Redis
+                return "key:" + hashlib.blake2b(value, digest_size=12).hexdigest()
+
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    def _route_cost(self, path: str) -> int:
+        """Longest matching configured prefix, bounded by the deepest rule"""
+        if not self.route_costs:
+            return 1
+
+        segments = path.rstrip("/").split("/")[:self._max_cost_depth + 1]
+        for depth in range(len(segments), 1, -1):
+            cost = self.route_costs.get("/".join(segments[:depth]))
+            if cost is not None:
+                return cost
+        return 1
+
+    async def _reject(self, decision: RateLimitDecision, send: Send) -> None:
+        body = json.dumps({
+            "error": "Rate limit exceeded",
+            "status_code": 429,
+            "retry_after": decision.retry_after,
+            "timestamp": time.time()
+        }).encode("utf-8")
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(decision.retry_after).encode()),
+                (b"x-ratelimit-limit", str(decision.limit).encode()),
+                (b"x-ratelimit-remaining", b"0"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _retry_after(limit: int, window: int, previous: int, current: int, cost: int, elapsed: float) -> int:
+    """Seconds until the weighted estimate leaves room for ``cost``"""
+    headroom = limit - current - cost
+    if headroom < 0 or previous <= 0:
+        # Nothing decays within this window; wait for it to roll over
+        wait = window - elapsed
+    else:
+        # previous * (1 - (elapsed + t) / window) <= headroom
+        wait = window * (1 - headroom / previous) - elapsed
+    return max(1, math.ceil(wait))
+
+
+def parse_route_costs(spec: str) -> Dict[str, int]:
+    """Parse ``/path/prefix:cost`` pairs separated by commas"""
+    costs: Dict[str, int] = {}
+    for item in spec.split(","):
+        prefix, _, cost = item.strip().rpartition(":")
+        if prefix and cost.strip().isdigit():
+            costs[prefix.strip()] = int(cost)
+    return costs
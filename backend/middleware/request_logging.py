@@ -0,0 +1,154 @@
+"""
+Request Logging Middleware
+Request IDs, structured request logs and Prometheus request metrics
+"""
+
+import random
+import time
+import uuid
+from typing import Dict, Optional
+
+import structlog
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from monitoring.metrics import ERROR_COUNT, LOG_RECORDS_SAMPLED_OUT, REQUEST_COUNT, REQUEST_DURATION
+
+logger = structlog.get_logger(__name__)
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Metric label for requests that matched no route, so probes and scanners
+# cannot create unbounded label values
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestLoggingMiddleware:
+    """
+    Pure ASGI request logging and metrics middleware.
+
+    Runs inline in the request task (no extra task or body wrapping as with
+    ``@app.middleware("http")``), propagates or assigns an ``X-Request-ID``
+    and binds it to the structlog context for the duration of the request.
+
+    Completion lines for hot routes can be sampled via ``sample_rates``
+    (route template -> fraction logged); server errors and requests slower
+    than ``slow_request_seconds`` are always logged.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rates: Optional[Dict[str, float]] = None,
+        slow_request_seconds: float = 1.0
+    ) -> None:
+        self.app = app
+        self.sample_rates = sample_rates or {}
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        request_id = _get_request_id(scope)
+        status_code = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        client = scope.get("client")
+
+        with structlog.contextvars.bound_contextvars(request_id=request_id):
+            logger.debug(
+                "Request started",
+                method=method,
+                path=path,
+                client_ip=client[0] if client else None
+            )
+
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            except Exception as e:
+                duration = time.perf_counter() - start_time
+
+                # Update error metrics
+                ERROR_COUNT.labels(
+                    error_type=type(e).__name__,
+                    endpoint=route_template(scope)
+                ).inc()
+
+                logger.error(
+                    "Request failed",
+                    method=method,
+                    path=path,
+                    error=str(e),
+                    duration=f"{duration:.3f}s",
+                    exc_info=True
+                )
+
+                raise
+
+            duration = time.perf_counter() - start_time
+            endpoint = route_template(scope)
+
+            # Update metrics
+            REQUEST_COUNT.labels(
+                method=method,
+                endpoint=endpoint,
+                status_code=status_code
+            ).inc()
+
+            REQUEST_DURATION.labels(
+                method=method,
+                endpoint=endpoint
+            ).observe(duration)
+
+            sample_rate = self.sample_rates.get(endpoint, 1.0)
+            if (
+                sample_rate < 1.0
+                and status_code < 500
+                and duration < self.slow_request_seconds
+                and random.random() >= sample_rate
+            ):
+                LOG_RECORDS_SAMPLED_OUT.labels(endpoint=endpoint).inc()
+                return
+
+            logger.info(
+                "Request completed",
+                method=method,
+                path=path,
+                status_code=status_code,
+                duration=f"{duration:.3f}s",
+                client_ip=client[0] if client else None,
+                sample_rate=sample_rate
+            )
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Matched route template (``/api/v1/market/quote/{symbol}``) for a scope
+    that has been through the router, keeping metric cardinality bounded
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Plain Starlette routes (API docs) have fixed paths
+        return scope["path"]
+    return UNMATCHED_ROUTE
+
+
+def _get_request_id(scope: Scope) -> str:
+    """Reuse a caller-supplied request ID or generate a new one"""
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER:
+            return value.decode("latin-1")[:128]
+    return f"req_{uuid.uuid4().hex}"
@@ -0,0 +1,3 @@
+"""
+Observability: metrics, instrumentation and diagnostics
+"""
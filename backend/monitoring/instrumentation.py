@@ -0,0 +1,47 @@
+"""
+Upstream Call Instrumentation
+Latency and outcome accounting for calls to the Groww API
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from monitoring.metrics import UPSTREAM_LATENCY
+
+
+class UpstreamCall:
+    """Handle yielded by ``upstream_call`` so callers can refine the outcome"""
+
+    __slots__ = ("operation", "outcome")
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.outcome = "success"
+
+
+@asynccontextmanager
+async def upstream_call(operation: str) -> AsyncIterator[UpstreamCall]:
+    """
+    Time an upstream call and record it by operation and outcome.
+
+    Exceptions are classified as ``rate_limited``, ``timeout`` or ``error``;
+    a call that returns an unsuccessful payload can set ``call.outcome``.
+    """
+    call = UpstreamCall(operation)
+    started = time.perf_counter()
+    try:
+        yield call
+    except (asyncio.TimeoutError, TimeoutError):
+        call.outcome = "timeout"
+        raise
+    except Exception as e:
+        # Keep an outcome the caller already refined before raising
+        if call.outcome == "success":
+            call.outcome = "rate_limited" if "RateLimit" in type(e).__name__ else "error"
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(operation=operation, outcome=call.outcome).observe(
+            time.perf_counter() - started
+        )
@@ -0,0 +1,200 @@
+"""
+Asynchronous Logging Pipeline
+Queue-based, non-blocking log handlers and the structlog processor chain
+
+Application threads only build the event dict (context, level, logger
+name, timestamp) and enqueue the raw record on a bounded queue; a
+background listener thread renders it (exception formatting and JSON
+serialization) and does the I/O to console and file. When the queue is
+full, records are dropped and counted instead of stalling the event loop
+on a slow disk or pipe.
+"""
+
+import atexit
+import json
+import logging
+import logging.config
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Tuple
+
+import structlog
+
+from monitoring.metrics import LOG_QUEUE_DEPTH, LOG_RECORDS_DROPPED
+
+try:
+    import orjson
+except ImportError:  # optional faster serializer
+    orjson = None
+
+# Refresh the queue depth gauge every N records handled by a listener
+_DEPTH_SAMPLE_INTERVAL = 64
+
+_listeners: List[QueueListener] = []
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks; overflow is dropped and counted"""
+
+    def __init__(self, log_queue: "queue.Queue", pipeline: str):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The base class formats here, on the logging thread; the record
+        # never leaves the process, so hand it over as is
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(pipeline=self.pipeline).inc()
+
+
+class StructlogFormatter(logging.Formatter):
+    """
+    Renders structlog event dicts on the handler's thread, then applies
+    the handler's own format; other records pass through unchanged
+    """
+
+    _render_chain = (
+        structlog.processors.format_exc_info,
+        structlog.processors.UnicodeDecoder(),
+    )
+
+    def __init__(self, formatter: logging.Formatter):
+        super().__init__()
+        self._formatter = formatter
+
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            # Console and file share the record: render once
+            rendered = getattr(record, "_structlog_rendered", None)
+            if rendered is None:
+                event_dict = dict(record.msg)
+                for processor in self._render_chain:
+                    event_dict = processor(None, record.levelname.lower(), event_dict)
+                rendered = record._structlog_rendered = json_serializer(event_dict)
+            # The JSON carries any exception already
+            record = logging.makeLogRecord({
+                **record.__dict__, "msg": rendered, "args": None, "exc_info": None, "exc_text": None
+            })
+        return self._formatter.format(record)
+
+
+def capture_exc_info(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve ``exc_info=True`` while the exception is still being handled"""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+class BacklogQueueListener(QueueListener):
+    """Queue listener that reports its backlog and drains fully on stop"""
+
+    def __init__(self, log_queue: "queue.Queue", *handlers: logging.Handler, pipeline: str):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.pipeline = pipeline
+        self._handled = 0
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        self._handled += 1
+        if self._handled % _DEPTH_SAMPLE_INTERVAL == 0:
+            LOG_QUEUE_DEPTH.labels(pipeline=self.pipeline).set(self.queue.qsize())
+
+    def enqueue_sentinel(self) -> None:
+        # Block rather than lose the sentinel when the queue is full
+        self.queue.put(self._sentinel)
+
+
+def json_serializer(obj: Dict[str, Any], **kwargs: Any) -> str:
+    """Serialize a structlog event dict, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode("utf-8")
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+
+def configure_structlog() -> None:
+    """
+    Configure the structlog processor chain: what must be captured at the
+    call site; rendering is left to ``StructlogFormatter``
+    """
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            capture_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+
+def configure_logging(logging_config: Dict[str, Any], async_logging: bool = True, queue_size: int = 10000) -> None:
+    """
+    Apply the standard logging configuration and, when ``async_logging`` is
+    set, move every configured handler behind a bounded queue.
+
+    Loggers that share the same handler set share one queue and listener
+    thread, so routing (e.g. uvicorn to console only) is preserved.
+    """
+    # File handlers open their files during dictConfig
+    for handler_config in logging_config.get("handlers", {}).values():
+        filename = handler_config.get("filename")
+        if filename:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+
+    logging.config.dictConfig(logging_config)
+    configure_structlog()
+
+    loggers = [logging.getLogger()] + [
+        logging.getLogger(name) for name in logging_config.get("loggers", {})
+    ]
+    for target in loggers:
+        for handler in target.handlers:
+            if not isinstance(handler.formatter, StructlogFormatter):
+                handler.setFormatter(StructlogFormatter(handler.formatter or logging.Formatter()))
+
+    if not async_logging:
+        return
+
+    pipelines: Dict[Tuple[logging.Handler, ...], DroppingQueueHandler] = {}
+    for target in loggers:
+        handlers = tuple(h for h in target.handlers if not isinstance(h, QueueHandler))
+        if not handlers:
+            continue
+
+        queue_handler = pipelines.get(handlers)
+        if queue_handler is None:
+            pipeline = "+".join(h.get_name() or type(h).__name__ for h in handlers)
+            log_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+            queue_handler = DroppingQueueHandler(log_queue, pipeline)
+            listener = BacklogQueueListener(log_queue, *handlers, pipeline=pipeline)
+            listener.start()
+            _listeners.append(listener)
+            pipelines[handlers] = queue_handler
+
+        for handler in handlers:
+            target.removeHandler(handler)
+        target.addHandler(queue_handler)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener threads"""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,124 @@
+"""
+Event Loop Monitor
+Scheduling lag measurement and blocked-loop detection
+
+A heartbeat task sleeps for a fixed interval and records how late it
+wakes up; that delay is the time every other ready callback waited too.
+A watchdog thread watches the heartbeat and, when the loop has not run
+for longer than the threshold, logs the loop thread's current stack so
+the blocking call can be identified while it is still running.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+import structlog
+
+from monitoring.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+logger = structlog.get_logger(__name__)
+
+# Innermost frames included in a blocked-loop report
+_STACK_LIMIT = 30
+
+_monitor: Optional["LoopMonitor"] = None
+
+
+class LoopMonitor:
+    """Heartbeat task plus watchdog thread for one event loop"""
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start monitoring the running loop; call from the loop thread"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = self._loop.create_task(self._measure_lag())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+
+    async def _measure_lag(self) -> None:
+        loop = self._loop
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled - self.interval)
+            self._heartbeat = time.monotonic()
+            EVENT_LOOP_LAG.observe(lag)
+
+            if lag >= self.threshold:
+                logger.warning("Event loop lag", lag_ms=round(lag * 1000, 1))
+
+    def _watch(self) -> None:
+        poll_interval = min(self.interval, self.threshold) / 2
+        reported_heartbeat = None
+
+        while not self._stop.wait(poll_interval):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or heartbeat == reported_heartbeat:
+                continue
+
+            # Report each blocking episode once, with the stack as it is now
+            reported_heartbeat = heartbeat
+            EVENT_LOOP_BLOCKED.inc()
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                return
+            stack = "".join(traceback.format_stack(frame, limit=_STACK_LIMIT))
+            del frame
+
+            logger.warning(
+                "Event loop blocked",
+                blocked_ms=round(stalled * 1000, 1),
+                threshold_ms=round(self.threshold * 1000, 1),
+                stack=stack
+            )
+
+
+def start_loop_monitor(settings) -> Optional[LoopMonitor]:
+    """Start monitoring the running event loop when enabled in settings"""
+    global _monitor
+
+    if not settings.loop_monitor_enabled or _monitor is not None:
+        return _monitor
+
+    _monitor = LoopMonitor(
+        settings.loop_monitor_interval_ms / 1000,
+        settings.loop_blocked_threshold_ms / 1000
+    )
+    _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
@@ -0,0 +1,267 @@
+"""
+Prometheus Metrics Registry
+All application metrics, with multi-process aggregation across uvicorn workers
+
+prometheus_client decides between single- and multi-process value storage
+when it is first imported, based on ``PROMETHEUS_MULTIPROC_DIR``. Every
+metric is therefore defined here, and this module prepares that
+environment before importing the client.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Optional, Tuple
+
+# Read straight from the environment: building Settings here would make
+# every importer of the metrics need a complete configuration
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess
+)
+
+MULTIPROCESS_MODE = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Request metrics, labelled by matched route template
+REQUEST_COUNT = Counter(
+    'aladdin_requests_total',
+    'Total requests',
+    ['method', 'endpoint', 'status_code']
+)
+REQUEST_DURATION = Histogram(
+    'aladdin_request_duration_seconds',
+    'Request duration',
+    ['method', 'endpoint']
+)
+ERROR_COUNT = Counter(
+    'aladdin_errors_total',
+    'Total errors',
+    ['error_type', 'endpoint']
+)
+
+# API rate limiting
+RATE_LIMITED_COUNT = Counter(
+    'aladdin_rate_limited_requests_total',
+    'Requests rejected by the API rate limiter',
+    ['backend']
+)
+
+# Response compression
+COMPRESSION_CPU_SECONDS = Counter(
+    'aladdin_compression_cpu_seconds_total',
+    'CPU time spent compressing response bodies'
+)
+COMPRESSION_BYTES = Counter(
+    'aladdin_compression_bytes_total',
+    'Response bytes before and after compression',
+    ['direction']
+)
+COMPRESSION_CACHE = Counter(
+    'aladdin_compression_cache_total',
+    'Compressed body cache lookups',
+    ['result']
+)
+
+# Upstream (Groww) calls
+UPSTREAM_LATENCY = Histogram(
+    'aladdin_upstream_call_duration_seconds',
+    'Groww API call latency',
+    ['operation', 'outcome'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+UPSTREAM_RATE_LIMIT_WAIT = Histogram(
+    'aladdin_upstream_rate_limit_wait_seconds',
+    'Time spent waiting for a local upstream rate limit slot',
+    ['operation'],
+    buckets=(0.0, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+UPSTREAM_RATE_LIMIT_REJECTIONS = Counter(
+    'aladdin_upstream_rate_limit_rejections_total',
+    'Upstream calls refused by the local rate limiter',
+    ['operation']
+)
+
+# Upstream circuit breakers
+CIRCUIT_STATE = Gauge(
+    'aladdin_upstream_circuit_state',
+    'Circuit breaker state per operation family and account (0=closed, 1=half-open, 2=open)',
+    ['family'],
+    multiprocess_mode='livemax'
+)
+CIRCUIT_TRANSITIONS = Counter(
+    'aladdin_upstream_circuit_transitions_total',
+    'Circuit breaker state changes',
+    ['family', 'state']
+)
+CIRCUIT_REJECTIONS = Counter(
+    'aladdin_upstream_circuit_rejections_total',
+    'Upstream calls rejected without being sent because the circuit was open',
+    ['family']
+)
+
+# Upstream session management
+AUTH_REFRESHES = Counter(
+    'aladdin_auth_refresh_total',
+    'Groww session logins by account, trigger and result',
+    ['account', 'trigger', 'result']
+)
+
+UPSTREAM_ACCOUNT_CALLS = Counter(
+    'aladdin_upstream_account_calls_total',
+    'Market data calls routed to each Groww account',
+    ['account', 'operation']
+)
+
+# Shared-memory quote table
+QUOTE_TABLE_LOOKUPS = Counter(
+    'aladdin_quote_table_lookups_total',
+    'Shared quote table reads by freshness field and result',
+    ['field', 'result']
+)
+
+# Quote poller and bus
+QUOTE_POLLER_LEADER = Gauge(
+    'aladdin_quote_poller_leader',
+    'Whether this worker is the elected quote poller (summed: leaders on this host)',
+    multiprocess_mode='livesum'
+)
+QUOTE_POLLER_ACTIVE_SYMBOLS = Gauge(
+    'aladdin_quote_poller_active_symbols',
+    'Symbols with recent demand, refreshed by the quote poller',
+    multiprocess_mode='livemax'
+)
+QUOTE_POLLER_REFRESHES = Counter(
+    'aladdin_quote_poller_refreshes_total',
+    'Symbol refreshes by the quote poller by kind and result',
+    ['kind', 'result']
+)
+QUOTE_POLLER_CYCLE_SECONDS = Histogram(
+    'aladdin_quote_poller_cycle_seconds',
+    'Time to refresh all active symbols once',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+QUOTE_BUS_MESSAGES = Counter(
+    'aladdin_quote_bus_messages_total',
+    'Quote bus messages by subject and direction',
+    ['subject', 'direction']
+)
+
+# Streaming
+STREAM_CONNECTIONS = Gauge(
+    'aladdin_stream_connections',
+    'Open market data WebSocket connections',
+    multiprocess_mode='livesum'
+)
+STREAM_MESSAGES = Counter(
+    'aladdin_stream_messages_total',
+    'Market data messages queued to WebSocket clients',
+    ['type']
+)
+STREAM_DISCONNECTS = Counter(
+    'aladdin_stream_disconnects_total',
+    'Market data WebSocket connections closed, by reason',
+    ['reason']
+)
+STREAM_CONFLATED = Counter(
+    'aladdin_stream_conflated_total',
+    'Queued stream updates replaced by a newer update before being sent'
+)
+STREAM_SEND_LAG = Histogram(
+    'aladdin_stream_send_lag_seconds',
+    'Time from queueing a stream message until it was written to the socket',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+STREAM_SLOW_CONSUMERS = Counter(
+    'aladdin_stream_slow_consumers_total',
+    'Stream clients whose socket stopped draining, by action taken',
+    ['action']
+)
+
+# Market data cache
+CACHE_REQUESTS = Counter(
+    'aladdin_cache_requests_total',
+    'Market data cache lookups by key family and result',
+    ['family', 'result']
+)
+
+# Logging pipeline
+LOG_RECORDS_DROPPED = Counter(
+    'aladdin_log_records_dropped_total',
+    'Log records dropped because the logging queue was full',
+    ['pipeline']
+)
+LOG_QUEUE_DEPTH = Gauge(
+    'aladdin_log_queue_depth',
+    'Log records waiting to be written',
+    ['pipeline'],
+    multiprocess_mode='livesum'
+)
+LOG_RECORDS_SAMPLED_OUT = Counter(
+    'aladdin_log_records_sampled_out_total',
+    'Request log lines skipped by per-route sampling',
+    ['endpoint']
+)
+
+# Tracing
+TRACES_EXPORTED = Counter(
+    'aladdin_traces_exported_total',
+    'Traces kept by tail sampling and exported'
+)
+TRACES_DROPPED = Counter(
+    'aladdin_traces_dropped_total',
+    'Traces not exported',
+    ['reason']
+)
+
+# Event loop health
+EVENT_LOOP_LAG = Histogram(
+    'aladdin_event_loop_lag_seconds',
+    'Delay between when a loop callback was due and when it ran',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_BLOCKED = Counter(
+    'aladdin_event_loop_blocked_total',
+    'Episodes where the event loop did not run for longer than the threshold'
+)
+
+# Startup
+STARTUP_READY_SECONDS = Gauge(
+    'aladdin_startup_ready_seconds',
+    'Time from worker process start until upstream session and services were ready',
+    multiprocess_mode='max'
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render the exposition payload, aggregated across workers when enabled"""
+    if MULTIPROCESS_MODE:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def prepare_multiprocess_dir(path: Optional[str] = None) -> str:
+    """
+    Prepare a clean metrics directory before worker processes are spawned.
+
+    Must run in the supervising process; workers inherit the environment
+    variable and write their samples to per-process files in the directory.
+    """
+    path = path or os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.path.join(
+        tempfile.gettempdir(), "aladdin_metrics"
+    )
+    # Samples left by a previous run would be aggregated as live data
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def mark_worker_dead(pid: Optional[int] = None) -> None:
+    """Drop live gauge samples of an exiting worker"""
+    if MULTIPROCESS_MODE:
+        multiprocess.mark_process_dead(pid or os.getpid())
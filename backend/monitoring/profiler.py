@@ -0,0 +1,197 @@
+"""
+Statistical Stack Profiler
+In-process stack sampling with collapsed-stack (flamegraph) output
+
+A daemon thread periodically reads the event loop thread's current frame
+via ``sys._current_frames()`` and counts the stacks it sees. Nothing is
+hooked into the profiled code, so the cost is one frame walk per sample
+and is only paid while a sampler is running.
+
+Output is the collapsed format consumed by ``flamegraph.pl`` and
+speedscope: one ``frame;frame;frame count`` line per distinct stack.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Deeper stacks are truncated at the root end
+_MAX_STACK_DEPTH = 128
+
+# Leaf frames that mean the event loop is idle, waiting for I/O
+_IDLE_LEAVES = {("selectors.py", "select"), ("selectors.py", "poll")}
+
+_rolling: Optional["StackSampler"] = None
+_on_demand_lock = asyncio.Lock()
+
+
+class StackSampler:
+    """
+    Sample one thread's stack at a fixed interval.
+
+    With ``window_seconds`` set, samples are kept in ``bucket_seconds``
+    buckets and buckets older than the window are discarded, giving a
+    rolling profile of recent activity.
+    """
+
+    def __init__(
+        self,
+        thread_id: int,
+        interval: float,
+        include_idle: bool = False,
+        window_seconds: Optional[float] = None,
+        bucket_seconds: float = 10.0
+    ):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.include_idle = include_idle
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.samples = 0
+        self.idle_samples = 0
+        self._buckets: Deque[Tuple[float, Counter]] = deque()
+        self._labels: Dict[Tuple[object, int], str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _run(self) -> None:
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                # Profiled thread has exited
+                return
+            self._record(frame)
+            del frame
+
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay < 0:
+                # Fell behind (GIL contention); skip missed ticks
+                next_sample = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    def _record(self, frame) -> None:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+            self.idle_samples += 1
+            if not self.include_idle:
+                return
+
+        labels = []
+        labels_cache = self._labels
+        depth = 0
+        while frame is not None and depth < _MAX_STACK_DEPTH:
+            key = (frame.f_code, frame.f_lineno)
+            label = labels_cache.get(key)
+            if label is None:
+                label = labels_cache[key] = _frame_label(frame.f_code, frame.f_lineno)
+            labels.append(label)
+            frame = frame.f_back
+            depth += 1
+        labels.reverse()
+        stack = ";".join(labels)
+
+        now = time.monotonic()
+        with self._lock:
+            self.samples += 1
+            if not self._buckets or (
+                self.window_seconds is not None and now - self._buckets[-1][0] >= self.bucket_seconds
+            ):
+                self._buckets.append((now, Counter()))
+                if self.window_seconds is not None:
+                    while self._buckets and now - self._buckets[0][0] > self.window_seconds:
+                        self._buckets.popleft()
+            self._buckets[-1][1][stack] += 1
+
+    def collapsed(self) -> str:
+        """Collapsed stacks for all retained samples, hottest first"""
+        with self._lock:
+            merged: Counter = Counter()
+            for _, counts in self._buckets:
+                merged.update(counts)
+        return "\n".join(f"{stack} {count}" for stack, count in merged.most_common())
+
+
+def _frame_label(code, lineno: int) -> str:
+    filename = code.co_filename
+    # Keep the package directory for context without full site-packages paths
+    short = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+    return f"{code.co_name} ({short}:{lineno})"
+
+
+async def profile(seconds: float, interval: float, include_idle: bool = False) -> StackSampler:
+    """
+    Sample the calling event loop's thread for ``seconds``.
+
+    Only one on-demand profile runs per worker at a time; a concurrent
+    request raises ``RuntimeError``.
+    """
+    if _on_demand_lock.locked():
+        raise RuntimeError("A profile is already running in this worker")
+
+    async with _on_demand_lock:
+        sampler = StackSampler(threading.get_ident(), interval, include_idle=include_idle)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+
+    logger.info("Profile captured", seconds=seconds, samples=sampler.samples, idle_samples=sampler.idle_samples)
+    return sampler
+
+
+def start_rolling_profiler(settings) -> Optional[StackSampler]:
+    """
+    Start the always-on, low-rate profiler for the current (event loop)
+    thread when enabled in settings
+    """
+    global _rolling
+
+    if not settings.profiler_always_on or _rolling is not None:
+        return _rolling
+
+    _rolling = StackSampler(
+        threading.get_ident(),
+        settings.profiler_always_on_interval_ms / 1000,
+        window_seconds=settings.profiler_window_seconds
+    )
+    _rolling.start()
+    logger.info(
+        "Rolling profiler started",
+        interval_ms=settings.profiler_always_on_interval_ms,
+        window_seconds=settings.profiler_window_seconds
+    )
+    return _rolling
+
+
+def stop_rolling_profiler() -> None:
+    global _rolling
+
+    if _rolling is not None:
+        _rolling.stop()
+        _rolling = None
+
+
+def get_rolling_profiler() -> Optional[StackSampler]:
+    return _rolling
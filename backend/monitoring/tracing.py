@@ -0,0 +1,371 @@
+"""
+Lightweight Request Tracing
+Context-var based spans with tail sampling and background export
+
+Spans are only recorded inside an active trace (started per request by
+``TracingMiddleware``); elsewhere ``span()`` is a no-op. When the root span
+ends, the whole trace is kept only if it was slower than the configured
+threshold or failed, then handed to an exporter thread that writes JSON
+lines to a file or posts OTLP/HTTP JSON to a collector.
+"""
+
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from monitoring.metrics import TRACES_DROPPED, TRACES_EXPORTED
+
+logger = structlog.get_logger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("aladdin_current_span", default=None)
+
+_tracer: Optional["Tracer"] = None
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = (
+        "trace", "name", "span_id", "parent_id", "start_unix_ns",
+        "start_ns", "end_ns", "attributes", "error"
+    )
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_unix_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_ns": self.start_unix_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans recorded for one request"""
+
+    __slots__ = ("trace_id", "spans", "max_spans", "dropped_spans")
+
+    def __init__(self, trace_id: Optional[str], max_spans: int):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.max_spans = max_spans
+        self.dropped_spans = 0
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped_spans += 1
+
+
+class _SpanScope:
+    """Context manager activating a span for the current task"""
+
+    __slots__ = ("_name", "_attributes", "_span", "_token", "_trace", "_parent_id")
+
+    def __init__(self, name: str, attributes: Dict[str, Any], trace: Optional[Trace] = None,
+                 parent_id: Optional[str] = None):
+        self._name = name
+        self._attributes = attributes
+        self._trace = trace
+        self._parent_id = parent_id
+
+    def __enter__(self) -> Span:
+        parent = _current_span.get()
+        trace = self._trace or parent.trace
+        self._span = Span(trace, self._name, parent.span_id if parent else self._parent_id, self._attributes)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        span = self._span
+        span.end_ns = time.perf_counter_ns()
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        span.trace.add(span)
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP_SCOPE = _NoopScope()
+
+
+def span(name: str, **attributes: Any):
+    """Record a child span of the active span; no-op outside a trace"""
+    if _current_span.get() is None:
+        return _NOOP_SCOPE
+    return _SpanScope(name, attributes)
+
+
+def traced(name: str) -> Callable:
+    """Decorator recording a span around an async function"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with _SpanScope(name, {}):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current else None
+
+
+class FileSpanExporter:
+    """Append finished traces as JSON lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, traces: List[Trace]) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for trace in traces:
+                fh.write(json.dumps({
+                    "trace_id": trace.trace_id,
+                    "dropped_spans": trace.dropped_spans,
+                    "spans": [s.to_dict() for s in trace.spans]
+                }, default=str) + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Post traces to an OTLP/HTTP JSON collector endpoint (``/v1/traces``)"""
+
+    def __init__(self, endpoint: str, service_name: str = "aladdin-trading-platform", timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, traces: List[Trace]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "aladdin.tracing"},
+                    "spans": [_otlp_span(s) for trace in traces for s in trace.spans]
+                }]
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    end_unix_ns = s.start_unix_ns + (s.end_ns - s.start_ns)
+    otlp = {
+        "traceId": s.trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,
+        "startTimeUnixNano": str(s.start_unix_ns),
+        "endTimeUnixNano": str(end_unix_ns),
+        "attributes": [_otlp_attribute(k, v) for k, v in s.attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        otlp["parentSpanId"] = s.parent_id
+    return otlp
+
+
+class Tracer:
+    """Tail-sampling trace collector with a background export thread"""
+
+    def __init__(self, exporter, slow_threshold_ms: float, max_spans: int = 256,
+                 queue_size: int = 1000, batch_size: int = 64):
+        self.exporter = exporter
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_spans = max_spans
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def start_trace(self, name: str, trace_id: Optional[str] = None,
+                    parent_id: Optional[str] = None, **attributes: Any) -> _SpanScope:
+        return _SpanScope(name, attributes, trace=Trace(trace_id, self.max_spans), parent_id=parent_id)
+
+    def finish(self, root: Span) -> None:
+        """Tail sampling: keep slow or failed traces only"""
+        trace = root.trace
+        failed = root.attributes.get("status_code", 200) >= 500 or any(s.error for s in trace.spans)
+        if root.duration_ms < self.slow_threshold_ms and not failed:
+            TRACES_DROPPED.labels(reason="sampled_out").inc()
+            return
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            TRACES_DROPPED.labels(reason="queue_full").inc()
+
+    def _export_loop(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            batch = [trace]
+            while len(batch) < self.batch_size:
+                try:
+                    trace = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if trace is None:
+                    self._export(batch)
+                    return
+                batch.append(trace)
+            self._export(batch)
+
+    def _export(self, batch: List[Trace]) -> None:
+        try:
+            self.exporter.export(batch)
+            TRACES_EXPORTED.inc(len(batch))
+        except Exception as e:
+            TRACES_DROPPED.labels(reason="export_error").inc(len(batch))
+            logger.warning("Trace export failed", error=str(e), traces=len(batch))
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+def configure_tracing(settings) -> Optional[Tracer]:
+    """Create the process-wide tracer from settings (None when disabled)"""
+    global _tracer
+
+    if not settings.tracing_enabled:
+        return None
+
+    if settings.tracing_exporter == "otlp":
+        exporter = OTLPHttpSpanExporter(settings.tracing_otlp_endpoint)
+    else:
+        exporter = FileSpanExporter(settings.tracing_file_path)
+
+    _tracer = Tracer(
+        exporter,
+        slow_threshold_ms=settings.tracing_slow_threshold_ms,
+        max_spans=settings.tracing_max_spans_per_trace
+    )
+    return _tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware starting a root span per HTTP request.
+
+    Honours an incoming W3C ``traceparent`` header and returns the trace ID
+    in ``X-Trace-ID`` so a slow response can be matched to its trace.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Imported here to avoid a cycle with the middleware package
+        from middleware.request_logging import route_template
+
+        trace_id, parent_id = _parse_traceparent(scope)
+        root_scope = self.tracer.start_trace(
+            "http.request",
+            trace_id=trace_id,
+            parent_id=parent_id,
+            method=scope["method"],
+            path=scope["path"]
+        )
+
+        root = None
+        try:
+            with root_scope as root:
+                trace_header = root.trace.trace_id
+
+                async def send_with_trace_id(message: Message) -> None:
+                    if message["type"] == "http.response.start":
+                        root.set_attribute("status_code", message["status"])
+                        MutableHeaders(scope=message).append("X-Trace-ID", trace_header)
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_with_trace_id)
+                finally:
+                    root.name = f"{scope['method']} {route_template(scope)}"
+        finally:
+            if root is not None:
+                self.tracer.finish(root)
+
+
+def _parse_traceparent(scope: Scope):
+    """Extract (trace_id, parent span id) from a W3C traceparent header"""
+    for name, value in scope["headers"]:
+        if name == b"traceparent":
+            parts = value.decode("latin-1").split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+                return parts[1], parts[2]
+    return None, None
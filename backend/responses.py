@@ -0,0 +1,181 @@
+"""
+Response Encoding Helpers
+Content negotiation and compact columnar encodings for bulk market data
+"""
+
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+
+# Supported representations
+FORMAT_JSON = "json"
+FORMAT_COLUMNAR = "columnar"
+FORMAT_BINARY = "binary"
+FORMAT_ARROW = "arrow"
+
+MEDIA_TYPE_COLUMNAR = "application/vnd.aladdin.columnar+json"
+MEDIA_TYPE_BINARY = "application/vnd.aladdin.columnar"
+MEDIA_TYPE_ARROW = "application/vnd.apache.arrow.stream"
+
+_ACCEPT_FORMATS = {
+    MEDIA_TYPE_COLUMNAR: FORMAT_COLUMNAR,
+    MEDIA_TYPE_BINARY: FORMAT_BINARY,
+    "application/octet-stream": FORMAT_BINARY,
+    MEDIA_TYPE_ARROW: FORMAT_ARROW,
+    "application/vnd.apache.arrow.file": FORMAT_ARROW,
+}
+
+# Binary columnar layout:
+#   magic (4s) | version (u16) | reserved (u16) | header length (u32) | header JSON
+#   followed by 8-byte aligned little-endian column buffers
+BINARY_MAGIC = b"ALDC"
+BINARY_VERSION = 1
+_PREAMBLE = struct.Struct("<4sHHI")
+
+# Column dtypes: typecode for the array module and the numpy-style descriptor
+# advertised to clients
+_DTYPES = {
+    "f8": ("d", "<f8"),
+    "i8": ("q", "<i8"),
+}
+
+Column = Tuple[str, Sequence[Any]]
+
+
+def negotiate_format(request: Request, requested: Optional[str] = None) -> str:
+    """
+    Resolve the response representation from an explicit ``format`` query
+    parameter or, failing that, the first recognised ``Accept`` media type
+    """
+    if requested:
+        fmt = requested.lower()
+        if fmt not in (FORMAT_JSON, FORMAT_COLUMNAR, FORMAT_BINARY, FORMAT_ARROW):
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {requested}")
+        return fmt
+
+    accept = request.headers.get("accept", "")
+    for media_range in accept.split(","):
+        media_type = media_range.split(";", 1)[0].strip().lower()
+        fmt = _ACCEPT_FORMATS.get(media_type)
+        if fmt:
+            return fmt
+
+    return FORMAT_JSON
+
+
+def encode_columnar(
+    columns: Dict[str, Column],
+    meta: Dict[str, Any],
+    fmt: str
+) -> Response:
+    """
+    Encode a set of equal-length columns in the requested representation.
+
+    ``columns`` maps column name to ``(dtype, values)`` where dtype is one of
+    ``f8``, ``i8`` or ``str``.
+    """
+    if fmt == FORMAT_COLUMNAR:
+        body = {
+            **meta,
+            "columns": {name: list(values) for name, (_, values) in columns.items()}
+        }
+        return Response(
+            json.dumps(body, separators=(",", ":"), default=str),
+            media_type=MEDIA_TYPE_COLUMNAR
+        )
+
+    if fmt == FORMAT_BINARY:
+        return Response(_encode_binary(columns, meta), media_type=MEDIA_TYPE_BINARY)
+
+    if fmt == FORMAT_ARROW:
+        return Response(_encode_arrow(columns, meta), media_type=MEDIA_TYPE_ARROW)
+
+    raise ValueError(f"No columnar encoding for format: {fmt}")
+
+
+def _encode_binary(columns: Dict[str, Column], meta: Dict[str, Any]) -> bytes:
+    """Pack numeric columns as raw little-endian arrays behind a JSON header"""
+    buffers: List[bytes] = []
+    descriptors = []
+    offset = 0
+    length = 0
+
+    for name, (dtype, values) in columns.items():
+        length = len(values)
+        if dtype == "str":
+            # Strings are carried inline in the header
+            descriptors.append({"name": name, "dtype": "str", "values": list(values)})
+            continue
+
+        typecode, descr = _DTYPES[dtype]
+        data = array(typecode, values)
+        if sys.byteorder != "little":
+            data.byteswap()
+        raw = data.tobytes()
+        descriptors.append({
+            "name": name,
+            "dtype": descr,
+            "offset": offset,
+            "length": len(values)
+        })
+        padding = -len(raw) % 8
+        buffers.append(raw + b"\x00" * padding)
+        offset += len(raw) + padding
+
+    header = json.dumps(
+        {"meta": meta, "length": length, "columns": descriptors},
+        separators=(",", ":"),
+        default=str
+    ).encode("utf-8")
+    header += b" " * (-(len(header) + _PREAMBLE.size) % 8)
+
+    return b"".join([
+        _PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(header)),
+        header,
+        *buffers
+    ])
+
+
+def _encode_arrow(columns: Dict[str, Column], meta: Dict[str, Any]) -> bytes:
+    """Serialize columns as an Arrow IPC stream (requires pyarrow)"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(
+            status_code=406,
+            detail="Arrow encoding unavailable: pyarrow is not installed"
+        )
+
+    arrow_types = {"f8": pa.float64(), "i8": pa.int64(), "str": pa.string()}
+    table = pa.table(
+        {name: pa.array(values, type=arrow_types[dtype]) for name, (dtype, values) in columns.items()}
+    ).replace_schema_metadata(
+        {key: json.dumps(value, default=str) for key, value in meta.items()}
+    )
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def candle_columns(candles: List[List[Any]]) -> Dict[str, Column]:
+    """Transpose raw ``[ts_ms, open, high, low, close, volume]`` rows into columns"""
+    if candles:
+        timestamps, opens, highs, lows, closes, volumes = zip(*candles)
+    else:
+        timestamps = opens = highs = lows = closes = volumes = ()
+
+    return {
+        "timestamp": ("i8", timestamps),
+        "open_price": ("f8", opens),
+        "high_price": ("f8", highs),
+        "low_price": ("f8", lows),
+        "close_price": ("f8", closes),
+        "volume": ("i8", volumes),
+    }
@@ -5,4 +5,6 @@ API Router modules for FastAPI endpoints
 from . import market_data
 from . import portfolio  
 from . import orders
-from . import analytics
\ No newline at end of file
+from . import analytics
+from . import debug
+from . import streaming
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Debug API Endpoints
+Admin-only operational introspection
+"""
+
+from typing import Optional
+
+import structlog
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from config import get_settings
+from dependencies import require_admin
+from monitoring.profiler import get_rolling_profiler, profile
+from services.market_data_service import get_market_data_service, MarketDataService
+
+logger = structlog.get_logger(__name__)
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/cache")
+async def get_cache_debug(
+    market_service: MarketDataService = Depends(get_market_data_service)
+):
+    """Cache lookups by key family with entry counts and approximate memory"""
+    try:
+        return await market_service.get_cache_stats()
+    except Exception as e:
+        logger.error("Error in get_cache_debug endpoint", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def get_profile(
+    seconds: float = Query(default=10.0, gt=0, description="Sampling duration"),
+    interval_ms: Optional[float] = Query(default=None, ge=1, le=1000, description="Sampling interval"),
+    include_idle: bool = Query(default=False, description="Keep samples of the loop waiting for I/O")
+):
+    """
+    Sample this worker's event loop and return collapsed stacks
+    (``flamegraph.pl`` / speedscope input)
+    """
+    settings = get_settings()
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must not exceed {settings.profiler_max_seconds}"
+        )
+    
+    try:
+        sampler = await profile(
+            seconds,
+            (interval_ms or settings.profiler_interval_ms) / 1000,
+            include_idle=include_idle
+        )
+        return PlainTextResponse(
+            sampler.collapsed(),
+            headers={
+                "X-Profile-Samples": str(sampler.samples),
+                "X-Profile-Idle-Samples": str(sampler.idle_samples)
+            }
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error("Error in get_profile endpoint", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/profile/rolling", response_class=PlainTextResponse)
+async def get_rolling_profile():
+    """Collapsed stacks from the always-on profiler's rolling window"""
+    sampler = get_rolling_profiler()
+    if sampler is None:
+        raise HTTPException(status_code=404, detail="Rolling profiler is not enabled")
+    
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={
+            "X-Profile-Samples": str(sampler.samples),
+            "X-Profile-Window-Seconds": str(sampler.window_seconds)
+        }
+    )
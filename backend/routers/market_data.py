@@ -3,14 +3,22 @@ Market Data API Endpoints
 Real-time market data, quotes, and historical data
 """
 
+import math
+
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import List, Optional
 
 from services.market_data_service import get_market_data_service, MarketDataService
+from services.circuit_breaker import CircuitOpenError
+from services.instrument_master import UnknownInstrumentError
+from services.symbol_search import get_symbol_search
+from responses import (
+    FORMAT_JSON, negotiate_format, encode_columnar, candle_columns
+)
 from schemas.market_data import (
     MarketQuoteResponse, LTPResponse, OHLCResponse,
-    HistoricalDataResponse, MarketOverviewResponse
+    HistoricalDataResponse, MarketOverviewResponse, SymbolSearchResponse, SymbolSearchResult
 )
 
 logger = structlog.get_logger(__name__)
@@ -26,6 +34,10 @@ async def get_market_quote(
     """Get comprehensive market quote for a symbol"""
     try:
         return await market_service.get_market_quote(symbol, exchange, segment)
+    except UnknownInstrumentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
     except Exception as e:
         logger.error("Error in get_market_quote endpoint", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -40,25 +52,62 @@ async def get_last_traded_price(
     """Get Last Traded Price for a symbol"""
     try:
         return await market_service.get_ltp(symbol, exchange, segment)
+    except UnknownInstrumentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
     except Exception as e:
         logger.error("Error in get_ltp endpoint", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/historical/{symbol}", response_model=HistoricalDataResponse)
 async def get_historical_data(
+    request: Request,
     symbol: str,
     exchange: str = Query(default="NSE", description="Exchange (NSE/BSE)"),
     segment: str = Query(default="CASH", description="Market segment"),
     start_time: str = Query(..., description="Start time (YYYY-MM-DD or epoch)"),
     end_time: str = Query(..., description="End time (YYYY-MM-DD or epoch)"),
     interval: int = Query(default=1, description="Interval in minutes"),
+    format: Optional[str] = Query(default=None, description="Representation (json, columnar, binary, arrow)"),
     market_service: MarketDataService = Depends(get_market_data_service)
 ):
-    """Get historical candle data for a symbol"""
+    """
+    Get historical candle data for a symbol.
+
+    Besides the default JSON objects, candles can be returned as columnar
+    JSON arrays, raw little-endian binary columns or an Arrow IPC stream,
+    selected via ``format`` or the ``Accept`` header.
+    """
     try:
-        return await market_service.get_historical_data(
+        fmt = negotiate_format(request, format)
+        if fmt == FORMAT_JSON:
+            return await market_service.get_historical_data(
+                symbol, exchange, segment, start_time, end_time, interval
+            )
+        
+        candles = await market_service.get_historical_candles(
             symbol, exchange, segment, start_time, end_time, interval
         )
+        return encode_columnar(
+            candle_columns(candles),
+            meta={
+                "symbol": symbol,
+                "exchange": exchange,
+                "segment": segment,
+                "start_time": start_time,
+                "end_time": end_time,
+                "interval_minutes": interval,
+                "total_candles": len(candles)
+            },
+            fmt=fmt
+        )
+    except HTTPException:
+        raise
+    except UnknownInstrumentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
     except Exception as e:
         logger.error("Error in get_historical_data endpoint", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -74,20 +123,57 @@ async def get_market_overview(
         logger.error("Error in get_market_overview endpoint", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/search", response_model=SymbolSearchResponse)
+async def search_symbols(
+    q: str = Query(..., min_length=1, max_length=64, description="Symbol or company name prefix"),
+    limit: int = Query(default=10, ge=1, le=50, description="Maximum results"),
+    exchange: Optional[str] = Query(default=None, description="Only this exchange"),
+    segment: Optional[str] = Query(default=None, description="Only this segment")
+):
+    """Type-ahead search over the instrument master, ranked and typo tolerant"""
+    symbol_search = get_symbol_search()
+    if symbol_search is None:
+        raise HTTPException(status_code=503, detail="Instrument master not loaded")
+    
+    try:
+        results = [
+            SymbolSearchResult(
+                instrument_id=instrument.id,
+                symbol=instrument.symbol,
+                exchange=instrument.exchange,
+                segment=instrument.segment,
+                name=instrument.name,
+                isin=instrument.isin or None,
+                instrument_type=instrument.instrument_type or None,
+                match=match
+            )
+            for instrument, match in symbol_search.search(q, limit, exchange, segment)
+        ]
+        return SymbolSearchResponse(query=q, results=results, total=len(results))
+    except Exception as e:
+        logger.error("Error in search_symbols endpoint", query=q, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/bulk/ltp")
 async def get_bulk_ltp(
+    request: Request,
     symbols: str = Query(..., description="Comma-separated list of symbols"),
     exchange: str = Query(default="NSE", description="Exchange"),
     segment: str = Query(default="CASH", description="Segment"),
+    format: Optional[str] = Query(default=None, description="Representation (json, columnar, binary, arrow)"),
     market_service: MarketDataService = Depends(get_market_data_service)
 ):
     """Get LTP for multiple symbols"""
     try:
+        fmt = negotiate_format(request, format)
         symbol_list = [s.strip() for s in symbols.split(',') if s.strip()]
         
         if len(symbol_list) > 50:  # Limit bulk requests
             raise HTTPException(status_code=400, detail="Maximum 50 symbols allowed")
         
+        if fmt != FORMAT_JSON:
+            return await _bulk_ltp_columnar(market_service, symbol_list, exchange, segment, fmt)
+        
         results = {}
         for symbol in symbol_list:
             try:
@@ -102,6 +188,45 @@ async def get_bulk_ltp(
             "total_requested": len(symbol_list),
             "successful": len([r for r in results.values() if "error" not in r])
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Error in get_bulk_ltp endpoint", error=str(e))
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _bulk_ltp_columnar(
+    market_service: MarketDataService,
+    symbol_list: List[str],
+    exchange: str,
+    segment: str,
+    fmt: str
+):
+    """Build the columnar representation of a bulk LTP panel"""
+    symbol_column, ltp_column, timestamp_column = [], [], []
+    errors = {}
+    
+    for symbol in symbol_list:
+        try:
+            ltp_data = await market_service.get_ltp(symbol, exchange, segment)
+            symbol_column.append(symbol)
+            ltp_column.append(ltp_data.ltp)
+            timestamp_column.append(int(ltp_data.timestamp.timestamp() * 1000))
+        except Exception as e:
+            logger.warning("Failed to fetch LTP for symbol", symbol=symbol, error=str(e))
+            errors[symbol] = str(e)
+    
+    return encode_columnar(
+        {
+            "symbol": ("str", symbol_column),
+            "ltp": ("f8", ltp_column),
+            "timestamp": ("i8", timestamp_column)
+        },
+        meta={
+            "exchange": exchange,
+            "segment": segment,
+            "total_requested": len(symbol_list),
+            "successful": len(symbol_column),
+            "errors": errors
+        },
+        fmt=fmt
+    )
@@ -8,6 +8,10 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Body
 from typing import List, Optional
 from datetime import datetime
 
+from config import get_settings
+from services.interest_registry import get_interest_registry
+from services.quote_table import QuoteTable
+
 # Mock data - will be replaced with actual Groww API integration
 orders = [
     {
@@ -22,9 +26,24 @@ orders = [
     }
 ]
 
+# Orders in these states can still fill, so their instruments' prices are watched
+OPEN_ORDER_STATUSES = {"PENDING", "OPEN", "TRIGGER_PENDING", "PARTIALLY_FILLED"}
+
 logger = structlog.get_logger(__name__)
 router = APIRouter()
 
+def _hold_order_interest(source: str, order_list: List[dict]) -> None:
+    get_interest_registry().hold(
+        source,
+        [
+            QuoteTable.key(o['symbol'], o.get('exchange', 'NSE'), o.get('segment', 'CASH'))
+            for o in order_list
+            if o.get('status', '').upper() in OPEN_ORDER_STATUSES
+        ],
+        "ltp",
+        get_settings().interest_hold_seconds
+    )
+
 @router.post("/place")
 async def place_order(
     order_data: dict = Body(...)
@@ -53,6 +72,7 @@ async def place_order(
         }
         
         logger.info("Order placed successfully", order_id=new_order['id'], symbol=new_order['symbol'])
+        _hold_order_interest(f"order:{new_order['id']}", [new_order])
         
         return {
             "message": "Order placed successfully", 
@@ -74,6 +94,7 @@ async def get_orders(
     try:
         # TODO: Replace with actual Groww API integration
         filtered_orders = orders.copy()
+        _hold_order_interest("orders", filtered_orders)
         
         # Apply filters
         if status:
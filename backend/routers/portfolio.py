@@ -7,6 +7,10 @@ import structlog
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 
+from config import get_settings
+from services.interest_registry import get_interest_registry
+from services.quote_table import QuoteTable
+
 # Mock data - will be replaced with actual Groww API integration
 portfolios = [
     {
@@ -72,6 +76,14 @@ async def get_portfolio_holdings(portfolio_id: str):
         # TODO: Replace with actual Groww API integration
         portfolio_holdings = [h for h in holdings if h.get('portfolioId') == portfolio_id]
         
+        # Keep prices of held instruments warm while the portfolio is being viewed
+        get_interest_registry().hold(
+            f"holdings:{portfolio_id}",
+            [QuoteTable.key(h['symbol'], h.get('exchange', 'NSE'), h.get('segment', 'CASH')) for h in portfolio_holdings],
+            "ltp",
+            get_settings().interest_hold_seconds
+        )
+        
         return {
             "holdings": portfolio_holdings,
             "total_holdings": len(portfolio_holdings),
@@ -0,0 +1,163 @@
+"""
+Streaming API Endpoints
+Live LTP and quote updates over WebSocket
+
+Connect to ``/ws/market?encoding=json|delta|binary`` (default json).
+
+Client messages:
+    {"action": "subscribe", "symbols": ["RELIANCE"], "exchange": "NSE", "segment": "CASH", "mode": "ltp"}
+    {"action": "unsubscribe", "symbols": ["RELIANCE"], "exchange": "NSE", "segment": "CASH", "mode": "ltp"}
+
+With the json encoding, server messages are ``{"type": "ltp" | "quote", ...}``
+updates with the fields of the matching REST responses, plus ``subscribed``,
+``unsubscribed`` and ``error`` replies. ``mode`` defaults to "ltp";
+"quote" subscribers get full quotes and the LTP updates in between.
+Symbols the server has not served before are checked with one LTP fetch
+first; ones Groww does not know get an ``error`` reply.
+
+The delta and binary encodings open with a ``hello`` message listing the
+field names in index order, and ``subscribed`` replies map each symbol to
+its instrument ID (the instrument master's ID when one is loaded). Updates then carry only IDs and field indexes:
+
+    {"type": "snapshot" | "delta", "id": 17, "fields": [0, 2501.5, 12, 1718000000.0]}
+
+A snapshot replaces the client's state for the instrument, a delta updates
+the listed fields; missing prices are null. The binary encoding sends the
+same updates as binary frames: ``<BIH`` (1 = snapshot, 2 = delta,
+instrument ID, bitmask of field indexes) followed by one little-endian
+double per set bit, in index order, with NaN for missing prices. Control
+replies stay JSON text frames.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import structlog
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from config import get_settings
+from services.instrument_master import get_instrument_master, resolve_instrument
+from services.market_data_service import get_market_data_service
+from services.quote_table import FIELDS, QuoteTable, get_quote_table
+from services.stream_hub import ENCODINGS, KINDS, StreamConnection, StreamHub, get_stream_hub
+
+logger = structlog.get_logger(__name__)
+router = APIRouter()
+
+@router.websocket("/ws/market")
+async def market_stream(websocket: WebSocket):
+    """Subscribe to live market data for a set of symbols"""
+    settings = get_settings()
+    hub = get_stream_hub()
+
+    await websocket.accept()
+    if hub is None or get_quote_table() is None:
+        await websocket.close(code=1013, reason="Streaming unavailable")
+        return
+
+    encoding = websocket.query_params.get("encoding", "json").lower()
+    if encoding not in ENCODINGS:
+        await websocket.close(code=1003, reason=f"encoding must be one of: {list(ENCODINGS)}")
+        return
+
+    connection = StreamConnection(
+        websocket,
+        max_rate=settings.stream_max_messages_per_second,
+        slow_after=settings.stream_slow_consumer_seconds,
+        disconnect_slow=settings.stream_slow_consumer_policy == "disconnect",
+        encoding=encoding
+    )
+    hub.add(connection)
+    if encoding != "json":
+        connection.send(json.dumps({
+            "type": "hello",
+            "encoding": encoding,
+            "fields": list(FIELDS),
+            "resync_seconds": settings.stream_resync_seconds
+        }))
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                await _handle_message(hub, connection, json.loads(text), settings.stream_max_symbols)
+            except (ValueError, TypeError, AttributeError) as e:
+                connection.send(json.dumps({"type": "error", "message": str(e)}))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error("Error in market_stream endpoint", error=str(e))
+    finally:
+        await hub.remove(connection)
+
+async def _check_unseen(keys: List[str]) -> None:
+    """
+    Fetch the LTP of symbols that are neither in the instrument master nor
+    in the quote table, so a subscription is only taken for symbols Groww
+    knows; the fetch also gives them their table slot
+    """
+    master = get_instrument_master()
+    quote_table = get_quote_table()
+    unseen = [
+        key for key in keys
+        if (master is None or master.by_key(key) is None) and quote_table.slot(key) is None
+    ]
+    if not unseen:
+        return
+
+    market_service = await get_market_data_service()
+    results = await asyncio.gather(
+        *(market_service.get_ltp(*QuoteTable.split_key(key)) for key in unseen),
+        return_exceptions=True
+    )
+    failed = [QuoteTable.split_key(key)[0] for key, result in zip(unseen, results) if isinstance(result, Exception)]
+    if failed:
+        raise ValueError(f"Unknown or unavailable symbols: {failed}")
+
+async def _handle_message(
+    hub: StreamHub,
+    connection: StreamConnection,
+    message: Dict[str, Any],
+    max_symbols: int
+) -> None:
+    action = message.get("action")
+    symbols = message.get("symbols")
+    mode = message.get("mode", "ltp")
+    exchange = message.get("exchange", "NSE")
+    segment = message.get("segment", "CASH")
+
+    if action not in ("subscribe", "unsubscribe"):
+        raise ValueError("action must be 'subscribe' or 'unsubscribe'")
+    if not isinstance(symbols, list) or not all(isinstance(symbol, str) and symbol for symbol in symbols):
+        raise ValueError("symbols must be a list of symbol strings")
+    if mode not in KINDS:
+        raise ValueError(f"mode must be one of: {list(KINDS)}")
+
+    # Unknown symbols raise (a ValueError) when the instrument master validates them
+    keys = [resolve_instrument(symbol.upper(), exchange.upper(), segment.upper()).key for symbol in symbols]
+    if action == "subscribe":
+        new_keys = {(key, mode) for key in keys} - connection.subscriptions
+        if len(connection.subscriptions) + len(new_keys) > max_symbols:
+            raise ValueError(f"At most {max_symbols} subscriptions per connection")
+        await _check_unseen(keys)
+
+    reply = {
+        "type": f"{action}d",
+        "mode": mode,
+        "symbols": [QuoteTable.split_key(key)[0] for key in keys]
+    }
+    if action == "subscribe" and connection.encoding != "json":
+        # Resolve instrument IDs up front so the reply can name them
+        ids = {QuoteTable.split_key(key)[0]: hub.instrument_id(key) for key in keys}
+        missing = [symbol for symbol, instrument_id in ids.items() if instrument_id is None]
+        if missing:
+            raise ValueError(f"No instrument ID for: {missing}")
+        reply["ids"] = ids
+
+    # Acknowledge first, so snapshots of new subscriptions follow the reply
+    connection.send(json.dumps(reply))
+    for key in keys:
+        if action == "subscribe":
+            hub.subscribe(connection, key, mode)
+        else:
+            hub.unsubscribe(connection, key, mode)
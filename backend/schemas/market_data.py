@@ -110,6 +110,21 @@ class TopMoversResponse(BaseModel):
     most_active: List[Dict[str, Any]]
     timestamp: datetime
 
+class SymbolSearchResult(BaseModel):
+    instrument_id: int
+    symbol: str
+    exchange: str
+    segment: str
+    name: str
+    isin: Optional[str] = None
+    instrument_type: Optional[str] = None
+    match: str = Field(..., description="exact, symbol_prefix, name_prefix or typo")
+
+class SymbolSearchResponse(BaseModel):
+    query: str
+    results: List[SymbolSearchResult]
+    total: int
+
 class MarketOverviewResponse(BaseModel):
     indices: List[IndexData]
     sectors: List[SectorData]
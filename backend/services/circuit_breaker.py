@@ -0,0 +1,196 @@
+"""
+Upstream Circuit Breakers
+Closed/open/half-open breakers per Groww operation family and account
+
+A breaker opens after a run of consecutive failures, or immediately when
+Groww answers with a rate-limit error, and rejects calls without touching
+the network while open. Each time it re-opens, the open period doubles
+(with jitter, capped), so a struggling upstream sees exponentially less
+traffic; one successful probe in the half-open state closes it again.
+Requests Groww rejects as invalid (bad input, unknown symbol) show the
+upstream answering, so they count as successes rather than failures.
+"""
+
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import structlog
+
+from config import get_settings
+from monitoring.metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+logger = structlog.get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for CIRCUIT_STATE
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Call rejected locally because the upstream circuit is open"""
+
+    def __init__(self, family: str, retry_after: float):
+        super().__init__(f"Groww API circuit open for {family}, retry in {retry_after:.1f}s")
+        self.family = family
+        self.retry_after = retry_after
+
+
+class UpstreamError(Exception):
+    """Unsuccessful answer from a call that did not raise, counted as a failure"""
+
+    def __init__(self, family: str, error: object):
+        super().__init__(f"Groww API {family} failed: {error}")
+        self.family = family
+        self.error = error
+
+
+def is_client_error(error: Exception) -> bool:
+    """Whether Groww rejected the request itself (bad input, unknown symbol) rather than failing"""
+    name = type(error).__name__
+    return "BadRequest" in name or "NotFound" in name
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with exponential open periods"""
+
+    def __init__(
+        self,
+        family: str,
+        failure_threshold: int = 5,
+        open_seconds: float = 5.0,
+        max_open_seconds: float = 120.0,
+        half_open_max_calls: int = 1
+    ):
+        self.family = family
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._opened_until = 0.0
+        self._probes_in_flight = 0
+        CIRCUIT_STATE.labels(family=family).set(_STATE_VALUES[CLOSED])
+
+    def allows_call(self) -> bool:
+        """Whether ``check`` would let a call through now, without changing state"""
+        if self.state == OPEN:
+            return self._opened_until <= time.monotonic()
+        if self.state == HALF_OPEN:
+            return self._probes_in_flight < self.half_open_max_calls
+        return True
+
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_until - time.monotonic()) if self.state == OPEN else 0.0
+
+    def check(self) -> None:
+        """Raise ``CircuitOpenError`` if a call would be rejected right now"""
+        if self.state == OPEN:
+            remaining = self._opened_until - time.monotonic()
+            if remaining > 0:
+                CIRCUIT_REJECTIONS.labels(family=self.family).inc()
+                raise CircuitOpenError(self.family, remaining)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN and self._probes_in_flight >= self.half_open_max_calls:
+            CIRCUIT_REJECTIONS.labels(family=self.family).inc()
+            raise CircuitOpenError(self.family, self.open_seconds)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Run one upstream call through the breaker, recording its result"""
+        self.check()
+        probing = self.state == HALF_OPEN
+        if probing:
+            self._probes_in_flight += 1
+        try:
+            yield
+        except Exception as e:
+            if is_client_error(e):
+                # Groww answered; the request was at fault
+                self._on_success()
+            else:
+                self._on_failure(e)
+            raise
+        else:
+            self._on_success()
+        finally:
+            if probing:
+                self._probes_in_flight -= 1
+
+    def _on_success(self) -> None:
+        self._failures = 0
+        if self.state != CLOSED:
+            self._trips = 0
+            self._transition(CLOSED)
+
+    def _on_failure(self, error: Exception) -> None:
+        self._failures += 1
+        rate_limited = "RateLimit" in type(error).__name__
+        if self.state == HALF_OPEN or rate_limited or self._failures >= self.failure_threshold:
+            self._trip(error)
+
+    def _trip(self, error: Exception) -> None:
+        self._trips += 1
+        backoff = min(self.max_open_seconds, self.open_seconds * 2 ** (self._trips - 1))
+        # Equal jitter: at least half the backoff, so workers do not probe in lockstep
+        open_for = backoff / 2 + random.uniform(0, backoff / 2)
+        self._opened_until = time.monotonic() + open_for
+        self._failures = 0
+        self._transition(OPEN)
+
+        logger.warning(
+            "Upstream circuit opened",
+            family=self.family,
+            open_seconds=round(open_for, 2),
+            trips=self._trips,
+            error_type=type(error).__name__,
+            error=str(error)
+        )
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        if state == CLOSED:
+            logger.info("Upstream circuit closed", family=self.family)
+        self.state = state
+        CIRCUIT_STATE.labels(family=self.family).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(family=self.family, state=state).inc()
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "trips": self._trips,
+            "retry_after": self.retry_after
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(family: str) -> CircuitBreaker:
+    """Get or create the process-wide breaker for an operation family"""
+    breaker: Optional[CircuitBreaker] = _breakers.get(family)
+    if breaker is None:
+        settings = get_settings()
+        breaker = _breakers[family] = CircuitBreaker(
+            family,
+            failure_threshold=settings.circuit_failure_threshold,
+            open_seconds=settings.circuit_open_seconds,
+            max_open_seconds=settings.circuit_max_open_seconds,
+            half_open_max_calls=settings.circuit_half_open_max_calls
+        )
+    return breaker
+
+
+def get_breaker_states() -> Dict[str, Dict[str, object]]:
+    return {family: breaker.snapshot() for family, breaker in _breakers.items()}
@@ -0,0 +1,209 @@
+"""
+Instrument Master
+Tradable instruments with integer IDs and lookup indexes
+
+Loaded once per worker from a local copy of Groww's instruments file
+(https://growwapi-assets.groww.in/instruments/instrument.csv, or any CSV
+with at least the ``exchange``, ``segment`` and ``trading_symbol``
+columns). Instruments are numbered in file order, so every worker loading
+the same file agrees on IDs; exchange, segment and symbol strings are
+interned, and each instrument carries its precomputed quote table key.
+
+Indexes:
+
+    id                       list position
+    (exchange, segment,      dict, symbols upper-cased
+     symbol)
+    ISIN                     dict of the listings sharing it (NSE and BSE)
+
+Without a file every symbol is accepted as before; with one, lookups of
+unknown symbols raise ``UnknownInstrumentError`` when validation is on.
+"""
+
+import csv
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import structlog
+
+from services.quote_table import QuoteTable
+
+logger = structlog.get_logger(__name__)
+
+
+class UnknownInstrumentError(ValueError):
+    """Symbol not present in the instrument master"""
+
+    def __init__(self, symbol: str, exchange: str, segment: str):
+        super().__init__(f"Unknown instrument: {symbol} ({exchange} {segment})")
+        self.symbol = symbol
+        self.exchange = exchange
+        self.segment = segment
+
+
+@dataclass(frozen=True)
+class Instrument:
+    """One listing; ``id`` is None for symbols the master does not know"""
+
+    id: Optional[int]
+    exchange: str
+    segment: str
+    symbol: str
+    key: str
+    name: str = ""
+    isin: str = ""
+    instrument_type: str = ""
+    exchange_token: str = ""
+    lot_size: int = 1
+    tick_size: float = 0.05
+
+
+def _int(value: Optional[str], default: int) -> int:
+    try:
+        return int(float(value)) if value else default
+    except ValueError:
+        return default
+
+
+def _float(value: Optional[str], default: float) -> float:
+    try:
+        return float(value) if value else default
+    except ValueError:
+        return default
+
+
+class InstrumentMaster:
+    """Immutable set of instruments with hash indexes"""
+
+    def __init__(self, instruments: List[Instrument]):
+        self._instruments = instruments
+        self._by_listing: Dict[Tuple[str, str, str], Instrument] = {}
+        self._by_key: Dict[str, Instrument] = {}
+        self._by_isin: Dict[str, Tuple[Instrument, ...]] = {}
+
+        for instrument in instruments:
+            self._by_listing[(instrument.exchange, instrument.segment, instrument.symbol)] = instrument
+            self._by_key[instrument.key] = instrument
+            if instrument.isin:
+                self._by_isin[instrument.isin] = self._by_isin.get(instrument.isin, ()) + (instrument,)
+
+    @classmethod
+    def load(cls, path: str) -> "InstrumentMaster":
+        intern = sys.intern
+        instruments: List[Instrument] = []
+        seen = set()
+
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                exchange = intern((row.get("exchange") or "").strip().upper())
+                segment = intern((row.get("segment") or "").strip().upper())
+                symbol = intern((row.get("trading_symbol") or "").strip().upper())
+                if not (exchange and segment and symbol) or (exchange, segment, symbol) in seen:
+                    continue
+                seen.add((exchange, segment, symbol))
+
+                instruments.append(Instrument(
+                    id=len(instruments),
+                    exchange=exchange,
+                    segment=segment,
+                    symbol=symbol,
+                    key=intern(QuoteTable.key(symbol, exchange, segment)),
+                    name=(row.get("name") or "").strip(),
+                    isin=(row.get("isin") or "").strip().upper(),
+                    instrument_type=intern((row.get("instrument_type") or "").strip().upper()),
+                    exchange_token=(row.get("exchange_token") or "").strip(),
+                    lot_size=_int(row.get("lot_size"), 1),
+                    tick_size=_float(row.get("tick_size"), 0.05)
+                ))
+
+        return cls(instruments)
+
+    def __len__(self) -> int:
+        return len(self._instruments)
+
+    def __iter__(self) -> Iterator[Instrument]:
+        return iter(self._instruments)
+
+    def by_id(self, instrument_id: int) -> Optional[Instrument]:
+        if 0 <= instrument_id < len(self._instruments):
+            return self._instruments[instrument_id]
+        return None
+
+    def get(self, symbol: str, exchange: str = "NSE", segment: str = "CASH") -> Optional[Instrument]:
+        return self._by_listing.get((exchange.upper(), segment.upper(), symbol.upper()))
+
+    def by_key(self, key: str) -> Optional[Instrument]:
+        """Instrument for a quote table key ("EXCHANGE:SEGMENT:SYMBOL")"""
+        return self._by_key.get(key)
+
+    def by_isin(self, isin: str) -> Tuple[Instrument, ...]:
+        return self._by_isin.get(isin.upper(), ())
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "instruments": len(self._instruments),
+            "isins": len(self._by_isin)
+        }
+
+
+_master: Optional[InstrumentMaster] = None
+_validate = False
+
+
+def load_instrument_master(settings) -> Optional[InstrumentMaster]:
+    """
+    Load the instruments file named in settings; a missing file leaves
+    symbols unvalidated rather than failing startup
+    """
+    global _master, _validate
+
+    path = settings.instruments_file
+    if not path or not os.path.exists(path):
+        logger.warning("Instruments file not found, symbols are not validated", path=path)
+        return None
+
+    started = time.perf_counter()
+    try:
+        master = InstrumentMaster.load(path)
+    except Exception as e:
+        logger.error("Failed to load instruments file", path=path, error=str(e))
+        return None
+
+    _master = master
+    _validate = settings.instruments_validate_symbols
+    logger.info(
+        "Instrument master loaded",
+        path=path,
+        instruments=len(master),
+        load_seconds=round(time.perf_counter() - started, 3)
+    )
+    return master
+
+
+def get_instrument_master() -> Optional[InstrumentMaster]:
+    return _master
+
+
+def resolve_instrument(symbol: str, exchange: str = "NSE", segment: str = "CASH") -> Instrument:
+    """
+    The master's instrument for a requested symbol. Unknown symbols raise
+    ``UnknownInstrumentError`` when validating, and otherwise (or with no
+    master loaded) get an instrument without an ID, keyed as requested.
+    """
+    if _master is not None:
+        instrument = _master.get(symbol, exchange, segment)
+        if instrument is not None:
+            return instrument
+        if _validate:
+            raise UnknownInstrumentError(symbol, exchange, segment)
+
+    return Instrument(
+        id=None,
+        exchange=exchange,
+        segment=segment,
+        symbol=symbol,
+        key=QuoteTable.key(symbol, exchange, segment)
+    )
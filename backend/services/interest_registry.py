@@ -0,0 +1,102 @@
+"""
+Interest Registry
+Which symbols this worker's clients currently care about
+
+Interest comes in three shapes:
+
+    requests       REST lookups, counted per (key, kind)
+    references     reference-counted subscriptions held for as long as a
+                   client wants updates (streaming connections)
+    holds          sets of keys a source keeps alive for a TTL and replaces
+                   wholesale (holdings and open orders, refreshed on read)
+
+The quote poller drains the registry every cycle into the shared quote
+table (or the quote bus), where counts become request rates and held
+keys become short leases; anything nobody renews decays out on its own.
+"""
+
+import time
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, Set, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+InterestKey = Tuple[str, str]  # (quote table key, "ltp" | "quote")
+
+
+class InterestRegistry:
+    """Per-worker request counts, references and holds"""
+
+    def __init__(self):
+        self._requests: Dict[InterestKey, int] = defaultdict(int)
+        # (key, kind) -> source -> reference count
+        self._refs: Dict[InterestKey, Dict[str, int]] = {}
+        # source -> (keys, expires at)
+        self._holds: Dict[str, Tuple[FrozenSet[InterestKey], float]] = {}
+
+    def record_request(self, key: str, kind: str) -> None:
+        self._requests[(key, kind)] += 1
+
+    def acquire(self, key: str, kind: str, source: str) -> None:
+        """Take a reference on ``key`` for ``source``; pair with ``release``"""
+        sources = self._refs.setdefault((key, kind), {})
+        sources[source] = sources.get(source, 0) + 1
+
+    def release(self, key: str, kind: str, source: str) -> None:
+        sources = self._refs.get((key, kind))
+        if not sources or source not in sources:
+            logger.debug("Interest released without a reference", key=key, kind=kind, source=source)
+            return
+        sources[source] -= 1
+        if sources[source] <= 0:
+            del sources[source]
+            if not sources:
+                del self._refs[(key, kind)]
+
+    def hold(self, source: str, keys: Iterable[str], kind: str, ttl_seconds: float) -> None:
+        """Replace ``source``'s held keys; they stay held for ``ttl_seconds``"""
+        held = frozenset((key, kind) for key in keys)
+        if held:
+            self._holds[source] = (held, time.monotonic() + ttl_seconds)
+        else:
+            self._holds.pop(source, None)
+
+    def held(self) -> Set[InterestKey]:
+        """Keys with a live reference or hold, dropping expired holds"""
+        now = time.monotonic()
+        for source in [source for source, (_, expires) in self._holds.items() if expires <= now]:
+            del self._holds[source]
+
+        held = set(self._refs)
+        for keys, _ in self._holds.values():
+            held.update(keys)
+        return held
+
+    def drain(self) -> Tuple[Dict[InterestKey, int], Set[InterestKey]]:
+        """Request counts since the last drain, and the currently held keys"""
+        requests, self._requests = self._requests, defaultdict(int)
+        return requests, self.held()
+
+    def references(self, key: str, kind: str) -> int:
+        return sum(self._refs.get((key, kind), {}).values())
+
+    def snapshot(self) -> Dict[str, object]:
+        by_source: Dict[str, int] = defaultdict(int)
+        for sources in self._refs.values():
+            for source, count in sources.items():
+                by_source[source] += count
+        return {
+            "referenced_keys": len(self._refs),
+            "references_by_source": dict(by_source),
+            "holds": {source: len(keys) for source, (keys, _) in self._holds.items()},
+            "pending_request_keys": len(self._requests)
+        }
+
+
+_registry = InterestRegistry()
+
+
+def get_interest_registry() -> InterestRegistry:
+    return _registry
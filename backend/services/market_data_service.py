@@ -3,15 +3,30 @@ Advanced Market Data Service with Caching and Real-time Updates
 """
 
 import asyncio
+import hashlib
+import math
+import time
 import structlog
-from typing import List, Optional, Dict, Any, Union
+from collections import defaultdict, deque
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Union, Callable, Awaitable, Deque
 from datetime import datetime, timedelta
-from growwapi import GrowwAPI
-from growwapi.groww.exceptions import GrowwAPIException, GrowwAPIRateLimitException
-import redis
 import json
 
-from auth.groww_auth import get_authenticated_groww_client
+from auth import sdk
+from auth.groww_auth import GrowwSession, get_market_data_sessions
+from services.circuit_breaker import CircuitOpenError, UpstreamError, get_breaker
+from services.quote_table import QuoteTable, get_quote_table
+from services.instrument_master import resolve_instrument
+from services.market_universe import get_market_universe
+from services.interest_registry import get_interest_registry
+from services.market_hours import market_session
+from services.quote_poller import refresh_ceiling
+from monitoring.instrumentation import upstream_call
+from monitoring.tracing import span, traced
+from monitoring.metrics import (
+    CACHE_REQUESTS, CIRCUIT_REJECTIONS, UPSTREAM_ACCOUNT_CALLS,
+    UPSTREAM_RATE_LIMIT_WAIT, UPSTREAM_RATE_LIMIT_REJECTIONS
+)
 from schemas.market_data import (
     MarketQuoteResponse, LTPResponse, OHLCResponse, 
     HistoricalDataResponse, CandleData, TopMoversResponse,
@@ -19,6 +34,10 @@ from schemas.market_data import (
 )
 from config import get_settings
 
+if TYPE_CHECKING:
+    from growwapi import GrowwAPI
+    from redis.asyncio import Redis
+
 logger = structlog.get_logger(__name__)
 
 class MarketDataService:
@@ -29,30 +48,67 @@ class MarketDataService:
     
     def __init__(self):
         self.settings = get_settings()
-        self._redis_client: Optional[redis.Redis] = None
-        self._rate_limiter = RateLimiter()
+        self._redis_client: Optional["Redis"] = None
+        self._redis_task: Optional[asyncio.Task] = None
+        # One rate budget and in-flight count per Groww account
+        self._rate_limiters: Dict[str, RateLimiter] = defaultdict(RateLimiter)
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._cache_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
         
     async def initialize(self):
         """Initialize the market data service"""
         try:
-            # Initialize Redis connection for caching
-            self._redis_client = redis.from_url(self.settings.redis_url)
-            await self._test_redis_connection()
+            # Initialize Redis connection for caching. The cache is optional:
+            # without it requests go upstream, and a background task keeps
+            # trying to connect
+            if not await self._connect_redis():
+                self._redis_task = asyncio.create_task(self._reconnect_redis())
             
             logger.info("Market data service initialized successfully")
         except Exception as e:
             logger.error("Failed to initialize market data service", error=str(e))
             raise
     
-    async def _test_redis_connection(self):
-        """Test Redis connection"""
+    async def _connect_redis(self) -> bool:
+        """Connect and ping Redis; returns False (caching disabled) if it is unreachable"""
+        # Imported on first use to keep application import time down
+        from redis import asyncio as aioredis
+        
+        client = aioredis.from_url(
+            self.settings.redis_url,
+            socket_connect_timeout=2
+        )
         try:
-            await self._redis_client.ping()
-            logger.debug("Redis connection successful")
+            await client.ping()
         except Exception as e:
             logger.warning("Redis connection failed, caching disabled", error=str(e))
+            await client.aclose()
+            return False
+        
+        self._redis_client = client
+        logger.debug("Redis connection successful")
+        return True
+    
+    async def _reconnect_redis(self) -> None:
+        """Retry the Redis connection with backoff until it succeeds"""
+        attempt = 0
+        while True:
+            attempt += 1
+            await asyncio.sleep(min(self.settings.startup_retry_max_seconds, 2 ** attempt))
+            if await self._connect_redis():
+                logger.info("Redis connection established, caching enabled", attempt=attempt)
+                return
+    
+    async def close(self) -> None:
+        """Stop reconnecting and close the Redis connection"""
+        if self._redis_task is not None:
+            self._redis_task.cancel()
+            self._redis_task = None
+        if self._redis_client is not None:
+            await self._redis_client.aclose()
             self._redis_client = None
     
+    @traced("market_data.get_market_quote")
     async def get_market_quote(
         self, 
         symbol: str, 
@@ -61,63 +117,96 @@ class MarketDataService:
     ) -> MarketQuoteResponse:
         """Get comprehensive market quote for a symbol"""
         
-        cache_key = f"quote:{exchange}:{segment}:{symbol}"
+        instrument = resolve_instrument(symbol, exchange, segment)
+        symbol, exchange, segment = instrument.symbol, instrument.exchange, instrument.segment
+        table_key = instrument.key
+        cache_key = "quote:" + table_key
+        
+        get_interest_registry().record_request(table_key, "quote")
+        
+        # Quotes fetched by any worker on this host are in the shared table
+        quote_table = get_quote_table()
+        if quote_table:
+            max_age = self._table_max_age(quote_table, 5)
+            fields = quote_table.get(table_key, max_age=max_age, timestamp_field="quote_updated_at")
+            if fields:
+                return quote_from_table_fields(symbol, exchange, segment, fields)
         
         # Check cache first
         cached_data = await self._get_cached_data(cache_key, ttl_seconds=5)
         if cached_data:
             return MarketQuoteResponse(**cached_data)
         
-        # Rate limiting check
-        if not await self._rate_limiter.can_make_request("market_quote"):
-            raise GrowwAPIRateLimitException("Rate limit exceeded for market quotes")
-        
         try:
-            client = await get_authenticated_groww_client()
-            if not client:
-                raise Exception("Failed to get authenticated client")
-            
-            response = await client.get_market_quote(
-                trading_symbol=symbol,
-                exchange=exchange,
-                segment=segment
-            )
-            
-            if response.get('status') == 'SUCCESS':
-                quote_data = response.get('payload', {})
-                
-                market_quote = MarketQuoteResponse(
-                    symbol=symbol,
-                    exchange=exchange,
-                    segment=segment,
-                    ltp=float(quote_data.get('ltp', 0)),
-                    open_price=float(quote_data.get('open', 0)),
-                    high_price=float(quote_data.get('high', 0)),
-                    low_price=float(quote_data.get('low', 0)),
-                    close_price=float(quote_data.get('close', 0)),
-                    volume=int(quote_data.get('volume', 0)),
-                    change=float(quote_data.get('day_change', 0)),
-                    change_percent=float(quote_data.get('day_change_percentage', 0)),
-                    bid_price=float(quote_data.get('bid_price', 0)) or None,
-                    ask_price=float(quote_data.get('ask_price', 0)) or None,
-                    bid_quantity=int(quote_data.get('bid_quantity', 0)) or None,
-                    ask_quantity=int(quote_data.get('ask_quantity', 0)) or None,
-                    timestamp=datetime.now()
-                )
-                
-                # Cache the result
-                await self._cache_data(cache_key, market_quote.dict(), ttl_seconds=5)
-                
-                logger.debug("Market quote retrieved successfully", symbol=symbol)
-                return market_quote
-            else:
-                error_msg = response.get('error', 'Failed to fetch market quote')
-                raise GrowwAPIException(error_msg)
-                
+            return await self._fetch_market_quote(symbol, exchange, segment)
+        except CircuitOpenError:
+            # Fail fast to whatever we last had while Groww is unhealthy
+            stale_data = await self._get_stale_data(cache_key)
+            if stale_data is None:
+                raise
+            return MarketQuoteResponse(**stale_data)
         except Exception as e:
             logger.error("Error fetching market quote", symbol=symbol, error=str(e))
             raise
     
+    def _table_max_age(self, quote_table: QuoteTable, max_age: float) -> float:
+        """
+        How old a quote table entry may be when served: while a poller
+        leader is refreshing the host's table, up to its slowest refresh
+        interval for the session (plus a margin), since the entry is
+        refreshed on that schedule anyway; otherwise ``max_age``
+        """
+        if time.time() - quote_table.polled_at() > self.settings.quote_poller_lock_ttl_seconds:
+            return max_age
+        return max(max_age, refresh_ceiling(self.settings, market_session()) + _POLL_MARGIN_SECONDS)
+    
+    async def _fetch_market_quote(self, symbol: str, exchange: str, segment: str) -> MarketQuoteResponse:
+        """Fetch a quote from Groww and store it in the shared table and cache"""
+        response = await self._call_upstream(
+            "market_quote",
+            lambda client: client.get_market_quote(
+                trading_symbol=symbol,
+                exchange=exchange,
+                segment=segment
+            ),
+            route_key=symbol
+        )
+        
+        if response.get('status') != 'SUCCESS':
+            error_msg = response.get('error', 'Failed to fetch market quote')
+            raise sdk.GrowwAPIException(error_msg)
+        
+        quote_data = response.get('payload', {})
+        
+        market_quote = MarketQuoteResponse(
+            symbol=symbol,
+            exchange=exchange,
+            segment=segment,
+            ltp=float(quote_data.get('ltp', 0)),
+            open_price=float(quote_data.get('open', 0)),
+            high_price=float(quote_data.get('high', 0)),
+            low_price=float(quote_data.get('low', 0)),
+            close_price=float(quote_data.get('close', 0)),
+            volume=int(quote_data.get('volume', 0)),
+            change=float(quote_data.get('day_change', 0)),
+            change_percent=float(quote_data.get('day_change_percentage', 0)),
+            bid_price=float(quote_data.get('bid_price', 0)) or None,
+            ask_price=float(quote_data.get('ask_price', 0)) or None,
+            bid_quantity=int(quote_data.get('bid_quantity', 0)) or None,
+            ask_quantity=int(quote_data.get('ask_quantity', 0)) or None,
+            timestamp=datetime.now()
+        )
+        
+        # Share with the other workers, then cache the result
+        quote_table = get_quote_table()
+        if quote_table:
+            quote_table.put(QuoteTable.key(symbol, exchange, segment), **_quote_table_fields(market_quote))
+        await self._cache_data(f"quote:{exchange}:{segment}:{symbol}", market_quote.dict(), ttl_seconds=5)
+        
+        logger.debug("Market quote retrieved successfully", symbol=symbol)
+        return market_quote
+    
+    @traced("market_data.get_ltp")
     async def get_ltp(
         self, 
         symbol: str, 
@@ -126,7 +215,25 @@ class MarketDataService:
     ) -> LTPResponse:
         """Get Last Traded Price for a symbol"""
         
-        cache_key = f"ltp:{exchange}:{segment}:{symbol}"
+        instrument = resolve_instrument(symbol, exchange, segment)
+        symbol, exchange, segment = instrument.symbol, instrument.exchange, instrument.segment
+        table_key = instrument.key
+        cache_key = "ltp:" + table_key
+        
+        get_interest_registry().record_request(table_key, "ltp")
+        
+        quote_table = get_quote_table()
+        if quote_table:
+            max_age = self._table_max_age(quote_table, 1)
+            fields = quote_table.get(table_key, max_age=max_age, timestamp_field="ltp_updated_at")
+            if fields:
+                return LTPResponse(
+                    symbol=symbol,
+                    exchange=exchange,
+                    segment=segment,
+                    ltp=fields["ltp"],
+                    timestamp=datetime.fromtimestamp(fields["ltp_updated_at"])
+                )
         
         # Check cache first
         cached_data = await self._get_cached_data(cache_key, ttl_seconds=1)
@@ -134,38 +241,109 @@ class MarketDataService:
             return LTPResponse(**cached_data)
         
         try:
-            client = await get_authenticated_groww_client()
-            if not client:
-                raise Exception("Failed to get authenticated client")
-            
-            response = await client.get_ltp(
+            return await self._fetch_ltp(symbol, exchange, segment)
+        except CircuitOpenError:
+            # Fail fast to whatever we last had while Groww is unhealthy
+            stale_data = await self._get_stale_data(cache_key)
+            if stale_data is None:
+                raise
+            return LTPResponse(**stale_data)
+        except Exception as e:
+            logger.error("Error fetching LTP", symbol=symbol, error=str(e))
+            raise
+    
+    async def _fetch_ltp(self, symbol: str, exchange: str, segment: str) -> LTPResponse:
+        """Fetch an LTP from Groww and store it in the shared table and cache"""
+        response = await self._call_upstream(
+            "ltp",
+            lambda client: client.get_ltp(
                 trading_symbol=symbol,
                 exchange=exchange,
                 segment=segment
+            ),
+            route_key=symbol
+        )
+        
+        if response.get('status') != 'SUCCESS':
+            error_msg = response.get('error', 'Failed to fetch LTP')
+            raise sdk.GrowwAPIException(error_msg)
+        
+        ltp_data = response.get('payload', {})
+        
+        ltp_response = LTPResponse(
+            symbol=symbol,
+            exchange=exchange,
+            segment=segment,
+            ltp=float(ltp_data.get('ltp', 0)),
+            timestamp=datetime.now()
+        )
+        
+        # Share with the other workers, then cache with short TTL
+        quote_table = get_quote_table()
+        if quote_table:
+            quote_table.put(
+                QuoteTable.key(symbol, exchange, segment),
+                ltp=ltp_response.ltp,
+                ltp_updated_at=ltp_response.timestamp.timestamp()
             )
-            
-            if response.get('status') == 'SUCCESS':
-                ltp_data = response.get('payload', {})
-                
-                ltp_response = LTPResponse(
-                    symbol=symbol,
-                    exchange=exchange,
-                    segment=segment,
-                    ltp=float(ltp_data.get('ltp', 0)),
-                    timestamp=datetime.now()
+        await self._cache_data(f"ltp:{exchange}:{segment}:{symbol}", ltp_response.dict(), ttl_seconds=1)
+        
+        return ltp_response
+    
+    async def refresh_quote_fields(
+        self,
+        symbol: str,
+        exchange: str,
+        segment: str,
+        full_quote: bool
+    ) -> Dict[str, Any]:
+        """
+        Fetch a symbol from Groww regardless of what is cached, for the
+        quote poller; returns the quote table fields that were written
+        """
+        if full_quote:
+            return _quote_table_fields(await self._fetch_market_quote(symbol, exchange, segment))
+        
+        ltp_response = await self._fetch_ltp(symbol, exchange, segment)
+        return {"ltp": ltp_response.ltp, "ltp_updated_at": ltp_response.timestamp.timestamp()}
+    
+    async def refresh_ltp_batch(self, symbols: List[str], exchange: str, segment: str) -> List[Dict[str, Any]]:
+        """
+        Fetch the LTPs of many symbols with one multi-symbol call per
+        ``_LTP_BATCH_SIZE``; returns the quote table updates written, keyed
+        """
+        quote_table = get_quote_table()
+        updates = []
+        for start in range(0, len(symbols), _LTP_BATCH_SIZE):
+            batch = symbols[start:start + _LTP_BATCH_SIZE]
+            response = await self._call_upstream(
+                "ltp",
+                lambda client: client.get_ltp(
+                    exchange_trading_symbols=tuple(f"{exchange}_{symbol}" for symbol in batch),
+                    segment=segment
                 )
-                
-                # Cache the result with short TTL
-                await self._cache_data(cache_key, ltp_response.dict(), ttl_seconds=1)
-                
-                return ltp_response
-            else:
-                error_msg = response.get('error', 'Failed to fetch LTP')
-                raise GrowwAPIException(error_msg)
-                
-        except Exception as e:
-            logger.error("Error fetching LTP", symbol=symbol, error=str(e))
-            raise
+            )
+            
+            if response.get('status') != 'SUCCESS':
+                error_msg = response.get('error', 'Failed to fetch LTPs')
+                raise sdk.GrowwAPIException(error_msg)
+            
+            # Keyed "EXCHANGE_SYMBOL"; symbols Groww does not know are left out
+            payload = response.get('payload', {})
+            updated_at = time.time()
+            for symbol in batch:
+                value = payload.get(f"{exchange}_{symbol}")
+                if value is None:
+                    continue
+                update = {
+                    "key": QuoteTable.key(symbol, exchange, segment),
+                    "ltp": float(value.get('ltp', 0) if isinstance(value, dict) else value),
+                    "ltp_updated_at": updated_at
+                }
+                if quote_table:
+                    quote_table.put(update["key"], ltp=update["ltp"], ltp_updated_at=updated_at)
+                updates.append(update)
+        return updates
     
     async def get_historical_data(
         self,
@@ -178,73 +356,115 @@ class MarketDataService:
     ) -> HistoricalDataResponse:
         """Get historical candle data for a symbol"""
         
-        cache_key = f"historical:{exchange}:{segment}:{symbol}:{start_time}:{end_time}:{interval_minutes}"
+        candles = await self.get_historical_candles(
+            symbol, exchange, segment, start_time, end_time, interval_minutes
+        )
+        
+        processed_candles = [
+            CandleData(
+                timestamp=datetime.fromtimestamp(candle[0] / 1000),  # Convert milliseconds
+                open_price=candle[1],
+                high_price=candle[2],
+                low_price=candle[3],
+                close_price=candle[4],
+                volume=candle[5]
+            )
+            for candle in candles
+        ]
+        
+        return HistoricalDataResponse(
+            symbol=symbol,
+            exchange=exchange,
+            segment=segment,
+            start_time=start_time,
+            end_time=end_time,
+            interval_minutes=interval_minutes,
+            candles=processed_candles,
+            total_candles=len(processed_candles)
+        )
+    
+    @traced("market_data.get_historical_candles")
+    async def get_historical_candles(
+        self,
+        symbol: str,
+        exchange: str = "NSE",
+        segment: str = "CASH",
+        start_time: str = "",
+        end_time: str = "",
+        interval_minutes: int = 1
+    ) -> List[List[Union[int, float]]]:
+        """
+        Get historical candles as raw ``[ts_ms, open, high, low, close, volume]``
+        rows, without building a model per candle. Used directly by the
+        columnar encodings.
+        """
+        
+        instrument = resolve_instrument(symbol, exchange, segment)
+        symbol, exchange, segment = instrument.symbol, instrument.exchange, instrument.segment
+        cache_key = f"historical_candles:{exchange}:{segment}:{symbol}:{start_time}:{end_time}:{interval_minutes}"
         
         # Check cache first (longer TTL for historical data)
         cached_data = await self._get_cached_data(cache_key, ttl_seconds=300)
         if cached_data:
-            return HistoricalDataResponse(**cached_data)
+            return cached_data["candles"]
         
         try:
-            client = await get_authenticated_groww_client()
-            if not client:
-                raise Exception("Failed to get authenticated client")
-            
-            response = await client.get_historical_candle_data(
-                exchange=exchange,
-                segment=segment,
-                trading_symbol=symbol,
-                start_time=start_time,
-                end_time=end_time,
-                interval_in_minutes=str(interval_minutes)
+            response = await self._call_upstream(
+                "historical",
+                lambda client: client.get_historical_candle_data(
+                    exchange=exchange,
+                    segment=segment,
+                    trading_symbol=symbol,
+                    start_time=start_time,
+                    end_time=end_time,
+                    interval_in_minutes=str(interval_minutes)
+                ),
+                route_key=symbol
             )
             
             if response.get('status') == 'SUCCESS':
                 payload = response.get('payload', {})
                 candles_data = payload.get('candles', [])
                 
-                # Process candle data
-                processed_candles = []
-                for candle in candles_data:
-                    if len(candle) >= 6:
-                        processed_candles.append(CandleData(
-                            timestamp=datetime.fromtimestamp(candle[0] / 1000),  # Convert milliseconds
-                            open_price=float(candle[1]),
-                            high_price=float(candle[2]),
-                            low_price=float(candle[3]),
-                            close_price=float(candle[4]),
-                            volume=int(candle[5])
-                        ))
-                
-                historical_response = HistoricalDataResponse(
-                    symbol=symbol,
-                    exchange=exchange,
-                    segment=segment,
-                    start_time=start_time,
-                    end_time=end_time,
-                    interval_minutes=interval_minutes,
-                    candles=processed_candles,
-                    total_candles=len(processed_candles)
-                )
+                # Normalise candle rows
+                candles = [
+                    [
+                        int(candle[0]),
+                        float(candle[1]),
+                        float(candle[2]),
+                        float(candle[3]),
+                        float(candle[4]),
+                        int(candle[5])
+                    ]
+                    for candle in candles_data
+                    if len(candle) >= 6
+                ]
                 
                 # Cache the result
-                await self._cache_data(cache_key, historical_response.dict(), ttl_seconds=300)
+                await self._cache_data(cache_key, {"candles": candles}, ttl_seconds=300)
                 
                 logger.info(
                     "Historical data retrieved successfully",
                     symbol=symbol,
-                    candles_count=len(processed_candles)
+                    candles_count=len(candles)
                 )
                 
-                return historical_response
+                return candles
             else:
                 error_msg = response.get('error', 'Failed to fetch historical data')
-                raise GrowwAPIException(error_msg)
+                raise sdk.GrowwAPIException(error_msg)
                 
+        except CircuitOpenError:
+            # Fail fast to whatever we last had while Groww is unhealthy
+            stale_data = await self._get_stale_data(cache_key)
+            if stale_data is None:
+                raise
+            return stale_data["candles"]
         except Exception as e:
             logger.error("Error fetching historical data", symbol=symbol, error=str(e))
             raise
     
+    @traced("market_data.get_market_overview")
     async def get_market_overview(self) -> MarketOverviewResponse:
         """Get comprehensive market overview"""
         
@@ -269,7 +489,7 @@ class MarketDataService:
                 indices=indices,
                 sectors=sectors,
                 top_movers=top_movers,
-                market_status="OPEN",  # This should be determined from actual market hours
+                market_status=market_session().upper(),
                 timestamp=datetime.now()
             )
             
@@ -312,32 +532,164 @@ class MarketDataService:
         return indices_data
     
     async def _fetch_sector_data(self) -> List[SectorData]:
-        """Fetch sector performance data"""
-        # This would typically fetch from sectoral indices
-        # For now, returning empty list as it requires specific sector indices
-        return []
+        """Sector performance aggregated from the configured universe's constituents"""
+        universe = get_market_universe()
+        if universe is None:
+            return []
+        
+        return [SectorData(**sector) for sector in universe.sectors()]
     
     async def _fetch_top_movers(self) -> TopMoversResponse:
-        """Fetch top gaining and losing stocks"""
-        # This would typically require a separate API call or screener
-        # For now, returning empty data
-        return TopMoversResponse(
-            gainers=[],
-            losers=[],
-            most_active=[],
-            timestamp=datetime.now()
+        """Top gaining, losing and most active stocks of the configured universe"""
+        universe = get_market_universe()
+        if universe is None:
+            # No constituents file: nothing to rank
+            return TopMoversResponse(
+                gainers=[],
+                losers=[],
+                most_active=[],
+                timestamp=datetime.now()
+            )
+        
+        return TopMoversResponse(**universe.top_movers())
+    
+    async def _call_upstream(
+        self,
+        operation: str,
+        request: Callable[["GrowwAPI"], Awaitable[Dict[str, Any]]],
+        route_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Make a single Groww call: route it to one of the pooled accounts
+        whose circuit for the operation is not open (failing fast if none
+        is), wait for a slot in that account's rate budget and time the
+        call by outcome
+        """
+        sessions = await get_market_data_sessions()
+        if not sessions:
+            raise Exception("Failed to get authenticated client")
+        
+        # A rate limit or outage on one account leaves the others serving
+        breakers = {session.name: get_breaker(f"{operation}:{session.name}") for session in sessions}
+        available = [session for session in sessions if breakers[session.name].allows_call()]
+        if not available:
+            CIRCUIT_REJECTIONS.labels(family=operation).inc()
+            raise CircuitOpenError(operation, min(breaker.retry_after for breaker in breakers.values()))
+        session = self._select_session(available, operation, route_key)
+        breaker = breakers[session.name]
+        
+        with span("rate_limit.wait", operation=operation, account=session.name):
+            acquired = await self._rate_limiters[session.name].acquire(
+                operation, self.settings.upstream_rate_limit_max_wait
+            )
+        if not acquired:
+            raise sdk.GrowwAPIRateLimitException(f"Rate limit exceeded for {operation}")
+        
+        client = await session.get_authenticated_client()
+        if not client:
+            raise Exception("Failed to get authenticated client")
+        
+        UPSTREAM_ACCOUNT_CALLS.labels(account=session.name, operation=operation).inc()
+        self._in_flight[session.name] += 1
+        try:
+            with span("upstream.call", operation=operation, account=session.name) as upstream_span:
+                async with breaker.guard(), upstream_call(operation) as call:
+                    response = await request(client)
+                    if response.get('status') != 'SUCCESS':
+                        call.outcome = "api_error"
+                        # Raised inside the guard so the breaker counts it;
+                        # rejected requests are returned for the caller to report
+                        if not _is_client_error_response(response):
+                            raise UpstreamError(operation, response.get('error', 'Unknown error'))
+                if upstream_span:
+                    upstream_span.set_attribute("outcome", call.outcome)
+                return response
+        finally:
+            self._in_flight[session.name] -= 1
+    
+    def _select_session(
+        self,
+        sessions: List[GrowwSession],
+        operation: str,
+        route_key: Optional[str]
+    ) -> GrowwSession:
+        """
+        Pick an account for a call: the one with the most free rate budget
+        (then fewest calls in flight), or with ``symbol_hash`` routing a
+        rendezvous hash of the symbol so each symbol sticks to one account
+        and only moves while that account is out of the pool or its circuit
+        is open
+        """
+        if len(sessions) == 1:
+            return sessions[0]
+        
+        if self.settings.market_data_routing == "symbol_hash" and route_key:
+            return max(
+                sessions,
+                key=lambda session: hashlib.blake2b(
+                    f"{session.name}:{route_key}".encode("utf-8"), digest_size=8
+                ).digest()
+            )
+        
+        return max(
+            sessions,
+            key=lambda session: (
+                self._rate_limiters[session.name].available(operation),
+                -self._in_flight[session.name]
+            )
         )
     
     async def _get_cached_data(self, key: str, ttl_seconds: int) -> Optional[Dict[str, Any]]:
-        """Get data from Redis cache"""
+        """
+        Get data from Redis cache.
+        
+        Entries outlive their TTL by ``cache_stale_multiplier`` so expired
+        data can be reported (and later served) as stale; only entries
+        younger than ``ttl_seconds`` are returned here.
+        """
         if not self._redis_client:
             return None
         
+        family = key.split(":", 1)[0]
+        try:
+            with span("cache.get", key=key):
+                cached_value = await self._redis_client.get(key)
+            if cached_value:
+                entry = json.loads(cached_value)
+                if time.time() - entry["cached_at"] <= ttl_seconds:
+                    self._record_cache_result(family, "hit")
+                    return entry["data"]
+                self._record_cache_result(family, "stale")
+            else:
+                self._record_cache_result(family, "miss")
+        except Exception as e:
+            self._record_cache_result(family, "error")
+            logger.debug("Cache get error", key=key, error=str(e))
+        
+        return None
+    
+    async def _get_stale_data(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached entry regardless of age, as a fallback while the
+        upstream circuit is open
+        """
+        if not self._redis_client:
+            return None
+        
+        family = key.split(":", 1)[0]
         try:
             cached_value = await self._redis_client.get(key)
             if cached_value:
-                return json.loads(cached_value)
+                entry = json.loads(cached_value)
+                self._record_cache_result(family, "stale_served")
+                logger.info(
+                    "Serving stale data, upstream circuit open",
+                    key=key,
+                    age_seconds=round(time.time() - entry["cached_at"], 1)
+                )
+                return entry["data"]
         except Exception as e:
+            self._record_cache_result(family, "error")
             logger.debug("Cache get error", key=key, error=str(e))
         
         return None
@@ -348,19 +700,121 @@ class MarketDataService:
             return
         
         try:
-            await self._redis_client.setex(
-                key,
-                ttl_seconds,
-                json.dumps(data, default=str)
-            )
+            with span("cache.set", key=key):
+                await self._redis_client.setex(
+                    key,
+                    ttl_seconds * self.settings.cache_stale_multiplier,
+                    json.dumps({"cached_at": time.time(), "data": data}, default=str)
+                )
         except Exception as e:
+            self._record_cache_result(key.split(":", 1)[0], "error")
             logger.debug("Cache set error", key=key, error=str(e))
+    
+    def _record_cache_result(self, family: str, result: str):
+        self._cache_stats[family][result] += 1
+        CACHE_REQUESTS.labels(family=family, result=result).inc()
+    
+    async def get_cache_stats(self, sample_size: int = 20, scan_limit: int = 10000) -> Dict[str, Any]:
+        """
+        Per key family lookup counters for this worker, plus entry counts
+        and approximate memory from Redis (memory is extrapolated from a
+        sample of ``MEMORY USAGE`` calls)
+        """
+        families: Dict[str, Dict[str, Any]] = {
+            family: {"lookups": dict(results), "entries": 0, "approx_memory_bytes": 0}
+            for family, results in self._cache_stats.items()
+        }
+        
+        if not self._redis_client:
+            return {"backend": "disabled", "families": families}
+        
+        keys_by_family: Dict[str, List[bytes]] = defaultdict(list)
+        scanned = 0
+        async for key in self._redis_client.scan_iter(count=1000):
+            family = key.decode("utf-8", "replace").split(":", 1)[0]
+            keys_by_family[family].append(key)
+            scanned += 1
+            if scanned >= scan_limit:
+                break
+        
+        for family, keys in keys_by_family.items():
+            stats = families.setdefault(family, {"lookups": {}, "entries": 0, "approx_memory_bytes": 0})
+            stats["entries"] = len(keys)
+            
+            sample = keys[:sample_size]
+            try:
+                sampled_bytes = 0
+                for key in sample:
+                    sampled_bytes += await self._redis_client.memory_usage(key) or 0
+                stats["approx_memory_bytes"] = int(sampled_bytes / len(sample) * len(keys)) if sample else 0
+            except Exception as e:
+                # MEMORY USAGE is disabled on some managed Redis offerings
+                logger.debug("Cache memory sampling failed", family=family, error=str(e))
+                stats["approx_memory_bytes"] = None
+        
+        return {
+            "backend": "redis",
+            "keys_scanned": scanned,
+            "scan_truncated": scanned >= scan_limit,
+            "families": families
+        }
+
+# Groww error codes for a bad request and an unknown entity
+_CLIENT_ERROR_CODES = frozenset({"GA001", "GA004"})
+
+def _is_client_error_response(response: Dict[str, Any]) -> bool:
+    """Whether an unsuccessful payload rejects the request rather than reporting a failure"""
+    error = response.get('error')
+    code = error.get('code') if isinstance(error, dict) else response.get('code')
+    return code in _CLIENT_ERROR_CODES
+
+# Slack on the poller's refresh interval before a table entry counts as stale
+_POLL_MARGIN_SECONDS = 2.0
+
+# Most symbols Groww accepts in one multi-symbol LTP call
+_LTP_BATCH_SIZE = 50
+
+# Quote fields mirrored in the shared quote table
+_QUOTE_TABLE_FIELDS = (
+    "ltp", "open_price", "high_price", "low_price", "close_price", "change",
+    "change_percent", "bid_price", "ask_price", "volume", "bid_quantity", "ask_quantity"
+)
+
+def _quote_table_fields(quote: MarketQuoteResponse) -> Dict[str, Any]:
+    """Quote table fields for a freshly fetched quote"""
+    updated_at = quote.timestamp.timestamp()
+    return {
+        **{field: getattr(quote, field) for field in _QUOTE_TABLE_FIELDS},
+        "ltp_updated_at": updated_at,
+        "quote_updated_at": updated_at
+    }
+
+def quote_from_table_fields(symbol: str, exchange: str, segment: str, fields: Dict[str, Any]) -> MarketQuoteResponse:
+    """Build a quote from a shared quote table slot"""
+    return MarketQuoteResponse(
+        symbol=symbol,
+        exchange=exchange,
+        segment=segment,
+        ltp=fields["ltp"],
+        open_price=fields["open_price"],
+        high_price=fields["high_price"],
+        low_price=fields["low_price"],
+        close_price=fields["close_price"],
+        volume=fields["volume"],
+        change=fields["change"],
+        change_percent=fields["change_percent"],
+        bid_price=None if math.isnan(fields["bid_price"]) else fields["bid_price"],
+        ask_price=None if math.isnan(fields["ask_price"]) else fields["ask_price"],
+        bid_quantity=fields["bid_quantity"] or None,
+        ask_quantity=fields["ask_quantity"] or None,
+        timestamp=datetime.fromtimestamp(fields["quote_updated_at"])
+    )
 
 class RateLimiter:
     """Rate limiter for API calls"""
     
     def __init__(self):
-        self.call_history: Dict[str, List[float]] = {}
+        self.call_history: Dict[str, Deque[float]] = {}
         self.limits = {
             "market_quote": {"calls": 10, "window": 1},  # 10 calls per second
             "ltp": {"calls": 15, "window": 1},  # 15 calls per second
@@ -368,38 +822,72 @@ class RateLimiter:
             "default": {"calls": 10, "window": 1}
         }
     
+    def available(self, operation: str) -> int:
+        """Call slots currently free for ``operation``"""
+        limit_config = self.limits.get(operation, self.limits["default"])
+        history = self.call_history.get(operation)
+        if not history:
+            return limit_config["calls"]
+        
+        current_time = time.monotonic()
+        while history and current_time - history[0] >= limit_config["window"]:
+            history.popleft()
+        return limit_config["calls"] - len(history)
+    
     async def can_make_request(self, operation: str) -> bool:
         """Check if request can be made within rate limits"""
-        import time
-        
-        current_time = time.time()
+        return await self.acquire(operation, max_wait=0)
+    
+    async def acquire(self, operation: str, max_wait: float) -> bool:
+        """
+        Take a call slot for ``operation``, waiting up to ``max_wait`` seconds
+        for one to free up. Returns False if no slot frees up in time.
+        """
         limit_config = self.limits.get(operation, self.limits["default"])
+        history = self.call_history.setdefault(operation, deque())
+        started = time.monotonic()
         
-        # Clean old entries
-        if operation in self.call_history:
-            self.call_history[operation] = [
-                call_time for call_time in self.call_history[operation]
-                if current_time - call_time < limit_config["window"]
-            ]
-        else:
-            self.call_history[operation] = []
-        
-        # Check if we can make the request
-        if len(self.call_history[operation]) < limit_config["calls"]:
-            self.call_history[operation].append(current_time)
-            return True
-        
-        return False
+        while True:
+            current_time = time.monotonic()
+            
+            # Clean old entries
+            while history and current_time - history[0] >= limit_config["window"]:
+                history.popleft()
+            
+            # Check if we can make the request
+            if len(history) < limit_config["calls"]:
+                history.append(current_time)
+                UPSTREAM_RATE_LIMIT_WAIT.labels(operation=operation).observe(current_time - started)
+                return True
+            
+            wait = limit_config["window"] - (current_time - history[0])
+            if current_time + wait - started > max_wait:
+                UPSTREAM_RATE_LIMIT_REJECTIONS.labels(operation=operation).inc()
+                return False
+            
+            await asyncio.sleep(wait)
 
-# Global service instance
+# Global service instance, published only once initialized
 _market_data_service: Optional[MarketDataService] = None
+_market_data_service_lock = asyncio.Lock()
 
 async def get_market_data_service() -> MarketDataService:
     """Get or create market data service instance"""
     global _market_data_service
     
     if _market_data_service is None:
-        _market_data_service = MarketDataService()
-        await _market_data_service.initialize()
+        async with _market_data_service_lock:
+            if _market_data_service is None:
+                market_service = MarketDataService()
+                await market_service.initialize()
+                _market_data_service = market_service
+    
+    return _market_data_service
+
+async def stop_market_data_service() -> None:
+    """Close the market data service, if it was started"""
+    global _market_data_service
     
-    return _market_data_service
\ No newline at end of file
+    if _market_data_service is not None:
+        await _market_data_service.close()
+        _market_data_service = None
@@ -0,0 +1,43 @@
+"""
+Market Hours
+NSE/BSE equity session for a point in time
+
+Sessions (IST, Monday to Friday): pre-open 09:00-09:15, normal trading
+09:15-15:30 and the closing session until 16:00. Exchange holidays are
+not known here and report as a regular weekday.
+"""
+
+from datetime import datetime, time, timedelta, timezone
+from typing import Optional
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+PRE_OPEN = "pre_open"
+OPEN = "open"
+POST_CLOSE = "post_close"
+CLOSED = "closed"
+
+_SESSIONS = (
+    (time(9, 0), time(9, 15), PRE_OPEN),
+    (time(9, 15), time(15, 30), OPEN),
+    (time(15, 30), time(16, 0), POST_CLOSE),
+)
+
+
+def market_session(at: Optional[datetime] = None) -> str:
+    """Session name at ``at`` (default now); naive datetimes are taken as IST"""
+    if at is None:
+        at = datetime.now(IST)
+    elif at.tzinfo is None:
+        at = at.replace(tzinfo=IST)
+    else:
+        at = at.astimezone(IST)
+
+    if at.weekday() >= 5:
+        return CLOSED
+
+    now = at.time()
+    for start, end, session in _SESSIONS:
+        if start <= now < end:
+            return session
+    return CLOSED
@@ -0,0 +1,468 @@
+"""
+Market Universe
+Columnar snapshot of a configured universe, top movers and sectors
+
+The universe (e.g. NIFTY 500) comes from a constituents CSV such as the
+``ind_nifty500list.csv`` published by NSE: a ``Symbol`` column and
+optionally ``Company Name``. Its last price, change, change % and volume
+live in NumPy arrays, one row per constituent, updated from the shared
+quote table: every pass compares slot sequence numbers and copies only
+the rows whose slot changed, the same way the stream hub picks up
+updates.
+
+After a pass that changed anything, gainers, losers and most active are
+ranked with ``argpartition`` (a partial sort: O(n) to find the top k,
+then only those k are sorted) and kept for the overview to return as is.
+
+Constituents are grouped into sectors by the file's ``Industry`` (or
+``Sector``) column, weighted by an optional ``Weight`` column (e.g. free
+float market cap; equal weights without one). A sector's change % is the
+weighted average of its priced constituents' change %, reported as an
+index based at 100 on the previous close. The weighted sums are adjusted
+by the changed rows only, and per-sector gainers and losers are re-ranked
+only for sectors with a changed constituent.
+
+Constituents are refreshed by the elected quote poller's worker on a
+fixed cadence (``refresh_seconds``, the poller's closed interval outside
+market hours) rather than through symbol interest, so the universe never
+competes with requested symbols for the per-symbol rate budget: last
+prices come from multi-symbol LTP calls, 50 symbols each, and a few full
+quotes per pass, round robin with never-quoted constituents first,
+refresh the previous close and volume that change % and most active are
+based on. The results reach other workers through the quote table and
+other hosts through the quote bus, like the poller's own refreshes.
+"""
+
+import asyncio
+import csv
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from services.circuit_breaker import CircuitOpenError
+from services.instrument_master import get_instrument_master
+from services.market_hours import CLOSED, market_session
+from services.quote_poller import get_quote_poller
+from services.quote_table import QuoteTable, get_quote_table
+
+logger = structlog.get_logger(__name__)
+
+
+# Gainers and losers listed per sector
+SECTOR_MOVERS = 3
+
+# Sector sums are rebuilt from scratch after this many incremental
+# updates, so floating point error cannot accumulate
+_SECTOR_REBUILD_UPDATES = 1000
+
+
+def _weight(value: str) -> float:
+    try:
+        weight = float(value) if value else 1.0
+    except ValueError:
+        return 1.0
+    return weight if weight > 0 else 1.0
+
+
+def load_constituents(path: str) -> List[Dict[str, Any]]:
+    """
+    Rows of a constituents CSV with ``symbol``, ``name``, ``sector`` and
+    ``weight``, header case ignored
+    """
+    constituents = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {(column or "").strip().lower(): (value or "").strip() for column, value in row.items()}
+            symbol = row.get("symbol", "").upper()
+            if symbol:
+                constituents.append({
+                    "symbol": symbol,
+                    "name": row.get("company name") or row.get("name", ""),
+                    "sector": row.get("industry") or row.get("sector") or "Other",
+                    "weight": _weight(row.get("weight", ""))
+                })
+    return constituents
+
+
+class MarketUniverse:
+    """Per-constituent columns and the latest top-movers ranking"""
+
+    def __init__(self, constituents: List[Dict[str, Any]], exchange: str, segment: str, top_k: int):
+        # Imported on first use to keep application import time down
+        import numpy as np
+
+        self.exchange = exchange
+        self.segment = segment
+        self.top_k = top_k
+        self.symbols = [constituent["symbol"] for constituent in constituents]
+        self.names = [constituent["name"] for constituent in constituents]
+        self.keys = [QuoteTable.key(symbol, exchange, segment) for symbol in self.symbols]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+        size = len(self.keys)
+        self.ltp = np.full(size, np.nan)
+        self.close_price = np.full(size, np.nan)
+        self.change = np.full(size, np.nan)
+        self.change_percent = np.full(size, np.nan)
+        self.volume = np.zeros(size, dtype=np.int64)
+        self.updated_at = np.zeros(size)
+
+        self._slots: List[Optional[int]] = [None] * size
+        self._sequences = [0] * size
+        self.version = 0
+        self._movers: Dict[str, List[Dict[str, Any]]] = {"gainers": [], "losers": [], "most_active": []}
+        self._ranked_at = 0.0
+        self._rank_seconds = 0.0
+
+        self.sectors = SectorAggregates(
+            [constituent.get("sector", "Other") for constituent in constituents],
+            np.array([constituent.get("weight", 1.0) for constituent in constituents], dtype=float)
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def update(self, quote_table: QuoteTable) -> List[int]:
+        """Copy changed quote table slots into the columns; returns the changed rows"""
+        changed = []
+        for row, key in enumerate(self.keys):
+            slot = self._slots[row]
+            if slot is None:
+                slot = self._slots[row] = quote_table.slot(key)
+                if slot is None:
+                    continue
+            sequence = quote_table.sequence(slot)
+            if sequence == self._sequences[row]:
+                continue
+            fields = quote_table.read(slot)
+            if fields is None:
+                continue
+            self._sequences[row] = sequence
+
+            if fields["quote_updated_at"]:
+                self.close_price[row] = fields["close_price"]
+                self.volume[row] = fields["volume"]
+            if not fields["ltp_updated_at"] and not fields["quote_updated_at"]:
+                continue
+            self.ltp[row] = fields["ltp"]
+            close = self.close_price[row]
+            if close > 0:
+                # Derived from the last price, so LTP-only refreshes move it too
+                self.change[row] = fields["ltp"] - close
+                self.change_percent[row] = self.change[row] / close * 100
+            else:
+                self.change[row] = fields["change"]
+                self.change_percent[row] = fields["change_percent"]
+            self.updated_at[row] = max(fields["ltp_updated_at"], fields["quote_updated_at"])
+            changed.append(row)
+
+        if changed:
+            self.version += 1
+            self.sectors.apply(self, changed)
+        return changed
+
+    def rank(self) -> None:
+        """Recompute gainers, losers and most active from the columns"""
+        import numpy as np
+
+        started = time.perf_counter()
+        known = np.isfinite(self.change_percent)
+        self._movers = {
+            "gainers": self._entries(_top_k(self.change_percent, known & (self.change_percent > 0), self.top_k)),
+            "losers": self._entries(_top_k(-self.change_percent, known & (self.change_percent < 0), self.top_k)),
+            "most_active": self._entries(_top_k(self.volume, known & (self.volume > 0), self.top_k))
+        }
+        self._ranked_at = time.time()
+        self._rank_seconds = time.perf_counter() - started
+
+    def _entries(self, rows) -> List[Dict[str, Any]]:
+        return [
+            {
+                "symbol": self.symbols[row],
+                "name": self.names[row],
+                "ltp": float(self.ltp[row]),
+                "change": round(float(self.change[row]), 2),
+                "change_percent": round(float(self.change_percent[row]), 2),
+                "volume": int(self.volume[row])
+            }
+            for row in rows
+        ]
+
+    def top_movers(self) -> Dict[str, Any]:
+        return {
+            **self._movers,
+            "timestamp": datetime.fromtimestamp(self._ranked_at) if self._ranked_at else datetime.now()
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        import numpy as np
+
+        return {
+            "constituents": len(self.keys),
+            "priced": int(np.count_nonzero(self.updated_at)),
+            "version": self.version,
+            "rank_ms": round(self._rank_seconds * 1000, 3),
+            "sectors": len(self.sectors.names)
+        }
+
+
+def _top_k(values, mask, k: int):
+    """Rows of the ``k`` largest ``values`` where ``mask`` holds, largest first"""
+    import numpy as np
+
+    rows = np.flatnonzero(mask)
+    if len(rows) > k:
+        # Partial sort: only the k largest end up in front, unordered
+        rows = rows[np.argpartition(-values[rows], k - 1)[:k]]
+    return rows[np.argsort(-values[rows], kind="stable")]
+
+
+class SectorAggregates:
+    """Weighted sector change and per-sector movers, kept up to date row by row"""
+
+    def __init__(self, sectors: List[str], weights):
+        import numpy as np
+
+        self.names = sorted(set(sectors))
+        sector_ids = {name: index for index, name in enumerate(self.names)}
+        self.sector_of = np.array([sector_ids[sector] for sector in sectors], dtype=np.intp)
+        self.weights = weights
+        self.members = [np.flatnonzero(self.sector_of == index) for index in range(len(self.names))]
+
+        # Per row: weight * change % and weight, zero until the row is priced
+        self._contribution = np.zeros(len(sectors))
+        self._priced_weight = np.zeros(len(sectors))
+        # Per sector: sums of the above
+        self._weighted_change = np.zeros(len(self.names))
+        self._weight = np.zeros(len(self.names))
+        self._movers: List[Tuple[List[str], List[str]]] = [([], []) for _ in self.names]
+        self._updates = 0
+
+    def apply(self, universe: MarketUniverse, rows: List[int]) -> None:
+        """Fold changed rows into the sector sums and re-rank the sectors they belong to"""
+        import numpy as np
+
+        rows = np.asarray(rows, dtype=np.intp)
+        change_percent = universe.change_percent[rows]
+        priced = np.isfinite(change_percent)
+        contribution = np.where(priced, self.weights[rows] * np.nan_to_num(change_percent), 0.0)
+        priced_weight = np.where(priced, self.weights[rows], 0.0)
+
+        self._updates += 1
+        if self._updates % _SECTOR_REBUILD_UPDATES == 0:
+            self._contribution[rows] = contribution
+            self._priced_weight[rows] = priced_weight
+            self._weighted_change = np.bincount(self.sector_of, self._contribution, len(self.names))
+            self._weight = np.bincount(self.sector_of, self._priced_weight, len(self.names))
+        else:
+            sectors = self.sector_of[rows]
+            np.add.at(self._weighted_change, sectors, contribution - self._contribution[rows])
+            np.add.at(self._weight, sectors, priced_weight - self._priced_weight[rows])
+            self._contribution[rows] = contribution
+            self._priced_weight[rows] = priced_weight
+
+        for sector in np.unique(self.sector_of[rows]):
+            members = self.members[sector]
+            values = universe.change_percent[members]
+            known = np.isfinite(values)
+            gainers = members[_top_k(values, known & (values > 0), SECTOR_MOVERS)]
+            losers = members[_top_k(-values, known & (values < 0), SECTOR_MOVERS)]
+            self._movers[sector] = (
+                [universe.symbols[row] for row in gainers],
+                [universe.symbols[row] for row in losers]
+            )
+
+    def sector_data(self) -> List[Dict[str, Any]]:
+        """Priced sectors, best performing first, in the shape of ``SectorData``"""
+        sectors = []
+        for index, name in enumerate(self.names):
+            weight = self._weight[index]
+            if weight <= 0:
+                continue
+            change_percent = float(self._weighted_change[index] / weight)
+            gainers, losers = self._movers[index]
+            sectors.append({
+                "name": name,
+                "symbol": "_".join(name.upper().split()),
+                "value": round(100 + change_percent, 2),
+                "change": round(change_percent, 2),
+                "change_percent": round(change_percent, 2),
+                "stocks_count": len(self.members[index]),
+                "top_gainers": gainers,
+                "top_losers": losers
+            })
+        sectors.sort(key=lambda sector: sector["change_percent"], reverse=True)
+        return sectors
+
+
+class MarketUniverseEngine:
+    """Keeps a universe in step with the quote table and refreshes its constituents"""
+
+    def __init__(
+        self,
+        universe: MarketUniverse,
+        interval: float,
+        refresh_seconds: float,
+        closed_refresh_seconds: float,
+        quotes_per_refresh: int
+    ):
+        self.universe = universe
+        self.interval = interval
+        self.refresh_seconds = refresh_seconds
+        self.closed_refresh_seconds = closed_refresh_seconds
+        self.quotes_per_refresh = quotes_per_refresh
+        self._fetched_at = 0.0
+        # Next row to take a full quote for, round robin
+        self._quote_cursor = 0
+        self._last_fetch: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def top_movers(self) -> Dict[str, Any]:
+        return self.universe.top_movers()
+
+    def sectors(self) -> List[Dict[str, Any]]:
+        return self.universe.sectors.sector_data()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._fetch_if_due()
+                self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Market universe refresh failed", error=str(e))
+
+    def refresh(self) -> None:
+        quote_table = get_quote_table()
+        if quote_table and self.universe.update(quote_table):
+            self.universe.rank()
+
+    async def _fetch_if_due(self) -> None:
+        # Only the worker polling upstream for everyone refreshes the constituents
+        poller = get_quote_poller()
+        if poller is None or not poller.is_leader:
+            return
+        cadence = self.closed_refresh_seconds if market_session() == CLOSED else self.refresh_seconds
+        now = time.monotonic()
+        if now - self._fetched_at < cadence:
+            return
+        self._fetched_at = now
+
+        started = time.perf_counter()
+        updates: List[Dict[str, Any]] = []
+        try:
+            updates += await poller.service.refresh_ltp_batch(
+                self.universe.symbols, self.universe.exchange, self.universe.segment
+            )
+            for row in self._quote_rows():
+                fields = await poller.service.refresh_quote_fields(
+                    self.universe.symbols[row], self.universe.exchange, self.universe.segment, True
+                )
+                updates.append({"key": self.universe.keys[row], **fields})
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            # Rate limited or failed: what was fetched is kept, the rest waits a pass
+            logger.debug("Market universe fetch incomplete", error=str(e))
+        finally:
+            if updates:
+                await poller.publish_updates(updates)
+            self._last_fetch = {
+                "updates": len(updates),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+
+    def _quote_rows(self) -> List[int]:
+        """Rows to take full quotes for this pass: never quoted first, then round robin"""
+        import numpy as np
+
+        count = min(self.quotes_per_refresh, len(self.universe))
+        rows = [int(row) for row in np.flatnonzero(np.isnan(self.universe.close_price))[:count]]
+        while len(rows) < count:
+            row = self._quote_cursor
+            self._quote_cursor = (row + 1) % len(self.universe)
+            if row not in rows:
+                rows.append(row)
+        return rows
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.universe.snapshot(),
+            "last_fetch": self._last_fetch
+        }
+
+
+_engine: Optional[MarketUniverseEngine] = None
+
+
+def start_market_universe(settings) -> Optional[MarketUniverseEngine]:
+    """Load the constituents file and start following the quote table"""
+    global _engine
+
+    path = settings.market_universe_file
+    if _engine is not None or not path:
+        return _engine
+    if not os.path.exists(path):
+        logger.warning("Market universe file not found, top movers and sectors are unavailable", path=path)
+        return None
+
+    try:
+        constituents = load_constituents(path)
+    except Exception as e:
+        logger.error("Failed to load market universe", path=path, error=str(e))
+        return None
+
+    master = get_instrument_master()
+    if master is not None:
+        known = [
+            constituent for constituent in constituents
+            if master.get(constituent["symbol"], settings.market_universe_exchange, "CASH")
+        ]
+        if len(known) < len(constituents):
+            logger.warning("Market universe symbols not in the instrument master", dropped=len(constituents) - len(known))
+        constituents = known
+
+    universe = MarketUniverse(
+        constituents,
+        exchange=settings.market_universe_exchange,
+        segment="CASH",
+        top_k=settings.market_universe_top_k
+    )
+    _engine = MarketUniverseEngine(
+        universe,
+        interval=settings.market_universe_interval_seconds,
+        refresh_seconds=settings.market_universe_refresh_seconds,
+        closed_refresh_seconds=settings.quote_poller_closed_interval_seconds,
+        quotes_per_refresh=settings.market_universe_quotes_per_refresh
+    )
+    _engine.start()
+    logger.info("Market universe loaded", path=path, constituents=len(universe))
+    return _engine
+
+
+def get_market_universe() -> Optional[MarketUniverseEngine]:
+    return _engine
+
+
+async def stop_market_universe() -> None:
+    global _engine
+
+    if _engine is not None:
+        await _engine.stop()
+        _engine = None
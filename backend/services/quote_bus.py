@@ -0,0 +1,148 @@
+"""
+Quote Bus
+Publish/subscribe transport between the quote poller leader and workers
+
+Messages are small JSON documents. The bus only has to reach other
+hosts: workers on the leader's host already see its updates through the
+shared quote table, so single-host deploys can run without one.
+"""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import structlog
+
+from monitoring.metrics import QUOTE_BUS_MESSAGES
+
+logger = structlog.get_logger(__name__)
+
+MessageHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+
+class QuoteBus(ABC):
+    """Base class for bus backends"""
+
+    @abstractmethod
+    async def connect(self) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, subject: str, message: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def subscribe(self, subject: str, handler: MessageHandler) -> None:
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    async def _dispatch(self, subject: str, handler: MessageHandler, data: bytes) -> None:
+        QUOTE_BUS_MESSAGES.labels(subject=subject, direction="received").inc()
+        try:
+            await handler(json.loads(data))
+        except Exception as e:
+            logger.warning("Quote bus message handling failed", subject=subject, error=str(e))
+
+
+class RedisQuoteBus(QuoteBus):
+    """Redis pub/sub channels, one per subject"""
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._client = None
+        self._pubsub = None
+        self._handlers: Dict[str, MessageHandler] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        # Imported on first use to keep application import time down
+        from redis import asyncio as aioredis
+
+        self._client = aioredis.from_url(self.redis_url, socket_connect_timeout=2)
+        await self._client.ping()
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+
+    async def publish(self, subject: str, message: Dict[str, Any]) -> None:
+        await self._client.publish(subject, _encode(message))
+        QUOTE_BUS_MESSAGES.labels(subject=subject, direction="published").inc()
+
+    async def subscribe(self, subject: str, handler: MessageHandler) -> None:
+        self._handlers[subject] = handler
+        await self._pubsub.subscribe(subject)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    subject = message["channel"].decode("utf-8")
+                    handler = self._handlers.get(subject)
+                    if handler:
+                        await self._dispatch(subject, handler, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Quote bus connection lost, resubscribing", error=str(e))
+                await asyncio.sleep(1)
+                try:
+                    await self._pubsub.subscribe(*self._handlers)
+                except Exception:
+                    pass
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+
+
+class NatsQuoteBus(QuoteBus):
+    """NATS core subjects; the client reconnects and resubscribes by itself"""
+
+    def __init__(self, nats_url: str):
+        self.nats_url = nats_url
+        self._client = None
+
+    async def connect(self) -> None:
+        # Imported on first use: nats is only needed when selected
+        import nats
+
+        self._client = await nats.connect(self.nats_url, name="aladdin-quote-bus")
+
+    async def publish(self, subject: str, message: Dict[str, Any]) -> None:
+        await self._client.publish(subject, _encode(message))
+        QUOTE_BUS_MESSAGES.labels(subject=subject, direction="published").inc()
+
+    async def subscribe(self, subject: str, handler: MessageHandler) -> None:
+        async def on_message(msg) -> None:
+            await self._dispatch(subject, handler, msg.data)
+
+        await self._client.subscribe(subject, cb=on_message)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.drain()
+
+
+def create_quote_bus(settings) -> Optional[QuoteBus]:
+    """The configured bus backend, or None when quotes stay on this host"""
+    if settings.quote_bus_backend == "redis":
+        return RedisQuoteBus(settings.redis_url)
+    if settings.quote_bus_backend == "nats":
+        return NatsQuoteBus(settings.nats_url)
+    return None
@@ -0,0 +1,528 @@
+"""
+Quote Poller
+One elected process refreshes every actively requested symbol from Groww
+
+Every worker runs a poller, but only the one holding the leader lock
+(a local file lock, or a Redis key for multi-host deploys) calls the
+upstream. It refreshes the union of symbols with live interest, so
+upstream calls scale with distinct symbols rather than with request
+volume; request handlers then find fresh entries in the shared quote
+table and cache. The leader renews its lock from a task of its own, a
+third of the lock's lifetime apart, so a long polling cycle cannot let
+it expire under a leader that is still polling.
+
+Each cycle every worker drains its interest registry into the quote
+table, which the leader reads for its host; other hosts publish theirs
+on the quote bus, and apply the leader's published updates to their own
+quote table.
+
+A symbol's interest level is 1 while a subscription holds it, otherwise
+its request rate (per second, exponentially decayed). It is refreshed
+every ``interval / level`` seconds, between the session's base interval
+and the maximum, and dropped once it has been idle for the active window.
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from services.circuit_breaker import CircuitOpenError
+from services.instrument_master import get_instrument_master
+from services.interest_registry import InterestKey, get_interest_registry
+from services.market_hours import CLOSED, OPEN, market_session
+from services.quote_bus import QuoteBus, create_quote_bus
+from services.quote_table import QuoteTable, get_quote_table
+from monitoring.metrics import (
+    QUOTE_POLLER_ACTIVE_SYMBOLS, QUOTE_POLLER_CYCLE_SECONDS, QUOTE_POLLER_LEADER, QUOTE_POLLER_REFRESHES
+)
+
+logger = structlog.get_logger(__name__)
+
+# Lua: extend / delete the leader key only while we still own it
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Base interval multiplier for the pre-open and closing sessions
+_OFF_HOURS_SLOWDOWN = 4.0
+
+# Demand entry layout, as returned by QuoteTable.demand
+_LTP_AT, _QUOTE_AT, _LTP_HELD, _QUOTE_HELD, _REQUESTS = range(5)
+
+
+class _SymbolInterest:
+    """Leader-side demand state for one symbol"""
+
+    __slots__ = ("rate", "requests", "held", "last_demand", "full_quote_until", "next_refresh")
+
+    def __init__(self):
+        self.rate = 0.0
+        self.requests = 0
+        self.held = False
+        self.last_demand = 0.0
+        self.full_quote_until = 0.0
+        self.next_refresh = 0.0
+
+    @property
+    def level(self) -> float:
+        return 1.0 if self.held else self.rate
+
+
+class FileLeaderLock:
+    """Leadership among the processes of one host: an exclusive lock on a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    async def acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def renew(self) -> bool:
+        # Held until released or the process exits
+        return self._fd is not None
+
+    async def release(self) -> None:
+        if self._fd is not None:
+            # Closing the descriptor drops the lock
+            os.close(self._fd)
+            self._fd = None
+
+
+class RedisLeaderLock:
+    """Leadership across hosts: a Redis key set with NX and a renewed expiry"""
+
+    def __init__(self, redis_url: str, key: str, ttl_seconds: float):
+        self.redis_url = redis_url
+        self.key = key
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.token = uuid.uuid4().hex
+        self._client = None
+
+    async def _get_client(self):
+        if self._client is None:
+            # Imported on first use to keep application import time down
+            from redis import asyncio as aioredis
+            self._client = aioredis.from_url(self.redis_url, socket_connect_timeout=2)
+        return self._client
+
+    async def acquire(self) -> bool:
+        client = await self._get_client()
+        return bool(await client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    async def renew(self) -> bool:
+        client = await self._get_client()
+        return bool(await client.eval(_RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+
+    async def release(self) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.eval(_RELEASE_SCRIPT, 1, self.key, self.token)
+        finally:
+            await self._client.aclose()
+            self._client = None
+
+
+class QuotePoller:
+    """Leader election, upstream polling and bus fan-out for one worker"""
+
+    def __init__(self, service, election, bus: Optional[QuoteBus], settings):
+        self.service = service
+        self.election = election
+        self.bus = bus
+        self.interval = settings.quote_poller_interval_seconds
+        self.max_interval = settings.quote_poller_max_interval_seconds
+        self.closed_interval = settings.quote_poller_closed_interval_seconds
+        self.active_seconds = settings.quote_poller_active_seconds
+        self.half_life = settings.interest_half_life_seconds
+        self.lease_seconds = settings.interest_lease_seconds
+        self.concurrency = settings.quote_poller_concurrency
+        self.settings = settings
+        self.quotes_subject = f"{settings.quote_bus_subject}.quotes"
+        self.interest_subject = f"{settings.quote_bus_subject}.interest"
+        # Processes on one host share a quote table, so the leader's writes
+        # already reach them; only other hosts apply published updates
+        self.table_id = f"{socket.gethostname()}:{settings.quote_table_name}"
+
+        self.lock_ttl = settings.quote_poller_lock_ttl_seconds
+        self.renew_interval = self.lock_ttl / 3
+
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._renewer: Optional[asyncio.Task] = None
+        # Demand reported over the bus (or by this worker, without a quote
+        # table), in the quote table's demand entry layout
+        self._external_demand: Dict[str, List[float]] = {}
+        self._interests: Dict[str, _SymbolInterest] = {}
+        self._last_scan = time.time()
+        # Consecutive upstream errors per symbol, for backoff
+        self._failures: Dict[str, int] = {}
+        self._last_cycle: Dict[str, Any] = {}
+
+    async def start(self) -> None:
+        if self.bus is not None:
+            await self.bus.connect()
+            await self.bus.subscribe(self.quotes_subject, self._on_quotes)
+            await self.bus.subscribe(self.interest_subject, self._on_interest)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._set_leader(False)
+        await self.election.release()
+        if self.bus is not None:
+            await self.bus.close()
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await self._cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Quote poller cycle failed", error=str(e))
+                await self._set_leader(False)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def _cycle(self) -> None:
+        if not self.is_leader and await self.election.acquire():
+            logger.info("Quote poller elected leader", table=self.table_id)
+            await self._set_leader(True)
+
+        await self._report_interest()
+        if self.is_leader:
+            await self._poll()
+
+    async def _set_leader(self, is_leader: bool) -> None:
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        QUOTE_POLLER_LEADER.set(1 if is_leader else 0)
+        if is_leader:
+            self._renewer = asyncio.create_task(self._keep_leadership())
+            return
+
+        renewer, self._renewer = self._renewer, None
+        if renewer is not None and renewer is not asyncio.current_task():
+            renewer.cancel()
+        QUOTE_POLLER_ACTIVE_SYMBOLS.set(0)
+        self._interests.clear()
+        await self.election.release()
+
+    async def _keep_leadership(self) -> None:
+        """Renew the leader lock until it is lost; a failed renewal is retried while the lock lasts"""
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                if await self.election.renew():
+                    renewed_at = time.monotonic()
+                    continue
+                logger.warning("Quote poller lost leadership")
+            except Exception as e:
+                if time.monotonic() - renewed_at < self.lock_ttl - self.renew_interval:
+                    logger.debug("Quote poller lock renewal failed, retrying", error=str(e))
+                    continue
+                logger.warning("Quote poller could not renew leadership", error=str(e))
+            await self._set_leader(False)
+            return
+
+    async def _report_interest(self) -> None:
+        """Hand this worker's registry to the leader: via the quote table, the bus, or directly"""
+        requests, held = get_interest_registry().drain()
+        if not requests and not held:
+            return
+
+        quote_table = get_quote_table()
+        if quote_table:
+            # Demand only lands in existing slots; give the master's instruments theirs
+            master = get_instrument_master()
+            if master is not None:
+                for key, _ in (*requests, *held):
+                    if master.by_key(key) is not None:
+                        quote_table.slot(key, create=True)
+            quote_table.record_demand(requests, held, time.time() + self.lease_seconds)
+        elif self.is_leader:
+            self._merge_demand(requests, held)
+
+        if self.bus is not None and not self.is_leader:
+            try:
+                await self.bus.publish(self.interest_subject, {
+                    "origin": self.table_id,
+                    "requests": [[key, kind, count] for (key, kind), count in requests.items()],
+                    "held": [[key, kind] for key, kind in held]
+                })
+            except Exception as e:
+                # The next cycle reports again; held subscriptions are re-sent then
+                logger.warning("Quote poller interest publish failed", error=str(e))
+
+    def _merge_demand(self, requests: Dict[InterestKey, int], held: Iterable[InterestKey]) -> None:
+        # Stamped on receipt: host clocks need not agree
+        now = time.time()
+        for (key, kind), count in requests.items():
+            entry = self._external_demand.setdefault(key, [0.0, 0.0, 0.0, 0.0, 0])
+            entry[_LTP_AT if kind == "ltp" else _QUOTE_AT] = now
+            entry[_REQUESTS] += count
+        for key, kind in held:
+            entry = self._external_demand.setdefault(key, [0.0, 0.0, 0.0, 0.0, 0])
+            entry[_LTP_HELD if kind == "ltp" else _QUOTE_HELD] = now + self.lease_seconds
+
+    def _update_interest(self) -> None:
+        """Fold new demand into each symbol's interest, decay the rest and drop idle symbols"""
+        now = time.time()
+        elapsed = max(now - self._last_scan, 1e-3)
+        decay = 0.5 ** (elapsed / self.half_life)
+
+        demand: Dict[str, Tuple] = {}
+        quote_table = get_quote_table()
+        if quote_table:
+            demand.update(quote_table.demand(self._last_scan, now))
+        for key, entry in self._external_demand.items():
+            local = demand.get(key)
+            demand[key] = entry if local is None else (
+                *(max(a, b) for a, b in zip(local[:_REQUESTS], entry[:_REQUESTS])),
+                local[_REQUESTS] + entry[_REQUESTS]
+            )
+        self._last_scan = now
+
+        for key, interest in self._interests.items():
+            interest.rate *= decay
+            interest.held = False
+
+        for key, entry in demand.items():
+            interest = self._interests.get(key)
+            if interest is None:
+                interest = self._interests[key] = _SymbolInterest()
+                # Counts from before this leader tracked the symbol are
+                # history; only its latest request adds to the rate
+                interest.requests = max(entry[_REQUESTS] - 1, 0)
+            new_requests = entry[_REQUESTS] - interest.requests
+            if new_requests > 0:
+                interest.rate += (1 - decay) * new_requests / elapsed
+            interest.requests = entry[_REQUESTS]
+            interest.held = entry[_LTP_HELD] >= now or entry[_QUOTE_HELD] >= now
+            interest.last_demand = max(
+                interest.last_demand, entry[_LTP_AT], entry[_QUOTE_AT], now if interest.held else 0.0
+            )
+            interest.full_quote_until = max(
+                interest.full_quote_until,
+                entry[_QUOTE_AT] + self.active_seconds,
+                entry[_QUOTE_HELD]
+            )
+
+        idle_before = now - self.active_seconds
+        for key in [key for key, interest in self._interests.items()
+                    if not interest.held and interest.last_demand < idle_before]:
+            del self._interests[key]
+            self._failures.pop(key, None)
+        for key in [key for key, entry in self._external_demand.items()
+                    if max(entry[:_REQUESTS]) < idle_before and max(entry[_LTP_HELD], entry[_QUOTE_HELD]) < now]:
+            del self._external_demand[key]
+
+    def _refresh_interval(self, interest: _SymbolInterest, session: str) -> float:
+        if session == CLOSED:
+            return self.closed_interval
+        base = self.interval * (1.0 if session == OPEN else _OFF_HOURS_SLOWDOWN)
+        ceiling = refresh_ceiling(self.settings, session)
+        level = interest.level
+        if level <= 0:
+            return ceiling
+        return min(ceiling, max(base, base / level))
+
+    async def _poll(self) -> None:
+        started = time.perf_counter()
+        self._update_interest()
+        QUOTE_POLLER_ACTIVE_SYMBOLS.set(len(self._interests))
+
+        now = time.monotonic()
+        wall_now = time.time()
+        session = market_session()
+        due = []
+        for key, interest in self._interests.items():
+            if interest.next_refresh <= now:
+                interest.next_refresh = now + self._refresh_interval(interest, session)
+                due.append((key, interest.full_quote_until >= wall_now))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(key: str, full_quote: bool) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self._refresh(key, full_quote)
+
+        results = await asyncio.gather(*(refresh(key, full_quote) for key, full_quote in due))
+        updates = [update for update in results if update]
+
+        # Published every cycle, empty or not: other hosts take it as the
+        # leader's heartbeat
+        quote_table = get_quote_table()
+        if quote_table:
+            quote_table.mark_polled(time.time())
+        await self.publish_updates(updates)
+
+        elapsed = time.perf_counter() - started
+        QUOTE_POLLER_CYCLE_SECONDS.observe(elapsed)
+        self._last_cycle = {
+            "session": session,
+            "active_symbols": len(self._interests),
+            "held_symbols": sum(1 for interest in self._interests.values() if interest.held),
+            "due": len(due),
+            "refreshed": len(updates),
+            "duration_ms": round(elapsed * 1000, 1)
+        }
+
+    async def _refresh(self, key: str, full_quote: bool) -> Optional[Dict[str, Any]]:
+        kind = "quote" if full_quote else "ltp"
+        symbol, exchange, segment = QuoteTable.split_key(key)
+        try:
+            fields = await self.service.refresh_quote_fields(symbol, exchange, segment, full_quote)
+        except CircuitOpenError:
+            QUOTE_POLLER_REFRESHES.labels(kind=kind, result="circuit_open").inc()
+            return None
+        except Exception as e:
+            if "RateLimit" in type(e).__name__:
+                # Out of budget this cycle, not a problem with the symbol: retry next cycle
+                self._reschedule(key, 0.0)
+                QUOTE_POLLER_REFRESHES.labels(kind=kind, result="rate_limited").inc()
+                return None
+            failures = self._failures[key] = self._failures.get(key, 0) + 1
+            retry_in = min(self.active_seconds, self.interval * 2 ** failures)
+            self._reschedule(key, retry_in)
+            QUOTE_POLLER_REFRESHES.labels(kind=kind, result="error").inc()
+            logger.debug("Quote poller refresh failed", key=key, error=str(e), retry_in=retry_in)
+            return None
+
+        self._failures.pop(key, None)
+        QUOTE_POLLER_REFRESHES.labels(kind=kind, result="ok").inc()
+        return {"key": key, **fields}
+
+    def _reschedule(self, key: str, delay: float) -> None:
+        interest = self._interests.get(key)
+        if interest is not None:
+            interest.next_refresh = time.monotonic() + delay
+
+    async def publish_updates(self, updates: List[Dict[str, Any]]) -> None:
+        """Send quote table updates written on this host to the other hosts"""
+        if self.bus is None:
+            return
+        try:
+            await self.bus.publish(self.quotes_subject, {"origin": self.table_id, "updates": updates})
+        except Exception as e:
+            # Other hosts catch up on the next refresh; leadership is unaffected
+            logger.warning("Quote poller update publish failed", updates=len(updates), error=str(e))
+
+    async def _on_interest(self, message: Dict[str, Any]) -> None:
+        # Workers on this host already report through the quote table
+        if not self.is_leader or message.get("origin") == self.table_id:
+            return
+        self._merge_demand(
+            {(key, kind): count for key, kind, count in message.get("requests", ())},
+            [(key, kind) for key, kind in message.get("held", ())]
+        )
+
+    async def _on_quotes(self, message: Dict[str, Any]) -> None:
+        if message.get("origin") == self.table_id:
+            return
+        quote_table = get_quote_table()
+        if not quote_table:
+            return
+        # Stamped on receipt: host clocks need not agree
+        quote_table.mark_polled(time.time())
+        for update in message["updates"]:
+            fields = dict(update)
+            quote_table.put(fields.pop("key"), **fields)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "leader": self.is_leader,
+            "election": type(self.election).__name__,
+            "bus": type(self.bus).__name__ if self.bus else None,
+            "backed_off_symbols": len(self._failures),
+            "registry": get_interest_registry().snapshot(),
+            "last_cycle": self._last_cycle
+        }
+
+
+def refresh_ceiling(settings, session: str) -> float:
+    """Longest a symbol with interest waits between refreshes in ``session``"""
+    if session == CLOSED:
+        return settings.quote_poller_closed_interval_seconds
+    base = settings.quote_poller_interval_seconds * (1.0 if session == OPEN else _OFF_HOURS_SLOWDOWN)
+    return max(base, settings.quote_poller_max_interval_seconds)
+
+
+_poller: Optional[QuotePoller] = None
+
+
+async def start_quote_poller(settings, service) -> Optional[QuotePoller]:
+    """Start this worker's poller (it polls only while elected) when enabled"""
+    global _poller
+
+    if not settings.quote_poller_enabled or _poller is not None:
+        return _poller
+
+    if settings.quote_poller_election == "redis":
+        election = RedisLeaderLock(
+            settings.redis_url,
+            settings.quote_poller_leader_key,
+            settings.quote_poller_lock_ttl_seconds
+        )
+    else:
+        election = FileLeaderLock(
+            os.path.join(tempfile.gettempdir(), f"{settings.quote_poller_leader_key}.lock")
+        )
+
+    poller = QuotePoller(service, election, create_quote_bus(settings), settings)
+    try:
+        await poller.start()
+    except Exception as e:
+        logger.warning("Quote poller unavailable, requests will call Groww directly", error=str(e))
+        return None
+
+    _poller = poller
+    return _poller
+
+
+def get_quote_poller() -> Optional[QuotePoller]:
+    return _poller
+
+
+async def stop_quote_poller() -> None:
+    global _poller
+
+    if _poller is not None:
+        await _poller.stop()
+        _poller = None
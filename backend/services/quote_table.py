@@ -0,0 +1,487 @@
+"""
+Shared-Memory Quote Table
+Fixed-layout quote slots shared by all uvicorn workers on a host
+
+The table lives in one ``multiprocessing.shared_memory`` block:
+
+    header     64 bytes   magic, version, capacity, entry count, last poll
+    directory  capacity x 48 bytes   "EXCHANGE:SEGMENT:SYMBOL" keys (append-only)
+    slots      capacity x 128 bytes  seqlock counter + quote fields
+    demand     capacity x 40 bytes   LTP / quote last requested, held until, request count
+
+Slots are numbered in the order keys are first allocated, which
+differs between runs, and each process maps keys to slots through its
+own copy of the directory. Slot numbers are not the instrument master's
+IDs; the stream hub sends master IDs when a master is loaded and slot
+numbers only without one. Slots are allocated when a symbol is first
+fetched successfully (or, for demand, when the instrument master lists
+it), never for a request alone, so unknown symbols cannot fill the
+append-only directory. Writers hold a host-wide file lock
+and bump the slot's sequence number to odd before and even after
+updating it; readers retry while the sequence is odd or changed under
+them, so a read never mixes two updates and takes no lock at all.
+
+Each worker periodically adds its request counts and extends the leases
+of its held subscriptions in the demand region; the quote poller scans
+it to learn which symbols the workers on the host are serving.
+"""
+
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from config import get_settings
+from monitoring.metrics import QUOTE_TABLE_LOOKUPS
+
+logger = structlog.get_logger(__name__)
+
+_MAGIC = b"ALQT"
+_VERSION = 3
+
+_HEADER = struct.Struct("<4sHHII")  # magic, version, reserved, capacity, count
+_HEADER_SIZE = 64
+_COUNT_OFFSET = 12
+# When a quote poller last refreshed this host's table (0 = never)
+_POLLED_AT_OFFSET = 16
+
+_KEY_SIZE = 48
+
+# seq, ltp, open, high, low, close, change, change %, bid, ask,
+# volume, bid qty, ask qty, ltp updated at, quote updated at
+_SLOT = struct.Struct("<Q9d3q2d")
+_SLOT_SIZE = 128
+_SEQ = struct.Struct("<Q")
+
+FIELDS = (
+    "ltp", "open_price", "high_price", "low_price", "close_price",
+    "change", "change_percent", "bid_price", "ask_price",
+    "volume", "bid_quantity", "ask_quantity",
+    "ltp_updated_at", "quote_updated_at",
+)
+# ltp requested at, quote requested at, ltp held until, quote held until, requests
+_DEMAND = struct.Struct("<4dq")
+_DEMAND_SIZE = 40
+_DEMAND_KINDS = {"ltp": 0, "quote": 1}
+_DOUBLE = struct.Struct("<d")
+_COUNTER = struct.Struct("<q")
+
+# Field name -> (offset within the slot, codec), for partial updates
+_FIELD_OFFSETS = {
+    name: (_SEQ.size + 8 * index, struct.Struct("<" + code))
+    for index, (name, code) in enumerate(zip(FIELDS, "d" * 9 + "q" * 3 + "d" * 2))
+}
+
+# Reads give up (and report a miss) if a writer keeps the slot busy this long
+_MAX_READ_SPINS = 1000
+
+# Windows writer lock polling: backoff bounds and how long to try, in seconds
+_LOCK_MIN_BACKOFF = 0.00005
+_LOCK_MAX_BACKOFF = 0.001
+_LOCK_TIMEOUT = 5.0
+
+
+class _WriterLock:
+    """Host-wide exclusive lock on a file, for the table's writers"""
+
+    def __init__(self, path: str):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    if sys.platform == "win32":
+        def __enter__(self) -> None:
+            # LK_LOCK retries once a second, on the event loop; holders keep
+            # the lock for microseconds, so poll it without blocking instead
+            import msvcrt
+            delay = 0.0
+            deadline = time.monotonic() + _LOCK_TIMEOUT
+            while True:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                    return
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        raise
+                time.sleep(delay)
+                delay = min(_LOCK_MAX_BACKOFF, delay * 2 or _LOCK_MIN_BACKOFF)
+
+        def __exit__(self, exc_type, exc, tb) -> None:
+            import msvcrt
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+    else:
+        def __enter__(self) -> None:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+        def __exit__(self, exc_type, exc, tb) -> None:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class QuoteTable:
+    """Quote slots in shared memory, keyed by exchange, segment and symbol"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._buf = shm.buf
+        self.owner = owner
+
+        magic, version, _, capacity, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Shared memory {shm.name!r} is not a quote table")
+        self.capacity = capacity
+        self._slots_offset = _HEADER_SIZE + capacity * _KEY_SIZE
+        self._demand_offset = self._slots_offset + capacity * _SLOT_SIZE
+
+        self._lock = _WriterLock(_lock_path(shm.name))
+        # Per-process view of the append-only directory
+        self._index: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._indexed = 0
+        self._full_logged = False
+
+    @classmethod
+    def create(cls, name: str, capacity: int) -> "QuoteTable":
+        """
+        Create a fresh table, replacing any left behind by a previous run;
+        only for the supervisor or a single-process server, before any
+        worker can have attached
+        """
+        size = _table_size(capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        _initialize(shm, capacity)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "QuoteTable":
+        """Attach to a table created by another process"""
+        return cls(_untracked_shared_memory(name), owner=False)
+
+    @classmethod
+    def open(cls, name: str, capacity: int) -> "QuoteTable":
+        """
+        Attach to the host's table, creating it if there is none, for
+        workers started without a supervisor that created it. Runs under
+        the writer lock so racing workers agree on one block; it never
+        replaces a table, and is left in place on exit for the others.
+        """
+        lock = _WriterLock(_lock_path(name))
+        try:
+            with lock:
+                try:
+                    return cls.attach(name)
+                except FileNotFoundError:
+                    pass
+                shm = _untracked_shared_memory(name, create=True, size=_table_size(capacity))
+                _initialize(shm, capacity)
+                return cls(shm, owner=False)
+        finally:
+            lock.close()
+
+    @staticmethod
+    def key(symbol: str, exchange: str, segment: str) -> str:
+        return f"{exchange}:{segment}:{symbol}"
+
+    @staticmethod
+    def split_key(key: str) -> Tuple[str, str, str]:
+        """Inverse of ``key``: (symbol, exchange, segment)"""
+        exchange, segment, symbol = key.split(":", 2)
+        return symbol, exchange, segment
+
+    def slot(self, key: str, create: bool = False) -> Optional[int]:
+        """Slot index for ``key``, allocating one (under the writer lock) if asked"""
+        slot = self._index.get(key)
+        if slot is not None:
+            return slot
+
+        self._sync_index()
+        slot = self._index.get(key)
+        if slot is not None or not create:
+            return slot
+
+        encoded = key.encode("utf-8")
+        if len(encoded) > _KEY_SIZE:
+            return None
+
+        with self._lock:
+            # Another process may have added it since we synced
+            self._sync_index()
+            slot = self._index.get(key)
+            if slot is not None:
+                return slot
+
+            count = self._count()
+            if count >= self.capacity:
+                if not self._full_logged:
+                    logger.warning("Quote table full", capacity=self.capacity)
+                    self._full_logged = True
+                return None
+
+            # Write the key before publishing the new count
+            offset = _HEADER_SIZE + count * _KEY_SIZE
+            self._buf[offset:offset + _KEY_SIZE] = encoded.ljust(_KEY_SIZE, b"\0")
+            struct.pack_into("<I", self._buf, _COUNT_OFFSET, count + 1)
+            self._index[key] = count
+            self._keys.append(key)
+            self._indexed = count + 1
+            return count
+
+    def mark_polled(self, at: float) -> None:
+        """Record that a poller leader refreshed (or published to) this host's table"""
+        _DOUBLE.pack_into(self._buf, _POLLED_AT_OFFSET, at)
+
+    def polled_at(self) -> float:
+        return _DOUBLE.unpack_from(self._buf, _POLLED_AT_OFFSET)[0]
+
+    def _count(self) -> int:
+        return struct.unpack_from("<I", self._buf, _COUNT_OFFSET)[0]
+
+    def _sync_index(self) -> None:
+        count = self._count()
+        buf = self._buf
+        for slot in range(self._indexed, count):
+            offset = _HEADER_SIZE + slot * _KEY_SIZE
+            key = bytes(buf[offset:offset + _KEY_SIZE]).rstrip(b"\0").decode("utf-8")
+            self._index[key] = slot
+            self._keys.append(key)
+        self._indexed = count
+
+    def write(self, slot: int, **fields: Any) -> None:
+        """Update some fields of a slot; missing fields keep their values"""
+        buf = self._buf
+        offset = self._slots_offset + slot * _SLOT_SIZE
+        with self._lock:
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            _SEQ.pack_into(buf, offset, seq + 1)
+            try:
+                for name, value in fields.items():
+                    field_offset, codec = _FIELD_OFFSETS[name]
+                    if value is None:
+                        value = math.nan if codec.format.endswith("d") else 0
+                    codec.pack_into(buf, offset + field_offset, value)
+            finally:
+                _SEQ.pack_into(buf, offset, seq + 2)
+
+    def sequence(self, slot: int) -> int:
+        """Update counter of a slot: changes on every write, odd while one is in progress"""
+        return _SEQ.unpack_from(self._buf, self._slots_offset + slot * _SLOT_SIZE)[0]
+
+    def read(self, slot: int) -> Optional[Dict[str, Any]]:
+        """Consistent snapshot of a slot, or None if it was never written"""
+        buf = self._buf
+        offset = self._slots_offset + slot * _SLOT_SIZE
+        for _ in range(_MAX_READ_SPINS):
+            values = _SLOT.unpack_from(buf, offset)
+            seq = values[0]
+            if seq & 1 or _SEQ.unpack_from(buf, offset)[0] != seq:
+                continue
+            if seq == 0:
+                return None
+            return dict(zip(FIELDS, values[1:]))
+        return None
+
+    def get(self, key: str, max_age: float, timestamp_field: str) -> Optional[Dict[str, Any]]:
+        """Fields for ``key`` if ``timestamp_field`` is younger than ``max_age``"""
+        slot = self.slot(key)
+        if slot is None:
+            QUOTE_TABLE_LOOKUPS.labels(field=timestamp_field, result="miss").inc()
+            return None
+
+        fields = self.read(slot)
+        if fields is None or not fields[timestamp_field]:
+            QUOTE_TABLE_LOOKUPS.labels(field=timestamp_field, result="miss").inc()
+            return None
+        if time.time() - fields[timestamp_field] > max_age:
+            QUOTE_TABLE_LOOKUPS.labels(field=timestamp_field, result="stale").inc()
+            return None
+
+        QUOTE_TABLE_LOOKUPS.labels(field=timestamp_field, result="hit").inc()
+        return fields
+
+    def put(self, key: str, **fields: Any) -> None:
+        slot = self.slot(key, create=True)
+        if slot is not None:
+            self.write(slot, **fields)
+
+    def record_demand(
+        self,
+        requests: Dict[Tuple[str, str], int],
+        held: Iterable[Tuple[str, str]],
+        held_until: float
+    ) -> None:
+        """
+        Add one worker's request counts per (key, kind) since its last
+        report, and extend its held subscriptions' leases to ``held_until``;
+        keys without a slot are skipped, demand alone never allocates one
+        """
+        # Look slots up first: the writer lock is not reentrant
+        slots = {item: self.slot(item[0]) for item in (*requests, *held)}
+        buf = self._buf
+        now = time.time()
+        with self._lock:
+            for (key, kind), count in requests.items():
+                slot = slots[(key, kind)]
+                if slot is None:
+                    continue
+                offset = self._demand_offset + slot * _DEMAND_SIZE
+                _DOUBLE.pack_into(buf, offset + 8 * _DEMAND_KINDS[kind], now)
+                total = _COUNTER.unpack_from(buf, offset + 32)[0]
+                _COUNTER.pack_into(buf, offset + 32, total + count)
+            for key, kind in held:
+                slot = slots[(key, kind)]
+                if slot is None:
+                    continue
+                offset = self._demand_offset + slot * _DEMAND_SIZE + 16 + 8 * _DEMAND_KINDS[kind]
+                if _DOUBLE.unpack_from(buf, offset)[0] < held_until:
+                    _DOUBLE.pack_into(buf, offset, held_until)
+
+    def demand(self, since: float, now: float) -> Dict[str, Tuple[float, float, float, float, int]]:
+        """
+        Keys requested at or after ``since`` or held at ``now``, with
+        (ltp requested at, quote requested at, ltp held until, quote held
+        until, total requests)
+        """
+        self._sync_index()
+        start = self._demand_offset
+        end = start + self._indexed * _DEMAND_SIZE
+        demanded = {}
+        for slot, entry in enumerate(_DEMAND.iter_unpack(bytes(self._buf[start:end]))):
+            if entry[0] >= since or entry[1] >= since or entry[2] >= now or entry[3] >= now:
+                demanded[self._keys[slot]] = entry
+        return demanded
+
+    def close(self) -> None:
+        self._lock.close()
+        self._buf = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+def _lock_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+
+def _table_size(capacity: int) -> int:
+    return _HEADER_SIZE + capacity * (_KEY_SIZE + _SLOT_SIZE + _DEMAND_SIZE)
+
+
+def _initialize(shm: shared_memory.SharedMemory, capacity: int) -> None:
+    size = _table_size(capacity)
+    shm.buf[:size] = bytes(size)
+    _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, 0, capacity, 0)
+
+
+def _untracked_shared_memory(name: str, **kwargs: Any) -> shared_memory.SharedMemory:
+    """
+    Open a block without making this process its owner, so exiting does
+    not unlink it from under the other workers
+    """
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False, **kwargs)
+    except TypeError:
+        inherited_tracker = _has_inherited_resource_tracker()
+        shm = shared_memory.SharedMemory(name=name, **kwargs)
+        if not inherited_tracker:
+            _untrack(shm)
+        return shm
+
+
+def _has_inherited_resource_tracker() -> bool:
+    """
+    Workers spawned by the supervisor share its resource tracker, which
+    already owns the block; unregistering there would drop the owner's
+    registration instead of ours
+    """
+    if sys.platform == "win32":
+        return True
+    try:
+        from multiprocessing import resource_tracker
+        return resource_tracker._resource_tracker._fd is not None
+    except Exception:
+        return True
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    """
+    Stop this process's own resource tracker from unlinking a block it
+    only attached to (before Python 3.13 it does so when the process exits)
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception as e:
+        logger.debug("Could not untrack shared memory", error=str(e))
+
+
+_quote_table: Optional[QuoteTable] = None
+_quote_table_failed = False
+
+
+def create_quote_table(settings=None) -> Optional[QuoteTable]:
+    """
+    Create the table in the supervising (or only) process before workers
+    start, so they all attach to the same block; replaces any table left
+    by a previous run
+    """
+    global _quote_table
+
+    settings = settings or get_settings()
+    if not settings.quote_table_enabled:
+        return None
+
+    _quote_table = QuoteTable.create(settings.quote_table_name, settings.quote_table_capacity)
+    logger.info("Quote table created", name=settings.quote_table_name, capacity=settings.quote_table_capacity)
+    return _quote_table
+
+
+def get_quote_table() -> Optional[QuoteTable]:
+    """
+    The worker's handle on the shared table: the one created by the
+    supervisor, or, for workers started some other way (``uvicorn
+    main:app --workers N``, server.py), the host's table created by
+    whichever worker got there first
+    """
+    global _quote_table, _quote_table_failed
+
+    if _quote_table is not None or _quote_table_failed:
+        return _quote_table
+
+    settings = get_settings()
+    if not settings.quote_table_enabled:
+        _quote_table_failed = True
+        return None
+
+    try:
+        _quote_table = QuoteTable.open(settings.quote_table_name, settings.quote_table_capacity)
+    except Exception as e:
+        logger.warning("Quote table unavailable, using per-worker caching only", error=str(e))
+        _quote_table_failed = True
+
+    return _quote_table
+
+
+def close_quote_table() -> None:
+    global _quote_table
+
+    if _quote_table is not None:
+        _quote_table.close()
+        _quote_table = None
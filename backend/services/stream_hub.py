@@ -0,0 +1,563 @@
+"""
+Streaming Hub
+Fans quote updates out to this worker's WebSocket connections
+
+The hub watches the shared quote table, where the quote poller (or any
+worker's request) writes every refresh, for the symbols its connections
+subscribe to. A changed slot is read and serialized once, and the same
+message is queued to every subscriber: the cost of an update does not
+grow with lookups per client, only with the number of sends.
+
+Connections pick a wire format when they connect:
+
+    json      full ``ltp``/``quote`` messages on every change (default)
+    delta     a snapshot per instrument, then only the fields that changed,
+              keyed by integer instrument ID and field index
+    binary    the same snapshots and deltas as packed binary frames
+
+Instrument IDs are the instrument master's when one is loaded, and quote
+table slot indexes otherwise. Deltas are taken once per changed slot
+against the values last published,
+so every delta subscriber shares one diff; every ``resync_interval`` all
+subscribed instruments are sent as snapshots again.
+
+Subscriptions take a reference in the interest registry, so subscribed
+symbols are refreshed at the poller's fastest rate until released.
+"""
+
+import asyncio
+import json
+import math
+import struct
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, Optional, Set, Tuple, Union
+
+import structlog
+from starlette.websockets import WebSocket
+
+from services.interest_registry import InterestKey, get_interest_registry
+from services.instrument_master import get_instrument_master
+from services.market_data_service import quote_from_table_fields
+from services.quote_table import FIELDS, QuoteTable, get_quote_table
+from monitoring.metrics import (
+    STREAM_CONFLATED, STREAM_CONNECTIONS, STREAM_DISCONNECTS, STREAM_MESSAGES, STREAM_SEND_LAG,
+    STREAM_SLOW_CONSUMERS
+)
+
+logger = structlog.get_logger(__name__)
+
+KINDS = ("ltp", "quote")
+ENCODINGS = ("json", "delta", "binary")
+
+# Fields sent to "ltp" subscribers of the delta encodings
+LTP_FIELDS = ("ltp", "ltp_updated_at")
+_FIELD_INDEX = {name: index for index, name in enumerate(FIELDS)}
+
+# Binary frames: frame type, instrument ID and a bitmask of the fields
+# present, followed by one little-endian double per set bit in FIELDS order
+FRAME_SNAPSHOT = 1
+FRAME_DELTA = 2
+_FRAME_HEADER = struct.Struct("<BIH")
+
+# Close code for connections dropped by the server for falling behind
+SLOW_CONSUMER_CLOSE_CODE = 1008
+
+# Unsent replies (acks, errors) a client may accumulate before it is
+# treated as not reading
+_MAX_PENDING_CONTROL = 64
+
+
+def _same(a: float, b: float) -> bool:
+    # Missing prices are stored as NaN, which never equals itself
+    return a == b or (a != a and b != b)
+
+
+def changed_fields(previous: Optional[Dict[str, float]], fields: Dict[str, float]) -> Dict[str, float]:
+    """Fields of ``fields`` that differ from ``previous`` (all of them if there is none)"""
+    if previous is None:
+        return dict(fields)
+    return {name: value for name, value in fields.items() if not _same(previous[name], value)}
+
+
+class FieldUpdate:
+    """
+    Snapshot or delta of one instrument's fields for the delta encodings
+
+    Encoded at most once per wire format, so an update queued to many
+    connections is serialized once no matter how many receive it.
+    """
+
+    __slots__ = ("instrument_id", "fields", "snapshot", "_encoded")
+
+    def __init__(self, instrument_id: int, fields: Dict[str, float], snapshot: bool):
+        self.instrument_id = instrument_id
+        self.fields = fields
+        self.snapshot = snapshot
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+
+    def merge(self, newer: "FieldUpdate") -> "FieldUpdate":
+        """One update equivalent to this one followed by ``newer``"""
+        if newer.snapshot:
+            return newer
+        return FieldUpdate(self.instrument_id, {**self.fields, **newer.fields}, self.snapshot)
+
+    def encode(self, encoding: str) -> Union[str, bytes]:
+        encoded = self._encoded.get(encoding)
+        if encoded is not None:
+            return encoded
+
+        names = [name for name in FIELDS if name in self.fields]
+        if encoding == "binary":
+            mask = 0
+            for name in names:
+                mask |= 1 << _FIELD_INDEX[name]
+            encoded = _FRAME_HEADER.pack(
+                FRAME_SNAPSHOT if self.snapshot else FRAME_DELTA, self.instrument_id, mask
+            ) + struct.pack(f"<{len(names)}d", *(self.fields[name] for name in names))
+        else:
+            # Flat [field index, value, ...] pairs; NaN is not valid JSON
+            values = []
+            for name in names:
+                value = self.fields[name]
+                values.append(_FIELD_INDEX[name])
+                values.append(None if isinstance(value, float) and math.isnan(value) else value)
+            encoded = json.dumps({
+                "type": "snapshot" if self.snapshot else "delta",
+                "id": self.instrument_id,
+                "fields": values
+            }, separators=(",", ":"))
+        self._encoded[encoding] = encoded
+        return encoded
+
+
+class StreamConnection:
+    """
+    One client's subscriptions and conflating outbound queue
+
+    Pending updates are keyed by (symbol key, message type): a newer
+    update replaces the pending one instead of queueing behind it, so a
+    client that falls behind gets the latest state of each symbol rather
+    than every tick, and the queue never holds more than two entries per
+    subscription plus a few control replies. The replacement moves to
+    the back of the queue, keeping updates in the order they were made.
+
+    Field updates of the delta encodings merge instead of replacing, so
+    the client still ends up with every field that changed.
+
+    A client is slow when a single send has been blocked on the socket
+    for ``slow_after`` seconds (its receive buffer is full); waiting for
+    this connection's own rate limit does not count.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_rate: float,
+        slow_after: float,
+        disconnect_slow: bool,
+        encoding: str = "json"
+    ):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.subscriptions: Set[InterestKey] = set()
+        self.closed = False
+        self.max_rate = max_rate
+        self.slow_after = slow_after
+        self.disconnect_slow = disconnect_slow
+
+        # conflation key -> (message, first queued at)
+        self._pending: "OrderedDict[Hashable, Tuple[Union[str, FieldUpdate], float]]" = OrderedDict()
+        self._control_pending = 0
+        self._control_sequence = 0
+        self._wakeup = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+        self._slow = False
+        self._sending_since: Optional[float] = None
+        self.conflated = 0
+
+        # Token bucket: up to one second of burst at max_rate
+        self._tokens = max_rate
+        self._refilled = time.monotonic()
+
+    def start(self) -> None:
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def send(self, message: Union[str, FieldUpdate], conflation_key: Optional[Hashable] = None) -> None:
+        """Queue a message; updates with the same ``conflation_key`` replace each other"""
+        if self.closed:
+            return
+
+        now = time.monotonic()
+        if self._sending_since is not None:
+            self._check_blocked(now - self._sending_since)
+            if self.closed:
+                return
+        elif self._slow:
+            self._slow = False
+
+        if conflation_key is None:
+            if self._control_pending >= _MAX_PENDING_CONTROL:
+                # Not reading its own replies: nothing to conflate
+                self._close_slow()
+                return
+            self._control_sequence += 1
+            self._control_pending += 1
+            self._pending[("control", self._control_sequence)] = (message, now)
+        else:
+            pending = self._pending.get(conflation_key)
+            if pending is not None:
+                if isinstance(message, FieldUpdate):
+                    message = pending[0].merge(message)
+                # Go to the back of the line, so the client never sees this
+                # symbol's ltp jump ahead of a quote queued after the update
+                # being replaced; the age is kept for the lag metric
+                self._pending[conflation_key] = (message, pending[1])
+                self._pending.move_to_end(conflation_key)
+                self.conflated += 1
+                STREAM_CONFLATED.inc()
+            else:
+                self._pending[conflation_key] = (message, now)
+        self._wakeup.set()
+
+    def _check_blocked(self, blocked: float) -> None:
+        if blocked < self.slow_after:
+            return
+        if self.disconnect_slow:
+            self._close_slow()
+        elif not self._slow:
+            # Report each slow episode once; conflation keeps its memory bounded
+            self._slow = True
+            STREAM_SLOW_CONSUMERS.labels(action="conflated").inc()
+            logger.info("Slow stream consumer", blocked_seconds=round(blocked, 1), pending=len(self._pending))
+
+    def _close_slow(self) -> None:
+        STREAM_SLOW_CONSUMERS.labels(action="disconnected").inc()
+        logger.info("Disconnecting slow stream consumer", pending=len(self._pending))
+        self.close(SLOW_CONSUMER_CLOSE_CODE, "Slow consumer", reason_label="slow_consumer")
+
+    def close(self, code: int = 1000, reason: str = "", reason_label: str = "server") -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._pending.clear()
+        STREAM_DISCONNECTS.labels(reason=reason_label).inc()
+        if self._sender is not None:
+            self._sender.cancel()
+        asyncio.create_task(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str) -> None:
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            # Already closed by the client
+            pass
+
+    async def _throttle(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.max_rate, self._tokens + (now - self._refilled) * self.max_rate)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.max_rate)
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                if not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                # Wait for a send slot before taking the message, so
+                # updates arriving meanwhile still conflate into it
+                await self._throttle()
+                key, (message, queued_at) = self._pending.popitem(last=False)
+                if key[0] == "control":
+                    self._control_pending -= 1
+                self._sending_since = time.monotonic()
+                if isinstance(message, FieldUpdate):
+                    message = message.encode(self.encoding)
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+                self._sending_since = None
+                STREAM_SEND_LAG.observe(time.monotonic() - queued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug("Stream send failed", error=str(e))
+            self.close(reason_label="send_error")
+
+    async def stop(self) -> None:
+        """Stop sending after the client went away"""
+        if not self.closed:
+            self.closed = True
+            STREAM_DISCONNECTS.labels(reason="client").inc()
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+class StreamHub:
+    """Subscriptions of this worker's connections and the fan-out loop"""
+
+    def __init__(self, interval: float, resync_interval: float):
+        self.interval = interval
+        self.resync_interval = resync_interval
+        self._subscribers: Dict[InterestKey, Set[StreamConnection]] = {}
+        # key -> slot sequence last published
+        self._sequences: Dict[str, int] = {}
+        # key -> (ltp updated at, quote updated at) last published
+        self._published: Dict[str, Tuple[float, float]] = {}
+        # key -> fields last published, the base of the next delta
+        self._values: Dict[str, Dict[str, float]] = {}
+        # key -> instrument ID sent to delta subscribers
+        self._ids: Dict[str, int] = {}
+        self._last_resync = time.monotonic()
+        self._connections: Set[StreamConnection] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for connection in list(self._connections):
+            connection.close(1001, "Server shutting down")
+
+    def add(self, connection: StreamConnection) -> None:
+        self._connections.add(connection)
+        STREAM_CONNECTIONS.inc()
+        connection.start()
+
+    async def remove(self, connection: StreamConnection) -> None:
+        for key, kind in list(connection.subscriptions):
+            self.unsubscribe(connection, key, kind)
+        if connection in self._connections:
+            self._connections.discard(connection)
+            STREAM_CONNECTIONS.dec()
+        await connection.stop()
+
+    @staticmethod
+    def instrument_id(key: str) -> Optional[int]:
+        """ID of ``key`` in the delta encodings: the master's, or its table slot without a master"""
+        master = get_instrument_master()
+        if master is not None:
+            instrument = master.by_key(key)
+            return instrument.id if instrument else None
+        quote_table = get_quote_table()
+        return quote_table.slot(key) if quote_table else None
+
+    def subscribe(self, connection: StreamConnection, key: str, kind: str) -> None:
+        item = (key, kind)
+        if item in connection.subscriptions:
+            return
+        connection.subscriptions.add(item)
+        self._subscribers.setdefault(item, set()).add(connection)
+        get_interest_registry().acquire(key, kind, "websocket")
+
+        if connection.encoding != "json" and key not in self._ids:
+            instrument_id = self.instrument_id(key)
+            if instrument_id is None:
+                return
+            self._ids[key] = instrument_id
+
+        # Start the new subscriber off with whatever the table has
+        quote_table = get_quote_table()
+        slot = quote_table.slot(key) if quote_table else None
+        if slot is None:
+            return
+        if connection.encoding == "json":
+            fields = quote_table.read(slot)
+            if fields and fields[f"{kind}_updated_at"]:
+                connection.send(self._encode(key, kind, fields), (key, kind))
+                STREAM_MESSAGES.labels(type=kind).inc()
+            return
+
+        # Deltas are taken against the last published values, so the
+        # snapshot must be those too when there are any
+        fields = self._values.get(key) or quote_table.read(slot)
+        if fields:
+            names = FIELDS if kind == "quote" else LTP_FIELDS
+            update = FieldUpdate(self._ids[key], {name: fields[name] for name in names}, snapshot=True)
+            connection.send(update, (key, kind, "fields"))
+            STREAM_MESSAGES.labels(type="snapshot").inc()
+
+    def unsubscribe(self, connection: StreamConnection, key: str, kind: str) -> None:
+        item = (key, kind)
+        if item not in connection.subscriptions:
+            return
+        connection.subscriptions.discard(item)
+        get_interest_registry().release(key, kind, "websocket")
+
+        subscribers = self._subscribers.get(item)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self._subscribers[item]
+                if not any((key, other) in self._subscribers for other in KINDS):
+                    self._sequences.pop(key, None)
+                    self._published.pop(key, None)
+                    self._values.pop(key, None)
+                    self._ids.pop(key, None)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.publish_changes()
+            except Exception as e:
+                logger.warning("Stream fan-out failed", error=str(e))
+
+    def publish_changes(self) -> None:
+        """Send every subscribed symbol whose quote table slot changed since the last pass"""
+        quote_table = get_quote_table()
+        if not quote_table:
+            return
+
+        now = time.monotonic()
+        resync = now - self._last_resync >= self.resync_interval
+        if resync:
+            self._last_resync = now
+
+        for key in {key for key, _ in self._subscribers}:
+            slot = quote_table.slot(key)
+            if slot is None:
+                continue
+            sequence = quote_table.sequence(slot)
+            if sequence == self._sequences.get(key):
+                if resync and key in self._values:
+                    self._publish_fields(key, self._values[key], snapshot=True)
+                continue
+            fields = quote_table.read(slot)
+            if fields is None:
+                continue
+            self._sequences[key] = sequence
+
+            previous = self._values.get(key)
+            self._values[key] = fields
+            if resync or previous is None:
+                self._publish_fields(key, fields, snapshot=True)
+            else:
+                changed = changed_fields(previous, fields)
+                if changed:
+                    self._publish_fields(key, changed, snapshot=False)
+
+            last_ltp, last_quote = self._published.get(key, (0.0, 0.0))
+            quote_changed = fields["quote_updated_at"] > last_quote
+            ltp_changed = fields["ltp_updated_at"] > last_ltp
+            self._published[key] = (fields["ltp_updated_at"], fields["quote_updated_at"])
+
+            if quote_changed:
+                self._fan_out((key, "quote"), self._encode(key, "quote", fields), "quote")
+            if ltp_changed:
+                message = self._encode(key, "ltp", fields)
+                self._fan_out((key, "ltp"), message, "ltp")
+                if not quote_changed:
+                    # Quote subscribers also follow the last price between quote refreshes
+                    self._fan_out((key, "quote"), message, "ltp")
+
+    def _fan_out(self, item: InterestKey, message: str, message_type: str) -> None:
+        subscribers = self._subscribers.get(item)
+        if not subscribers:
+            return
+        conflation_key = (item[0], message_type)
+        sent = 0
+        for connection in list(subscribers):
+            if connection.encoding == "json":
+                connection.send(message, conflation_key)
+                sent += 1
+        if sent:
+            STREAM_MESSAGES.labels(type=message_type).inc(sent)
+
+    def _publish_fields(self, key: str, fields: Dict[str, float], snapshot: bool) -> None:
+        """Queue ``fields`` to the delta subscribers of ``key``, one shared update per mode"""
+        instrument_id = self._ids.get(key)
+        if instrument_id is None:
+            # Only JSON subscribers
+            return
+        message_type = "snapshot" if snapshot else "delta"
+        for kind in KINDS:
+            subscribers = self._subscribers.get((key, kind))
+            if not subscribers:
+                continue
+            names = FIELDS if kind == "quote" else LTP_FIELDS
+            values = {name: fields[name] for name in names if name in fields}
+            if not values:
+                continue
+            update = FieldUpdate(instrument_id, values, snapshot)
+            sent = 0
+            for connection in list(subscribers):
+                if connection.encoding != "json":
+                    connection.send(update, (key, kind, "fields"))
+                    sent += 1
+            if sent:
+                STREAM_MESSAGES.labels(type=message_type).inc(sent)
+
+    @staticmethod
+    def _encode(key: str, kind: str, fields: Dict) -> str:
+        symbol, exchange, segment = QuoteTable.split_key(key)
+        if kind == "ltp":
+            payload = {
+                "symbol": symbol,
+                "exchange": exchange,
+                "segment": segment,
+                "ltp": fields["ltp"],
+                "timestamp": datetime.fromtimestamp(fields["ltp_updated_at"]).isoformat()
+            }
+        else:
+            quote = quote_from_table_fields(symbol, exchange, segment, fields)
+            payload = {**quote.dict(), "timestamp": quote.timestamp.isoformat()}
+        return json.dumps({"type": kind, **payload}, separators=(",", ":"))
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "connections": len(self._connections),
+            "pending_messages": sum(connection.pending for connection in self._connections),
+            "conflated_messages": sum(connection.conflated for connection in self._connections),
+            "subscriptions": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "symbols": len({key for key, _ in self._subscribers})
+        }
+
+
+_hub: Optional[StreamHub] = None
+
+
+def start_stream_hub(settings) -> Optional[StreamHub]:
+    """Start this worker's fan-out loop when streaming is enabled"""
+    global _hub
+
+    if not settings.stream_enabled or _hub is not None:
+        return _hub
+
+    _hub = StreamHub(settings.stream_interval_ms / 1000, settings.stream_resync_seconds)
+    _hub.start()
+    return _hub
+
+
+def get_stream_hub() -> Optional[StreamHub]:
+    return _hub
+
+
+async def stop_stream_hub() -> None:
+    global _hub
+
+    if _hub is not None:
+        await _hub.stop()
+        _hub = None
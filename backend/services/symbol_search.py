@@ -0,0 +1,262 @@
+"""
+Symbol Search
+Type-ahead over the instrument master
+
+Two sorted arrays of (term, instrument ID) back prefix lookups: trading
+symbols, and company names plus each word of them. A prefix is a bisect
+into each array followed by a walk over the matching run. Runs too long
+to rank per keystroke (one- and two-letter prefixes, option chains) are
+ranked once and cached, since the master never changes after loading.
+
+Results are ranked by how they matched (exact symbol, symbol prefix,
+name prefix, typo) and then by a static order computed once: cash
+equities before other cash instruments before derivatives, NSE before
+other exchanges, shorter symbols first.
+
+Typos are handled for cash-segment symbols and name words with a
+deletion index (symmetric delete): every term is indexed under each
+string obtained by dropping one character, and a query matches a term
+when the two share a deletion, which covers one inserted, missing,
+replaced or swapped character. Partially typed queries additionally
+match as prefixes after dropping one character of the query.
+"""
+
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import structlog
+
+from services.instrument_master import Instrument, InstrumentMaster
+
+logger = structlog.get_logger(__name__)
+
+# How a result matched, best first
+MATCH_EXACT = 0
+MATCH_SYMBOL_PREFIX = 1
+MATCH_NAME_PREFIX = 2
+MATCH_TYPO = 3
+MATCH_NAMES = ("exact", "symbol_prefix", "name_prefix", "typo")
+
+# Prefix runs longer than this are ranked once and cached
+_MAX_SCAN = 256
+# Ranked entries kept per cached run
+_CACHED_TOP = 50
+# Shortest query and term the deletion index is used for
+_MIN_TYPO_LENGTH = 4
+
+_WORD = re.compile(r"[A-Z0-9&]+")
+
+
+def normalize(text: str) -> str:
+    """Upper case, words separated by single spaces"""
+    return " ".join(_WORD.findall(text.upper()))
+
+
+def _deletions(term: str) -> List[str]:
+    return [term[:i] + term[i + 1:] for i in range(len(term))]
+
+
+class _PrefixIndex:
+    """Sorted (term, instrument ID) pairs"""
+
+    def __init__(self, pairs: List[Tuple[str, int]]):
+        pairs.sort()
+        self.terms = [term for term, _ in pairs]
+        self.ids = [instrument_id for _, instrument_id in pairs]
+
+    def run(self, prefix: str) -> Tuple[int, int]:
+        """Bounds of the entries starting with ``prefix``"""
+        lo = bisect_left(self.terms, prefix)
+        # Every term starting with prefix sorts below prefix + a character above any used
+        hi = bisect_left(self.terms, prefix + "\uffff", lo)
+        return lo, hi
+
+
+class SymbolSearch:
+    """Ranked prefix and typo-tolerant search over an instrument master"""
+
+    def __init__(self, master: InstrumentMaster):
+        self._master = master
+
+        symbols: List[Tuple[str, int]] = []
+        names: List[Tuple[str, int]] = []
+        # term -> instrument IDs, for terms reached through the deletion index
+        self._term_ids: Dict[str, List[int]] = defaultdict(list)
+        for instrument in master:
+            symbols.append((instrument.symbol, instrument.id))
+            name = normalize(instrument.name)
+            if name:
+                names.append((name, instrument.id))
+                for word in set(name.split(" ")[1:]):
+                    names.append((word, instrument.id))
+            if instrument.segment == "CASH":
+                self._term_ids[instrument.symbol].append(instrument.id)
+                for word in set(name.split(" ")):
+                    if len(word) >= _MIN_TYPO_LENGTH:
+                        self._term_ids[word].append(instrument.id)
+
+        self._symbols = _PrefixIndex(symbols)
+        self._names = _PrefixIndex(names)
+
+        # deletion -> terms it was derived from
+        self._deletes: Dict[str, List[str]] = defaultdict(list)
+        for term in self._term_ids:
+            if len(term) >= _MIN_TYPO_LENGTH:
+                for deletion in set(_deletions(term)):
+                    self._deletes[deletion].append(term)
+
+        # Static order: position of each instrument in the tie-break ranking
+        order = sorted(master, key=self._static_key)
+        self._rank = [0] * len(master)
+        for rank, instrument in enumerate(order):
+            self._rank[instrument.id] = rank
+
+        self._exchanges = {instrument.exchange for instrument in master}
+        self._segments = {instrument.segment for instrument in master}
+        self._run_cache: Dict[Tuple[str, str, Optional[str], Optional[str]], List[int]] = {}
+
+    @staticmethod
+    def _static_key(instrument: Instrument):
+        return (
+            instrument.segment != "CASH",
+            instrument.instrument_type not in ("EQ", ""),
+            instrument.exchange != "NSE",
+            len(instrument.symbol),
+            instrument.symbol
+        )
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        exchange: Optional[str] = None,
+        segment: Optional[str] = None
+    ) -> List[Tuple[Instrument, str]]:
+        """Best ``limit`` instruments for ``query`` with how each matched"""
+        query = normalize(query)
+        if not query:
+            return []
+        exchange = exchange.upper() if exchange else None
+        segment = segment.upper() if segment else None
+        if (exchange and exchange not in self._exchanges) or (segment and segment not in self._segments):
+            # Also keeps arbitrary filter values out of the run cache
+            return []
+
+        # instrument ID -> best match class
+        matches: Dict[int, int] = {}
+        self._collect(self._symbols, "symbols", query, MATCH_SYMBOL_PREFIX, exchange, segment, matches)
+        self._collect(self._names, "names", query, MATCH_NAME_PREFIX, exchange, segment, matches)
+        for instrument_id in list(matches):
+            if self._master.by_id(instrument_id).symbol == query:
+                matches[instrument_id] = MATCH_EXACT
+
+        if len(matches) < limit and len(query) >= _MIN_TYPO_LENGTH and " " not in query:
+            self._collect_typos(query, exchange, segment, matches)
+
+        rank = self._rank
+        best = sorted(matches, key=lambda instrument_id: (matches[instrument_id], rank[instrument_id]))[:limit]
+        return [(self._master.by_id(instrument_id), MATCH_NAMES[matches[instrument_id]]) for instrument_id in best]
+
+    def _accepts(self, instrument_id: int, exchange: Optional[str], segment: Optional[str]) -> bool:
+        instrument = self._master.by_id(instrument_id)
+        return (exchange is None or instrument.exchange == exchange) and \
+            (segment is None or instrument.segment == segment)
+
+    def _collect(
+        self,
+        index: _PrefixIndex,
+        index_name: str,
+        prefix: str,
+        match: int,
+        exchange: Optional[str],
+        segment: Optional[str],
+        matches: Dict[int, int]
+    ) -> None:
+        lo, hi = index.run(prefix)
+        if hi - lo > _MAX_SCAN:
+            ids = self._ranked_run(index, index_name, prefix, lo, hi, exchange, segment)
+        else:
+            ids = [instrument_id for instrument_id in index.ids[lo:hi] if self._accepts(instrument_id, exchange, segment)]
+        for instrument_id in ids:
+            if matches.get(instrument_id, match + 1) > match:
+                matches[instrument_id] = match
+
+    def _ranked_run(
+        self,
+        index: _PrefixIndex,
+        index_name: str,
+        prefix: str,
+        lo: int,
+        hi: int,
+        exchange: Optional[str],
+        segment: Optional[str]
+    ) -> List[int]:
+        cache_key = (index_name, prefix, exchange, segment)
+        ids = self._run_cache.get(cache_key)
+        if ids is None:
+            rank = self._rank
+            accepted = {
+                instrument_id for instrument_id in index.ids[lo:hi]
+                if self._accepts(instrument_id, exchange, segment)
+            }
+            ids = sorted(accepted, key=rank.__getitem__)[:_CACHED_TOP]
+            self._run_cache[cache_key] = ids
+        return ids
+
+    def _collect_typos(
+        self,
+        query: str,
+        exchange: Optional[str],
+        segment: Optional[str],
+        matches: Dict[int, int]
+    ) -> None:
+        # Whole terms within one edit of the query
+        terms = set(self._deletes.get(query, ()))
+        if query in self._term_ids:
+            terms.add(query)
+        for deletion in set(_deletions(query)):
+            if deletion in self._term_ids:
+                terms.add(deletion)
+            terms.update(self._deletes.get(deletion, ()))
+        for term in terms:
+            for instrument_id in self._term_ids[term]:
+                if instrument_id not in matches and self._accepts(instrument_id, exchange, segment):
+                    matches[instrument_id] = MATCH_TYPO
+
+        # A partially typed query with one extra character
+        for deletion in set(_deletions(query)):
+            lo, hi = self._symbols.run(deletion)
+            for instrument_id in self._symbols.ids[lo:min(hi, lo + _MAX_SCAN)]:
+                if instrument_id not in matches and self._accepts(instrument_id, exchange, segment):
+                    matches[instrument_id] = MATCH_TYPO
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "symbol_terms": len(self._symbols.terms),
+            "name_terms": len(self._names.terms),
+            "typo_deletions": len(self._deletes),
+            "cached_runs": len(self._run_cache)
+        }
+
+
+_search: Optional[SymbolSearch] = None
+
+
+def build_symbol_search(master: InstrumentMaster) -> SymbolSearch:
+    global _search
+
+    started = time.perf_counter()
+    _search = SymbolSearch(master)
+    logger.info(
+        "Symbol search index built",
+        build_seconds=round(time.perf_counter() - started, 3),
+        **_search.snapshot()
+    )
+    return _search
+
+
+def get_symbol_search() -> Optional[SymbolSearch]:
+    return _search
@@ -0,0 +1,51 @@
+"""
+Shared test setup: the backend is not an installed package, so its
+directory goes on ``sys.path`` the way uvicorn runs it
+"""
+
+import os
+import sys
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Keep tests off the network and away from a running instance's shared table
+os.environ.setdefault("REDIS_URL", "redis://localhost:1")
+os.environ.setdefault("QUOTE_TABLE_NAME", f"aladdin_qtest_{os.getpid()}")
+os.environ.setdefault("QUOTE_POLLER_ENABLED", "false")
+
+
+INSTRUMENTS_CSV = """\
+exchange,segment,trading_symbol,name,isin,instrument_type,exchange_token,lot_size,tick_size
+NSE,CASH,RELIANCE,Reliance Industries Limited,INE002A01018,EQ,2885,1,0.05
+BSE,CASH,RELIANCE,Reliance Industries Limited,INE002A01018,EQ,500325,1,0.05
+NSE,CASH,TCS,Tata Consultancy Services Limited,INE467B01029,EQ,11536,1,0.05
+NSE,CASH,TATAMOTORS,Tata Motors Limited,INE155A01022,EQ,3456,1,0.05
+NSE,CASH,INFY,Infosys Limited,INE009A01021,EQ,1594,1,0.05
+NSE,CASH,HDFCBANK,HDFC Bank Limited,INE040A01034,EQ,1333,1,0.05
+NSE,FNO,RELIANCE25JANFUT,Reliance Industries Limited,,FUT,35000,250,0.10
+nse,cash,reliance,Duplicate Listing,,EQ,1,1,0.05
+NSE,CASH,,Missing Symbol,,EQ,2,1,0.05
+"""
+
+
+@pytest.fixture
+def instruments_csv(tmp_path):
+    """A small instruments file in Groww's format, with a duplicate and a blank row"""
+    path = tmp_path / "instrument.csv"
+    path.write_text(INSTRUMENTS_CSV, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def quote_table_name():
+    """A shared memory name no other table uses; its lock file is removed afterwards"""
+    from services.quote_table import _lock_path
+
+    name = f"aladdin_qtest_{uuid.uuid4().hex[:12]}"
+    yield name
+    if os.path.exists(_lock_path(name)):
+        os.remove(_lock_path(name))
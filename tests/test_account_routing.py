@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from services import circuit_breaker, market_data_service
+from services.circuit_breaker import CircuitOpenError
+from services.market_data_service import MarketDataService
+
+
+class FakeSession:
+    def __init__(self, name):
+        self.name = name
+
+    async def get_authenticated_client(self):
+        return self.name
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    pool = [FakeSession("a"), FakeSession("b")]
+
+    async def get_market_data_sessions():
+        return pool
+
+    monkeypatch.setattr(market_data_service, "get_market_data_sessions", get_market_data_sessions)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    return pool
+
+
+def call(service, response):
+    async def request(client):
+        return dict(response, client=client)
+
+    return asyncio.run(service._call_upstream("ltp", request))
+
+
+def test_open_account_is_routed_around(sessions):
+    service = MarketDataService()
+    circuit_breaker.get_breaker("ltp:a")._trip(Exception("rate limited"))
+
+    clients = {call(service, {"status": "SUCCESS"})["client"] for _ in range(5)}
+
+    assert clients == {"b"}
+
+
+def test_fails_fast_only_when_every_account_is_open(sessions):
+    service = MarketDataService()
+    for session in sessions:
+        circuit_breaker.get_breaker(f"ltp:{session.name}")._trip(Exception("rate limited"))
+
+    with pytest.raises(CircuitOpenError) as rejected:
+        call(service, {"status": "SUCCESS"})
+    assert rejected.value.retry_after > 0
+
+
+def test_failures_trip_only_the_calling_account(sessions):
+    service = MarketDataService()
+    service.settings = service.settings.copy(update={"market_data_routing": "symbol_hash"})
+
+    async def failing(client):
+        return {"status": "FAILURE", "error": "boom"}
+
+    for _ in range(service.settings.circuit_failure_threshold):
+        with pytest.raises(Exception):
+            asyncio.run(service._call_upstream("ltp", failing, route_key="RELIANCE"))
+
+    states = {name: breaker.state for name, breaker in circuit_breaker._breakers.items()}
+    assert sorted(states.values()) == ["closed", "open"]
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from services import circuit_breaker
+from services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, UpstreamError
+)
+
+
+class GrowwAPIRateLimitException(Exception):
+    pass
+
+
+class GrowwAPIBadRequestException(Exception):
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    # Take the full backoff, so open periods are exact
+    monkeypatch.setattr(circuit_breaker.random, "uniform", lambda low, high: high)
+    return now
+
+
+def call(breaker, error=None):
+    async def run():
+        async with breaker.guard():
+            if error is not None:
+                raise error
+
+    asyncio.run(run())
+
+
+def fail(breaker, error=None):
+    with pytest.raises(type(error) if error else UpstreamError):
+        call(breaker, error or UpstreamError("test", "boom"))
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, open_seconds=4)
+
+    fail(breaker)
+    fail(breaker)
+    call(breaker)
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == CLOSED
+
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.retry_after == 4
+
+
+def test_open_breaker_rejects_without_calling(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=4)
+    fail(breaker)
+
+    clock[0] += 1
+    assert not breaker.allows_call()
+    with pytest.raises(CircuitOpenError) as rejected:
+        call(breaker)
+    assert rejected.value.retry_after == 3
+
+
+def test_rate_limit_opens_immediately(clock):
+    breaker = CircuitBreaker("test", failure_threshold=5)
+
+    fail(breaker, GrowwAPIRateLimitException())
+
+    assert breaker.state == OPEN
+
+
+def test_client_errors_count_as_success(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    fail(breaker)
+
+    fail(breaker, GrowwAPIBadRequestException())
+    fail(breaker)
+
+    assert breaker.state == CLOSED
+
+
+def test_successful_probe_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=4)
+    fail(breaker)
+
+    clock[0] += 4
+    assert breaker.allows_call()
+    call(breaker)
+
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["trips"] == 0
+
+
+def test_failed_probe_reopens_for_twice_as_long(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=4, max_open_seconds=10)
+    fail(breaker)
+
+    clock[0] += 4
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.retry_after == 8
+
+    clock[0] += 8
+    fail(breaker)
+    assert breaker.retry_after == 10
+
+
+def test_half_open_admits_limited_probes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=4, half_open_max_calls=1)
+    fail(breaker)
+    clock[0] += 4
+
+    async def probe_while_another_is_in_flight():
+        async with breaker.guard():
+            assert breaker.state == HALF_OPEN
+            assert not breaker.allows_call()
+            with pytest.raises(CircuitOpenError):
+                breaker.check()
+
+    asyncio.run(probe_while_another_is_in_flight())
+    assert breaker.state == CLOSED
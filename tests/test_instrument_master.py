@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import instrument_master
+from services.instrument_master import InstrumentMaster, UnknownInstrumentError, resolve_instrument
+
+
+@pytest.fixture
+def master(instruments_csv):
+    return InstrumentMaster.load(instruments_csv)
+
+
+def test_load_numbers_rows_in_file_order_skipping_duplicates_and_blanks(master):
+    assert len(master) == 7
+    assert [instrument.id for instrument in master] == list(range(7))
+    assert master.by_id(2).symbol == "TCS"
+    assert master.by_id(7) is None
+    assert master.by_id(-1) is None
+
+
+def test_fields_are_parsed(master):
+    future = master.get("RELIANCE25JANFUT", "NSE", "FNO")
+
+    assert future.key == "NSE:FNO:RELIANCE25JANFUT"
+    assert future.instrument_type == "FUT"
+    assert future.lot_size == 250
+    assert future.tick_size == 0.10
+
+
+def test_lookup_by_listing_is_case_insensitive(master):
+    assert master.get("reliance", "bse", "cash").exchange_token == "500325"
+    assert master.get("RELIANCE").exchange == "NSE"
+    assert master.get("UNKNOWN") is None
+
+
+def test_lookup_by_key_and_isin(master):
+    assert master.by_key("NSE:CASH:INFY").name == "Infosys Limited"
+    assert [listing.exchange for listing in master.by_isin("ine002a01018")] == ["NSE", "BSE"]
+    assert master.by_isin("INE000000000") == ()
+
+
+@pytest.fixture
+def loaded(instruments_csv, monkeypatch):
+    monkeypatch.setattr(instrument_master, "_master", None)
+    monkeypatch.setattr(instrument_master, "_validate", False)
+
+    def load(validate):
+        settings = SimpleNamespace(instruments_file=instruments_csv, instruments_validate_symbols=validate)
+        return instrument_master.load_instrument_master(settings)
+
+    return load
+
+
+def test_missing_file_leaves_symbols_unvalidated(monkeypatch, tmp_path):
+    monkeypatch.setattr(instrument_master, "_master", None)
+    settings = SimpleNamespace(instruments_file=str(tmp_path / "missing.csv"), instruments_validate_symbols=True)
+
+    assert instrument_master.load_instrument_master(settings) is None
+    assert resolve_instrument("ANYTHING").id is None
+
+
+def test_resolve_returns_the_master_instrument(loaded):
+    master = loaded(validate=True)
+
+    assert resolve_instrument("tcs") is master.get("TCS")
+
+
+def test_resolve_rejects_unknown_symbols_when_validating(loaded):
+    loaded(validate=True)
+
+    with pytest.raises(UnknownInstrumentError):
+        resolve_instrument("NOPE")
+
+
+def test_resolve_passes_unknown_symbols_through_without_validation(loaded):
+    loaded(validate=False)
+
+    instrument = resolve_instrument("NOPE", "BSE", "CASH")
+
+    assert instrument.id is None
+    assert instrument.key == "BSE:CASH:NOPE"
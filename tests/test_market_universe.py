@@ -0,0 +1,182 @@
+import time
+
+import numpy as np
+import pytest
+
+from services import market_universe
+from services.market_universe import SECTOR_MOVERS, MarketUniverse, _top_k, load_constituents
+from services.quote_table import QuoteTable
+
+
+def constituents(*rows):
+    return [{"symbol": symbol, "name": symbol.title(), "sector": sector, "weight": weight} for symbol, sector, weight in rows]
+
+
+@pytest.fixture
+def table(quote_table_name):
+    table = QuoteTable.create(quote_table_name, capacity=64)
+    yield table
+    table.close()
+
+
+def quote(table, symbol, ltp, close, volume=0):
+    now = time.time()
+    table.put(QuoteTable.key(symbol, "NSE", "CASH"), ltp=ltp, close_price=close, volume=volume,
+              ltp_updated_at=now, quote_updated_at=now)
+
+
+def test_top_k_matches_a_full_sort():
+    rng = np.random.default_rng(7)
+    values = rng.normal(size=500)
+    mask = values > -0.5
+
+    for k in (1, 5, 50, 1000):
+        expected = [row for row in np.argsort(-values, kind="stable") if mask[row]][:k]
+        assert list(_top_k(values, mask, k)) == expected
+
+
+def test_top_k_keeps_row_order_for_ties():
+    values = np.array([1.0, 3.0, 3.0, 2.0, 3.0])
+
+    assert list(_top_k(values, np.ones(5, dtype=bool), 3)) == [1, 2, 4]
+    assert list(_top_k(values, np.zeros(5, dtype=bool), 3)) == []
+
+
+def test_update_copies_only_changed_slots(table):
+    universe = MarketUniverse(constituents(("AAA", "X", 1.0), ("BBB", "X", 1.0)), "NSE", "CASH", top_k=5)
+    quote(table, "AAA", 110.0, 100.0)
+
+    assert universe.update(table) == [0]
+    assert universe.update(table) == []
+    assert universe.change_percent[0] == pytest.approx(10.0)
+    assert np.isnan(universe.change_percent[1])
+
+    quote(table, "BBB", 95.0, 100.0)
+    assert universe.update(table) == [1]
+    assert universe.version == 2
+
+
+def test_last_price_moves_change_against_the_quoted_close(table):
+    universe = MarketUniverse(constituents(("AAA", "X", 1.0)), "NSE", "CASH", top_k=5)
+    quote(table, "AAA", 100.0, 100.0)
+    universe.update(table)
+
+    table.put(QuoteTable.key("AAA", "NSE", "CASH"), ltp=102.0, ltp_updated_at=time.time())
+    universe.update(table)
+
+    assert universe.change[0] == pytest.approx(2.0)
+    assert universe.change_percent[0] == pytest.approx(2.0)
+
+
+def test_rank_lists_gainers_losers_and_most_active(table):
+    rows = [("UP1", 101.0, 1000), ("UP5", 105.0, 10), ("UP3", 103.0, 500), ("FLAT", 100.0, 50), ("DOWN2", 98.0, 5000)]
+    universe = MarketUniverse(constituents(*((symbol, "X", 1.0) for symbol, _, _ in rows)), "NSE", "CASH", top_k=2)
+    for symbol, ltp, volume in rows:
+        quote(table, symbol, ltp, 100.0, volume)
+    universe.update(table)
+
+    universe.rank()
+    movers = universe.top_movers()
+
+    assert [entry["symbol"] for entry in movers["gainers"]] == ["UP5", "UP3"]
+    assert [entry["symbol"] for entry in movers["losers"]] == ["DOWN2"]
+    assert [entry["symbol"] for entry in movers["most_active"]] == ["DOWN2", "UP1"]
+    assert movers["gainers"][0]["change_percent"] == 5.0
+
+
+def expected_sector_changes(universe):
+    """Weighted average change % per priced sector, computed from scratch"""
+    expected = {}
+    for sector in set(universe.sectors.names):
+        rows = [row for row in range(len(universe)) if universe.sectors.names[universe.sectors.sector_of[row]] == sector]
+        priced = [row for row in rows if np.isfinite(universe.change_percent[row])]
+        weight = sum(universe.sectors.weights[row] for row in priced)
+        if weight > 0:
+            expected[sector] = sum(universe.sectors.weights[row] * universe.change_percent[row] for row in priced) / weight
+    return expected
+
+
+def sector_changes(universe):
+    sectors = universe.sectors
+    return {
+        name: sectors._weighted_change[index] / sectors._weight[index]
+        for index, name in enumerate(sectors.names)
+        if sectors._weight[index] > 0
+    }
+
+
+@pytest.mark.parametrize("rebuild_every", [1000, 7])
+def test_incremental_sector_sums_match_a_full_recompute(monkeypatch, rebuild_every):
+    monkeypatch.setattr(market_universe, "_SECTOR_REBUILD_UPDATES", rebuild_every)
+    rng = np.random.default_rng(11)
+    sectors = ["Banks", "IT", "Energy", "Autos"]
+    rows = [(f"S{row}", sectors[row % 4], float(rng.uniform(0.5, 5))) for row in range(40)]
+    universe = MarketUniverse(constituents(*rows), "NSE", "CASH", top_k=5)
+
+    for _ in range(200):
+        changed = sorted(set(rng.integers(0, 40, size=5).tolist()))
+        for row in changed:
+            # Some rows lose their price again
+            universe.change_percent[row] = np.nan if rng.random() < 0.1 else rng.normal(scale=3)
+        universe.sectors.apply(universe, changed)
+
+    expected = expected_sector_changes(universe)
+    actual = sector_changes(universe)
+    assert actual.keys() == expected.keys()
+    for sector, change in expected.items():
+        assert actual[sector] == pytest.approx(change, abs=1e-9)
+
+
+def test_sector_data_reports_priced_sectors_best_first():
+    universe = MarketUniverse(
+        constituents(("A1", "Autos", 3.0), ("A2", "Autos", 1.0), ("B1", "Banks", 1.0), ("I1", "IT", 1.0)),
+        "NSE", "CASH", top_k=5
+    )
+    universe.change_percent[:3] = [2.0, -2.0, -1.0]
+    universe.sectors.apply(universe, [0, 1, 2])
+
+    data = universe.sectors.sector_data()
+
+    assert [sector["name"] for sector in data] == ["Autos", "Banks"]
+    assert data[0]["change_percent"] == 1.0
+    assert data[0]["value"] == 101.0
+    assert data[0]["stocks_count"] == 2
+    assert (data[0]["top_gainers"], data[0]["top_losers"]) == (["A1"], ["A2"])
+
+
+def test_sector_movers_are_re_ranked_for_changed_sectors_only():
+    rows = [(f"B{row}", "Banks", 1.0) for row in range(SECTOR_MOVERS + 2)] + [("I1", "IT", 1.0)]
+    universe = MarketUniverse(constituents(*rows), "NSE", "CASH", top_k=5)
+    banks = list(range(SECTOR_MOVERS + 2))
+    universe.change_percent[banks] = np.arange(1, len(banks) + 1, dtype=float)
+    universe.change_percent[-1] = 4.0
+    universe.sectors.apply(universe, banks + [len(rows) - 1])
+    top_banks = [f"B{row}" for row in reversed(banks)][:SECTOR_MOVERS]
+
+    universe.change_percent[0] = 50.0
+    universe.change_percent[-1] = -4.0
+    universe.sectors.apply(universe, [len(rows) - 1])
+
+    movers = {sector["name"]: sector for sector in universe.sectors.sector_data()}
+    assert movers["Banks"]["top_gainers"] == top_banks
+    assert movers["IT"]["top_losers"] == ["I1"]
+
+
+def test_load_constituents(tmp_path):
+    path = tmp_path / "ind_nifty500list.csv"
+    path.write_text(
+        "\ufeffCompany Name,Industry,Symbol,Series,Weight\n"
+        "Reliance Industries Ltd.,Oil Gas & Consumable Fuels,reliance,EQ,9.5\n"
+        "Tata Consultancy Services Ltd.,Information Technology,TCS,EQ,\n"
+        "No Symbol Ltd.,Other,,EQ,1\n"
+        "Infosys Ltd.,,INFY,EQ,-3\n",
+        encoding="utf-8"
+    )
+
+    rows = load_constituents(str(path))
+
+    assert rows == [
+        {"symbol": "RELIANCE", "name": "Reliance Industries Ltd.", "sector": "Oil Gas & Consumable Fuels", "weight": 9.5},
+        {"symbol": "TCS", "name": "Tata Consultancy Services Ltd.", "sector": "Information Technology", "weight": 1.0},
+        {"symbol": "INFY", "name": "Infosys Ltd.", "sector": "Other", "weight": 1.0},
+    ]
@@ -0,0 +1,173 @@
+import threading
+import time
+
+import pytest
+
+from services import quote_table
+from services.quote_table import QuoteTable
+
+KEY = QuoteTable.key("RELIANCE", "NSE", "CASH")
+
+
+@pytest.fixture
+def name(quote_table_name):
+    return quote_table_name
+
+
+@pytest.fixture
+def table(name):
+    table = QuoteTable.create(name, capacity=4)
+    yield table
+    table.close()
+
+
+def test_put_and_get(table):
+    now = time.time()
+    table.put(KEY, ltp=2500.5, volume=10, ltp_updated_at=now)
+
+    fields = table.get(KEY, max_age=5, timestamp_field="ltp_updated_at")
+
+    assert fields["ltp"] == 2500.5
+    assert fields["volume"] == 10
+    assert fields["ltp_updated_at"] == now
+
+
+def test_get_misses_unknown_unwritten_and_stale_entries(table):
+    assert table.get(KEY, max_age=5, timestamp_field="ltp_updated_at") is None
+
+    table.slot(KEY, create=True)
+    assert table.get(KEY, max_age=5, timestamp_field="ltp_updated_at") is None
+
+    table.put(KEY, ltp=1.0, ltp_updated_at=time.time() - 10)
+    assert table.get(KEY, max_age=5, timestamp_field="ltp_updated_at") is None
+    assert table.get(KEY, max_age=5, timestamp_field="quote_updated_at") is None
+
+
+def test_partial_writes_keep_other_fields(table):
+    table.put(KEY, ltp=1.0, open_price=2.0)
+    table.put(KEY, ltp=3.0, bid_price=None)
+
+    fields = table.read(table.slot(KEY))
+
+    assert (fields["ltp"], fields["open_price"]) == (3.0, 2.0)
+
+
+def test_writes_advance_the_sequence_by_two(table):
+    slot = table.slot(KEY, create=True)
+    assert table.sequence(slot) == 0
+
+    table.write(slot, ltp=1.0)
+    table.write(slot, ltp=2.0)
+
+    assert table.sequence(slot) == 4
+
+
+def test_read_gives_up_while_a_write_is_in_progress(table, monkeypatch):
+    monkeypatch.setattr(quote_table, "_MAX_READ_SPINS", 10)
+    slot = table.slot(KEY, create=True)
+    table.write(slot, ltp=1.0)
+
+    offset = table._slots_offset + slot * quote_table._SLOT_SIZE
+    quote_table._SEQ.pack_into(table._buf, offset, table.sequence(slot) + 1)
+
+    assert table.read(slot) is None
+
+
+def test_reads_never_mix_two_writes(table, name):
+    reader = QuoteTable.attach(name)
+    slot = table.slot(KEY, create=True)
+    done = threading.Event()
+
+    def write():
+        value = 0.0
+        while not done.is_set():
+            value += 1
+            table.write(slot, ltp=value, open_price=value, close_price=value)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(20000):
+            fields = reader.read(slot)
+            if fields is not None:
+                assert fields["ltp"] == fields["open_price"] == fields["close_price"]
+    finally:
+        done.set()
+        writer.join()
+        reader.close()
+
+
+def test_other_processes_see_new_keys(table, name):
+    other = QuoteTable.attach(name)
+    try:
+        assert other.slot(KEY) is None
+
+        slot = table.slot(KEY, create=True)
+        table.write(slot, ltp=7.0)
+
+        assert other.slot(KEY) == slot
+        assert other.read(slot)["ltp"] == 7.0
+        # Slots follow first allocation, whichever process makes it
+        assert other.slot("NSE:CASH:TCS", create=True) == slot + 1
+        assert table.slot("NSE:CASH:TCS") == slot + 1
+    finally:
+        other.close()
+
+
+def test_directory_stops_at_capacity(table):
+    slots = [table.slot(f"NSE:CASH:S{i}", create=True) for i in range(5)]
+
+    assert slots == [0, 1, 2, 3, None]
+    assert table.slot("NSE:CASH:S0", create=True) == 0
+
+
+def test_oversized_keys_are_not_allocated(table):
+    assert table.slot("NSE:CASH:" + "X" * 64, create=True) is None
+
+
+def test_open_creates_then_attaches(name):
+    first = QuoteTable.open(name, capacity=4)
+    second = QuoteTable.open(name, capacity=8)
+    try:
+        first.put(KEY, ltp=5.0)
+
+        assert second.capacity == 4
+        assert second.read(second.slot(KEY))["ltp"] == 5.0
+        assert not first.owner and not second.owner
+    finally:
+        first.close()
+        second.close()
+        # Neither owns the block; remove it as the supervisor would
+        QuoteTable.create(name, capacity=1).close()
+
+
+def test_create_replaces_a_leftover_table(name):
+    leftover = QuoteTable.open(name, capacity=4)
+    leftover.put(KEY, ltp=5.0)
+    leftover.close()
+
+    table = QuoteTable.create(name, capacity=4)
+    try:
+        assert table.slot(KEY) is None
+    finally:
+        table.close()
+
+
+def test_demand_is_reported_for_allocated_keys_only(table):
+    table.slot(KEY, create=True)
+    now = time.time()
+
+    table.record_demand({(KEY, "ltp"): 3, ("NSE:CASH:TCS", "ltp"): 1}, held=[(KEY, "quote")], held_until=now + 30)
+
+    demand = table.demand(since=now - 1, now=now)
+    assert list(demand) == [KEY]
+    assert demand[KEY][3] == now + 30
+    assert demand[KEY][4] == 3
+
+
+def test_poll_heartbeat(table):
+    assert table.polled_at() == 0.0
+
+    table.mark_polled(123.5)
+
+    assert table.polled_at() == 123.5
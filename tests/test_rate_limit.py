@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from middleware import rate_limit
+from middleware.rate_limit import (
+    RateLimitMiddleware, RedisSlidingWindowLimiter, SlidingWindowLimiter, parse_route_costs
+)
+
+
+def hit(limiter, client, now, cost=1):
+    return asyncio.run(limiter.hit(client, cost, now))
+
+
+class FakeRedisScript:
+    """Runs the sliding-window script's logic over a dict, like the Lua does in Redis"""
+
+    def __init__(self):
+        self.store = {}
+        self.fail = False
+
+    async def __call__(self, keys, args):
+        if self.fail:
+            raise ConnectionError("redis down")
+        cost, limit, weight, _ = args
+        curr = self.store.get(keys[0], 0)
+        prev = self.store.get(keys[1], 0)
+        if prev * weight + curr + cost > limit:
+            return [0, curr, prev]
+        self.store[keys[0]] = curr + cost
+        return [1, curr + cost, prev]
+
+
+@pytest.fixture
+def redis_limiter():
+    # from_url does not connect; the script is swapped for the fake
+    limiter = RedisSlidingWindowLimiter("redis://localhost:1", limit=3, window_seconds=60)
+    limiter._script = FakeRedisScript()
+    return limiter
+
+
+def test_allows_up_to_limit_within_window():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=60)
+
+    decisions = [hit(limiter, "a", 600 + i) for i in range(4)]
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+    assert decisions[3].retry_after == 60 - 3
+
+
+def test_previous_window_is_weighted_by_overlap():
+    limiter = SlidingWindowLimiter(limit=10, window_seconds=60)
+    for _ in range(10):
+        assert hit(limiter, "a", 600).allowed
+
+    # 15s into the next window, 10 * 0.75 = 7.5 of the old count remains
+    assert hit(limiter, "a", 675, cost=2).allowed
+    assert not hit(limiter, "a", 675, cost=1).allowed
+    # Halfway through, 5 remain alongside the 2 just spent
+    assert hit(limiter, "a", 690, cost=3).allowed
+
+
+def test_counts_reset_after_two_idle_windows():
+    limiter = SlidingWindowLimiter(limit=2, window_seconds=60)
+    hit(limiter, "a", 600)
+    hit(limiter, "a", 600)
+    assert not hit(limiter, "a", 601).allowed
+
+    assert hit(limiter, "a", 720).remaining == 1
+
+
+def test_clients_are_limited_independently():
+    limiter = SlidingWindowLimiter(limit=1, window_seconds=60)
+
+    assert hit(limiter, "a", 600).allowed
+    assert hit(limiter, "b", 600).allowed
+    assert not hit(limiter, "a", 600).allowed
+
+
+def test_new_clients_prune_idle_ones_least_recent_first():
+    limiter = SlidingWindowLimiter(limit=5, window_seconds=60)
+    hit(limiter, "idle", 600)
+    hit(limiter, "recent", 660)
+
+    # Two windows later "idle" has aged out; "recent" is only one behind
+    hit(limiter, "new", 720)
+
+    assert list(limiter._counters) == ["recent", "new"]
+
+
+def test_prune_is_bounded_per_new_client(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_PRUNE_BATCH", 2)
+    limiter = SlidingWindowLimiter(limit=5, window_seconds=60)
+    for client in ("a", "b", "c"):
+        hit(limiter, client, 600)
+
+    hit(limiter, "new", 900)
+
+    assert list(limiter._counters) == ["c", "new"]
+
+
+def test_seen_clients_move_to_the_back():
+    limiter = SlidingWindowLimiter(limit=5, window_seconds=60)
+    hit(limiter, "a", 600)
+    hit(limiter, "b", 600)
+    hit(limiter, "a", 601)
+
+    assert list(limiter._counters) == ["b", "a"]
+
+
+def test_redis_limiter_uses_shared_counts(redis_limiter):
+    decisions = [hit(redis_limiter, "a", 600) for _ in range(4)]
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert redis_limiter._script.store == {"ratelimit:a:10": 3}
+    assert not redis_limiter._fallback._counters
+
+
+def test_redis_limiter_falls_back_and_retries_after_delay(redis_limiter, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    redis_limiter._script.fail = True
+
+    assert hit(redis_limiter, "a", 600).allowed
+    assert not redis_limiter._redis_available
+    assert "a" in redis_limiter._fallback._counters
+
+    # Redis is back, but the limiter stays local until the retry delay passes
+    redis_limiter._script.fail = False
+    hit(redis_limiter, "a", 601)
+    assert redis_limiter._script.store == {}
+
+    clock[0] += rate_limit._REDIS_RETRY_SECONDS
+    assert hit(redis_limiter, "a", 602).allowed
+    assert redis_limiter._redis_available
+    assert redis_limiter._script.store == {"ratelimit:a:10": 1}
+
+
+@pytest.mark.parametrize("path, cost", [
+    ("/api/v1/market/historical", 5),
+    ("/api/v1/market/historical/RELIANCE", 5),
+    ("/api/v1/market/historical/", 5),
+    ("/api/v1/market/quote", 2),
+    ("/api/v1/market", 2),
+    ("/api/v1/marketplace", 1),
+    ("/api/v1/orders", 1),
+    ("/", 1),
+])
+def test_route_cost_uses_longest_matching_prefix(path, cost):
+    middleware = RateLimitMiddleware(
+        app=None,
+        route_costs={"/api/v1/market": 2, "/api/v1/market/historical/": 5}
+    )
+
+    assert middleware._route_cost(path) == cost
+
+
+def test_parse_route_costs_skips_malformed_items():
+    assert parse_route_costs("/a:2, /b/c:10,/bad,/d:x") == {"/a": 2, "/b/c": 10}
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import math
+import struct
+
+import pytest
+
+from services import stream_hub
+from services.quote_table import FIELDS, QuoteTable
+from services.stream_hub import (
+    FRAME_DELTA, FRAME_SNAPSHOT, SLOW_CONSUMER_CLOSE_CODE, FieldUpdate, StreamConnection, StreamHub,
+    _MAX_PENDING_CONTROL, changed_fields
+)
+
+KEY = QuoteTable.key("RELIANCE", "NSE", "CASH")
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+    async def send_bytes(self, message):
+        self.sent.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+def connection(encoding="json", max_rate=1000.0):
+    return StreamConnection(FakeWebSocket(), max_rate=max_rate, slow_after=5.0, disconnect_slow=False, encoding=encoding)
+
+
+def test_newer_update_replaces_pending_one_and_moves_back():
+    conn = connection()
+
+    conn.send("ltp A 1", ("A", "ltp"))
+    conn.send("ltp B 1", ("B", "ltp"))
+    conn.send("ltp A 2", ("A", "ltp"))
+
+    assert [message for message, _ in conn._pending.values()] == ["ltp B 1", "ltp A 2"]
+    assert conn.conflated == 1
+
+
+def test_message_types_of_a_symbol_queue_separately():
+    conn = connection()
+
+    conn.send("ltp", ("A", "ltp"))
+    conn.send("quote", ("A", "quote"))
+
+    assert conn.pending == 2
+    assert conn.conflated == 0
+
+
+def test_field_updates_merge_instead_of_replacing():
+    conn = connection("delta")
+
+    conn.send(FieldUpdate(7, {"ltp": 1.0, "volume": 10}, snapshot=False), ("A", "quote"))
+    conn.send(FieldUpdate(7, {"ltp": 2.0}, snapshot=False), ("A", "quote"))
+
+    merged, _ = conn._pending[("A", "quote")]
+    assert merged.fields == {"ltp": 2.0, "volume": 10}
+    assert not merged.snapshot
+
+
+def test_snapshot_replaces_pending_delta():
+    conn = connection("delta")
+
+    conn.send(FieldUpdate(7, {"ltp": 1.0}, snapshot=False), ("A", "quote"))
+    snapshot = FieldUpdate(7, {"ltp": 2.0, "volume": 5}, snapshot=True)
+    conn.send(snapshot, ("A", "quote"))
+
+    assert conn._pending[("A", "quote")][0] is snapshot
+
+
+def test_control_replies_are_never_conflated():
+    conn = connection()
+
+    conn.send("ack")
+    conn.send("ack")
+
+    assert conn.pending == 2
+
+
+def test_client_not_reading_replies_is_disconnected():
+    async def run():
+        conn = connection()
+        for _ in range(_MAX_PENDING_CONTROL + 1):
+            conn.send("ack")
+        await asyncio.sleep(0)
+        return conn
+
+    conn = asyncio.run(run())
+
+    assert conn.closed
+    assert conn.websocket.closed_with == SLOW_CONSUMER_CLOSE_CODE
+
+
+def test_sender_delivers_latest_state_in_order():
+    async def run():
+        conn = connection()
+        conn.start()
+        # The sender only runs once this yields: every tick lands in the queue first
+        for tick in range(100):
+            conn.send(f"A {tick}", ("A", "ltp"))
+            conn.send(f"B {tick}", ("B", "ltp"))
+        await asyncio.sleep(0.05)
+        await conn.stop()
+        return conn
+
+    conn = asyncio.run(run())
+
+    assert conn.websocket.sent == ["A 99", "B 99"]
+    assert conn.conflated == 198
+
+
+def test_changed_fields():
+    nan = math.nan
+
+    assert changed_fields(None, {"ltp": 1.0}) == {"ltp": 1.0}
+    assert changed_fields({"ltp": 1.0, "bid_price": nan}, {"ltp": 2.0, "bid_price": nan}) == {"ltp": 2.0}
+    assert changed_fields({"ltp": 1.0}, {"ltp": 1.0}) == {}
+
+
+def test_json_field_encoding():
+    update = FieldUpdate(42, {"volume": 10, "ltp": 2.5, "bid_price": math.nan}, snapshot=False)
+
+    message = json.loads(update.encode("delta"))
+
+    # Fields go in table order as [index, value] pairs, NaN as null
+    assert message == {
+        "type": "delta",
+        "id": 42,
+        "fields": [FIELDS.index("ltp"), 2.5, FIELDS.index("bid_price"), None, FIELDS.index("volume"), 10]
+    }
+
+
+def test_binary_field_encoding():
+    update = FieldUpdate(42, {"ltp": 2.5, "ltp_updated_at": 100.0}, snapshot=True)
+
+    frame = update.encode("binary")
+
+    frame_type, instrument_id, mask = struct.unpack_from("<BIH", frame)
+    assert (frame_type, instrument_id) == (FRAME_SNAPSHOT, 42)
+    assert mask == 1 << FIELDS.index("ltp") | 1 << FIELDS.index("ltp_updated_at")
+    assert struct.unpack_from("<2d", frame, 7) == (2.5, 100.0)
+    assert len(frame) == 7 + 16
+
+
+def test_updates_are_encoded_once_per_format():
+    update = FieldUpdate(1, {"ltp": 1.0}, snapshot=False)
+
+    assert update.encode("binary") is update.encode("binary")
+    assert update.encode("delta") is update.encode("delta")
+    assert struct.unpack_from("<B", update.encode("binary"))[0] == FRAME_DELTA
+
+
+@pytest.fixture
+def table(monkeypatch, quote_table_name):
+    table = QuoteTable.create(quote_table_name, capacity=4)
+    monkeypatch.setattr(stream_hub, "get_quote_table", lambda: table)
+    monkeypatch.setattr(stream_hub, "get_instrument_master", lambda: None)
+    yield table
+    table.close()
+
+
+def drain(conn):
+    messages = [message for message, _ in conn._pending.values()]
+    conn._pending.clear()
+    return messages
+
+
+def test_hub_sends_snapshot_then_changed_fields_only(table):
+    hub = StreamHub(interval=1.0, resync_interval=3600.0)
+    conn = connection("delta")
+    table.put(KEY, ltp=100.0, volume=5, ltp_updated_at=1.0, quote_updated_at=1.0)
+    hub.subscribe(conn, KEY, "quote")
+
+    (snapshot,) = drain(conn)
+    assert snapshot.snapshot and snapshot.instrument_id == table.slot(KEY)
+    assert set(snapshot.fields) == set(FIELDS)
+
+    hub.publish_changes()
+    drain(conn)
+    table.put(KEY, ltp=101.0, ltp_updated_at=2.0)
+    hub.publish_changes()
+
+    (delta,) = drain(conn)
+    assert not delta.snapshot
+    assert delta.fields == {"ltp": 101.0, "ltp_updated_at": 2.0}
+
+
+def test_ltp_subscribers_get_only_ltp_fields(table):
+    hub = StreamHub(interval=1.0, resync_interval=3600.0)
+    conn = connection("binary")
+    table.put(KEY, ltp=100.0, volume=5, ltp_updated_at=1.0, quote_updated_at=1.0)
+    hub.subscribe(conn, KEY, "ltp")
+    hub.publish_changes()
+    drain(conn)
+
+    table.put(KEY, volume=6, quote_updated_at=2.0)
+    hub.publish_changes()
+    assert drain(conn) == []
+
+    table.put(KEY, ltp=99.0, ltp_updated_at=3.0)
+    hub.publish_changes()
+    (delta,) = drain(conn)
+    assert delta.fields == {"ltp": 99.0, "ltp_updated_at": 3.0}
@@ -0,0 +1,85 @@
+import pytest
+
+from services import symbol_search
+from services.instrument_master import InstrumentMaster
+from services.symbol_search import SymbolSearch, normalize
+
+
+@pytest.fixture
+def search(instruments_csv):
+    return SymbolSearch(InstrumentMaster.load(instruments_csv))
+
+
+def results(search, query, **kwargs):
+    return [
+        (instrument.exchange, instrument.segment, instrument.symbol, match)
+        for instrument, match in search.search(query, **kwargs)
+    ]
+
+
+def test_normalize():
+    assert normalize("  tata-motors  ltd. ") == "TATA MOTORS LTD"
+    assert normalize("M&M") == "M&M"
+
+
+def test_exact_match_ranks_first(search):
+    assert results(search, "tcs")[0] == ("NSE", "CASH", "TCS", "exact")
+
+
+def test_prefix_results_follow_the_static_order(search):
+    assert results(search, "REL") == [
+        ("NSE", "CASH", "RELIANCE", "symbol_prefix"),
+        ("BSE", "CASH", "RELIANCE", "symbol_prefix"),
+        ("NSE", "FNO", "RELIANCE25JANFUT", "symbol_prefix"),
+    ]
+
+
+def test_symbol_prefix_ranks_above_name_prefix(search):
+    assert results(search, "TATA") == [
+        ("NSE", "CASH", "TATAMOTORS", "symbol_prefix"),
+        ("NSE", "CASH", "TCS", "name_prefix"),
+    ]
+
+
+def test_name_and_each_of_its_words_match(search):
+    assert results(search, "motors") == [("NSE", "CASH", "TATAMOTORS", "name_prefix")]
+    assert results(search, "tata consultancy s") == [("NSE", "CASH", "TCS", "name_prefix")]
+
+
+@pytest.mark.parametrize("query, symbol", [
+    ("RELAINCE", "RELIANCE"),   # swapped
+    ("HDFCBNK", "HDFCBANK"),    # missing
+    ("INFOSIS", "INFY"),        # replaced, in the name
+    ("TATAMMOTORS", "TATAMOTORS"),  # inserted
+    ("TCSX", "TCS"),            # extra character while typing
+])
+def test_one_typo_still_matches(search, query, symbol):
+    found = results(search, query)
+
+    assert ("NSE", "CASH", symbol, "typo") in found
+
+
+def test_short_queries_are_not_typo_matched(search):
+    assert results(search, "TSC") == []
+
+
+def test_filters(search):
+    assert results(search, "RELIANCE", exchange="bse") == [("BSE", "CASH", "RELIANCE", "exact")]
+    assert [row[2] for row in results(search, "REL", segment="FNO")] == ["RELIANCE25JANFUT"]
+    assert results(search, "REL", exchange="MCX") == []
+
+
+def test_limit(search):
+    assert len(search.search("REL", limit=2)) == 2
+
+
+def test_long_runs_are_ranked_once_and_cached(search, monkeypatch):
+    monkeypatch.setattr(symbol_search, "_MAX_SCAN", 1)
+
+    first = results(search, "REL")
+    cached = search.snapshot()["cached_runs"]
+
+    assert results(search, "REL") == first
+    assert first[0] == ("NSE", "CASH", "RELIANCE", "symbol_prefix")
+    assert cached >= 1
+    assert search.snapshot()["cached_runs"] == cached